@@ -0,0 +1,121 @@
+"""
+Runtime configuration for the Prompt Directory Server
+"""
+
+import os
+
+
+def _env_str(name: str, default: str) -> str:
+    """Read a string setting from the environment"""
+    return os.getenv(name, default)
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class Settings:
+    """Server settings, overridable through environment variables"""
+
+    def __init__(self):
+        # Development server: restart on code changes (run.py only)
+        self.reload = _env_bool("RELOAD", False)
+
+        # Locations
+        self.prompts_dir = _env_str("PROMPTS_DIR", "prompts")
+        self.index_dir = _env_str("INDEX_DIR", "embeddings")
+
+        # Model
+        self.model_name = _env_str("MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+        self.encoder_batch_size = _env_int("ENCODER_BATCH_SIZE", 32)
+
+        # Encoder inference backend: torch (fp32), int8, torchscript or onnx
+        # (see encoder.TextEncoder), and where exported ONNX graphs are kept
+        self.encoder_backend = _env_str("ENCODER_BACKEND", "torch")
+        self.encoder_export_dir = _env_str("ENCODER_EXPORT_DIR", "models")
+
+        # Inference concurrency: concurrent tasks, waiting tasks beyond which
+        # requests get 503, and PyTorch threads per task (0 = cores / workers)
+        # plus inter-op threads (0 = PyTorch default)
+        self.inference_workers = _env_int("INFERENCE_WORKERS", 2)
+        self.inference_queue_size = _env_int("INFERENCE_QUEUE_SIZE", 32)
+        self.torch_threads = _env_int("TORCH_THREADS", 0)
+        self.torch_interop_threads = _env_int("TORCH_INTEROP_THREADS", 0)
+
+        # Micro-batching of concurrent searches (window 0 disables batching)
+        self.search_batch_window_ms = _env_float("SEARCH_BATCH_WINDOW_MS", 5.0)
+        self.search_batch_max_size = _env_int("SEARCH_BATCH_MAX_SIZE", 16)
+
+        # Persistent document embedding cache (0 disables it)
+        self.embedding_cache_size = _env_int("EMBEDDING_CACHE_SIZE", 100000)
+
+        # FAISS index backend: flat, ivf_flat, hnsw or ivf_pq (see vector_index.IndexConfig)
+        self.index_type = _env_str("INDEX_TYPE", "flat")
+        self.index_nlist = _env_int("INDEX_NLIST", 0)
+        self.index_nprobe = _env_int("INDEX_NPROBE", 16)
+        self.hnsw_m = _env_int("HNSW_M", 32)
+        self.hnsw_ef_construction = _env_int("HNSW_EF_CONSTRUCTION", 200)
+        self.hnsw_ef_search = _env_int("HNSW_EF_SEARCH", 64)
+        self.pq_m = _env_int("PQ_M", 0)
+        self.pq_nbits = _env_int("PQ_NBITS", 8)
+
+        # Chunked embeddings of long prompts: tokens per content window (0
+        # disables chunking), overlap between windows and vectors per prompt
+        self.chunk_tokens = _env_int("CHUNK_TOKENS", 0)
+        self.chunk_overlap = _env_int("CHUNK_OVERLAP", 64)
+        self.max_chunks = _env_int("MAX_CHUNKS", 16)
+
+        # Seconds incremental index changes are collected before one snapshot
+        # is written for all of them (0 writes a snapshot after every change)
+        self.snapshot_delay = _env_float("SNAPSHOT_DELAY", 2.0)
+
+        # Hybrid search: reciprocal rank fusion offset and semantic weight of weighted fusion
+        self.rrf_k = _env_int("RRF_K", 60)
+        self.hybrid_semantic_weight = _env_float("HYBRID_SEMANTIC_WEIGHT", 0.5)
+
+        # Answer searches from the BM25 index when the inference queue is full
+        self.lexical_fallback = _env_bool("LEXICAL_FALLBACK", True)
+
+        # Build the index at startup when none is found on disk
+        self.index_on_startup = _env_bool("INDEX_ON_STARTUP", True)
+
+        # Load models and the index on a background thread, so catalog
+        # endpoints and lexical search serve while they load
+        self.background_loading = _env_bool("BACKGROUND_LOADING", True)
+
+        # In-memory caches for search (size 0 disables a cache)
+        self.query_cache_size = _env_int("QUERY_CACHE_SIZE", 1024)
+        self.query_cache_ttl = _env_float("QUERY_CACHE_TTL", 600.0)
+        self.result_cache_size = _env_int("RESULT_CACHE_SIZE", 1024)
+        self.result_cache_ttl = _env_float("RESULT_CACHE_TTL", 60.0)
+
+        # Minimum seconds between prompt directory scans on read requests
+        self.catalog_refresh_interval = _env_float("CATALOG_REFRESH_INTERVAL", 1.0)
+
+        # Background watcher for the prompts directory
+        self.watch_prompts = _env_bool("WATCH_PROMPTS", False)
+        self.watch_interval = _env_float("WATCH_INTERVAL", 1.0)
+        self.watch_debounce = _env_float("WATCH_DEBOUNCE", 0.5)
+
+
+settings = Settings()
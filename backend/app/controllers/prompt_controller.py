@@ -1,25 +1,145 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Dict, Any, Optional, List
+import hashlib
+import json
+import time
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Literal
 
-from app.models.prompt import Prompt, PromptList, PromptWithValues
-from app.services.prompt_service import PromptService
+from app.models.prompt import (
+    Prompt,
+    PromptList,
+    PromptWithValues,
+    RenderRequestItem,
+    BatchSearchRequest,
+    BatchSearchResponse
+)
+from app.config import settings
+from app.services.prompt_service import PromptService, ModelsLoadingError
+from app.services.inference_executor import InferenceExecutor, ExecutorSaturatedError
+from app.services.metrics import metrics, profiling, stage_timer
+from app.services.search_batcher import SearchBatcher
+from app.services.service_registry import registry
 
 
 router = APIRouter(prefix="/api/prompts", tags=["prompts"])
 
+SEARCHES = metrics.counter(
+    "prompt_server_searches_total",
+    "Searches served, by requested retrieval mode and fallback",
+    ("mode", "fallback")
+)
+
 
 def get_prompt_service() -> PromptService:
-    """Dependency to get prompt service instance"""
-    return PromptService()
+    """Dependency to get the shared prompt service instance"""
+    return registry.get_prompt_service()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Dependency to get the shared inference executor"""
+    return registry.get_executor()
+
+
+def get_search_batcher() -> Optional[SearchBatcher]:
+    """Dependency to get the shared search batcher (None when batching is disabled)"""
+    registry.get_executor()
+    return registry.batcher
+
+
+def _saturated_error(error: ExecutorSaturatedError) -> HTTPException:
+    """503 response telling the client to back off and retry"""
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+
+def _loading_error(error: ModelsLoadingError) -> HTTPException:
+    """503 response for endpoints that need the models while they are loading"""
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
+
+
+def _stream_ndjson(results: Iterable[Dict[str, Any]], chunk_size: int = 64) -> Iterator[bytes]:
+    """Serialize results as newline-delimited JSON, a few lines per chunk"""
+    lines = []
+    for result in results:
+        lines.append(json.dumps(result))
+        if len(lines) >= chunk_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _etag(prompt_service: PromptService, version: int, variant: Optional[str] = None) -> str:
+    """
+    Entity tag for a representation derived from a given catalog version
+
+    Args:
+        prompt_service: Service whose catalog produced the representation
+        version: Catalog or prompt version the representation was built from
+        variant: Query parameters selecting part of the representation, so
+            that each page and field selection gets its own tag
+    """
+    if not variant:
+        return f'"{prompt_service.catalog.instance_id}-{version}"'
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:12]
+    return f'"{prompt_service.catalog.instance_id}-{version}-{digest}"'
+
+
+def _listing_variant(cursor: Optional[str], limit: Optional[int], field_names: Optional[List[str]]) -> Optional[str]:
+    """Normalized listing parameters for the ETag (None for the full listing)"""
+    if cursor is None and limit is None and not field_names:
+        return None
+    return json.dumps([cursor, limit, sorted(set(field_names or []))])
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches the current entity tag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    """Headers letting clients cache a response and revalidate it with If-None-Match"""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
 
 
 @router.get("/", response_model=PromptList)
 async def get_all_prompts(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor with the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of prompts per page (all when omitted)"),
+    fields: Optional[str] = Query(None, description="Comma-separated prompt fields to return, e.g. id,title (the id is always included)"),
     prompt_service: PromptService = Depends(get_prompt_service)
 ):
-    """Get all available prompts"""
+    """Get all available prompts, optionally one page and a subset of fields at a time"""
     try:
-        return prompt_service.get_all_prompts()
+        field_names = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+        variant = _listing_variant(cursor, limit, field_names)
+
+        # Answer revalidations from the catalog version, before serializing anything
+        etag = _etag(prompt_service, prompt_service.get_catalog_version(), variant)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+
+        if variant is None:
+            # Served from the catalog's pre-serialized listing
+            version, content = prompt_service.get_all_prompts_json()
+        else:
+            version, content = prompt_service.get_prompts_page_json(cursor, limit, field_names)
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers=_cache_headers(_etag(prompt_service, version, variant))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving prompts: {str(e)}")
 
@@ -27,14 +147,19 @@ async def get_all_prompts(
 @router.get("/{prompt_id}", response_model=Prompt)
 async def get_prompt_by_id(
     prompt_id: str,
+    request: Request,
     prompt_service: PromptService = Depends(get_prompt_service)
 ):
     """Get a specific prompt by ID"""
     try:
-        prompt = prompt_service.get_prompt_by_id(prompt_id)
-        if not prompt:
+        entry = prompt_service.get_prompt_entry(prompt_id)
+        if not entry:
             raise HTTPException(status_code=404, detail=f"Prompt with ID '{prompt_id}' not found")
-        return prompt
+
+        etag = _etag(prompt_service, entry.version)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        return JSONResponse(content=entry.as_dict(), headers=_cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -61,17 +186,52 @@ async def render_prompt(
         raise HTTPException(status_code=500, detail=f"Error rendering prompt: {str(e)}")
 
 
+@router.post("/render/batch")
+async def render_prompts_batch(
+    items: List[RenderRequestItem],
+    prompt_service: PromptService = Depends(get_prompt_service)
+):
+    """Render many (prompt id, variable values) pairs, streamed back as NDJSON"""
+    pairs = [(item.prompt_id, item.variable_values) for item in items]
+    return StreamingResponse(
+        _stream_ndjson(prompt_service.render_prompts_batch(pairs)),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.post("/{prompt_id}/render/batch")
+async def render_prompt_batch(
+    prompt_id: str,
+    variable_sets: List[Dict[str, Any]],
+    prompt_service: PromptService = Depends(get_prompt_service)
+):
+    """Render one prompt with many sets of variable values, streamed back as NDJSON"""
+    if not prompt_service.get_prompt_by_id(prompt_id):
+        raise HTTPException(status_code=404, detail=f"Prompt with ID '{prompt_id}' not found")
+    
+    pairs = [(prompt_id, variable_values) for variable_values in variable_sets]
+    return StreamingResponse(
+        _stream_ndjson(prompt_service.render_prompts_batch(pairs)),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/{prompt_id}/variables")
 async def get_prompt_variables(
     prompt_id: str,
+    request: Request,
     prompt_service: PromptService = Depends(get_prompt_service)
 ):
     """Get variables for a specific prompt"""
     try:
-        prompt = prompt_service.get_prompt_by_id(prompt_id)
-        if not prompt:
+        entry = prompt_service.get_prompt_entry(prompt_id)
+        if not entry:
             raise HTTPException(status_code=404, detail=f"Prompt with ID '{prompt_id}' not found")
-        return {"variables": prompt.variables}
+
+        etag = _etag(prompt_service, entry.version)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        return JSONResponse(content={"variables": entry.as_dict()["variables"]}, headers=_cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -85,19 +245,96 @@ async def search_prompts(
     use_reranking: bool = Query(True, description="Whether to use reranking for better results"),
     relevance_threshold: float = Query(0.3, ge=0.0, le=1.0, description="Minimum relevance score for reranking"),
     initial_candidates: int = Query(20, ge=5, le=50, description="Number of initial candidates from FAISS"),
-    prompt_service: PromptService = Depends(get_prompt_service)
+    search_mode: Literal["semantic", "lexical", "hybrid"] = Query("semantic", description="Semantic (FAISS), lexical (BM25) or hybrid retrieval"),
+    fusion: Literal["rrf", "weighted"] = Query("rrf", description="How hybrid search combines semantic and lexical rankings"),
+    tags: Optional[List[str]] = Query(None, description="Only return prompts with these tags (repeat the parameter for several)"),
+    tag_match: Literal["any", "all"] = Query("any", description="Whether a prompt needs any or all of the tags"),
+    profile: bool = Query(False, description="Return the results with a per-stage timing breakdown"),
+    prompt_service: PromptService = Depends(get_prompt_service),
+    executor: InferenceExecutor = Depends(get_inference_executor),
+    batcher: Optional[SearchBatcher] = Depends(get_search_batcher)
 ):
-    """Search for similar prompts using semantic search with optional reranking"""
+    """
+    Search for similar prompts using semantic, lexical or hybrid search with optional reranking
+    
+    With profile=true the response is {"results": [...], "profile": {...}},
+    where the profile gives the milliseconds spent in each stage.
+    """
+    request = {
+        'query': query,
+        'top_k': top_k,
+        'use_reranking': use_reranking,
+        'relevance_threshold': relevance_threshold,
+        'initial_candidates': initial_candidates,
+        'search_mode': search_mode,
+        'fusion': fusion,
+        'tags': tags,
+        'tag_match': tag_match
+    }
+    fallback = None
+    with profiling() as timings:
+        start = time.perf_counter()
+        try:
+            # Lexical search needs no model and is cheap enough to run inline
+            if search_mode == "lexical":
+                results = prompt_service.search_prompts(**request)
+            # Model inference runs on the bounded executor, off the event loop;
+            # concurrent searches are grouped into one batched forward pass,
+            # except profiled ones, whose timings must be their own
+            elif batcher is not None and not profile:
+                results = await batcher.search(**request)
+            else:
+                results = await executor.run(prompt_service.search_prompts, **request)
+        except (ExecutorSaturatedError, ModelsLoadingError) as e:
+            if not settings.lexical_fallback:
+                raise _saturated_error(e) if isinstance(e, ExecutorSaturatedError) else _loading_error(e)
+            # Degrade to BM25 results rather than rejecting the search
+            fallback = "lexical"
+            results = prompt_service.search_prompts(**{**request, 'search_mode': 'lexical'})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error searching prompts: {str(e)}")
+        
+        with stage_timer("serialize"):
+            content = json.dumps(results).encode("utf-8")
+        total = time.perf_counter() - start
+    
+    SEARCHES.inc(mode=search_mode, fallback=fallback or "none")
+    headers = {"X-Search-Fallback": fallback} if fallback else None
+    if profile:
+        breakdown = {
+            'total_ms': total * 1000,
+            'stages_ms': {stage: seconds * 1000 for stage, seconds in timings.items()},
+            'fallback': fallback
+        }
+        content = b'{"results":' + content + b',"profile":' + json.dumps(breakdown).encode("utf-8") + b'}'
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_prompts_batch(
+    request: BatchSearchRequest,
+    prompt_service: PromptService = Depends(get_prompt_service),
+    executor: InferenceExecutor = Depends(get_inference_executor)
+):
+    """Search for many queries at once (for offline evaluation and backfills)"""
     try:
-        results = prompt_service.search_prompts(
-            query=query,
-            top_k=top_k,
-            use_reranking=use_reranking,
-            relevance_threshold=relevance_threshold,
-            initial_candidates=initial_candidates
+        results = await executor.run(
+            prompt_service.search_prompts_batch,
+            queries=request.queries,
+            top_k=request.top_k,
+            use_reranking=request.use_reranking,
+            relevance_threshold=request.relevance_threshold,
+            initial_candidates=request.initial_candidates,
+            search_mode=request.search_mode,
+            fusion=request.fusion,
+            tags=request.tags,
+            tag_match=request.tag_match
         )
-        
-        return results
+        return BatchSearchResponse(results=results, total_queries=len(results))
+    except ExecutorSaturatedError as e:
+        raise _saturated_error(e)
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching prompts: {str(e)}")
 
@@ -110,19 +347,49 @@ async def get_embedding_stats(
     try:
         stats = prompt_service.get_embedding_stats()
         return stats
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving embedding stats: {str(e)}")
 
 
+@router.get("/stats/cache")
+async def get_cache_stats(
+    prompt_service: PromptService = Depends(get_prompt_service)
+):
+    """Get hit/miss counters of the search caches"""
+    try:
+        return prompt_service.get_cache_stats()
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving cache stats: {str(e)}")
+
+
+@router.get("/stats/inference")
+async def get_inference_stats(
+    executor: InferenceExecutor = Depends(get_inference_executor),
+    batcher: Optional[SearchBatcher] = Depends(get_search_batcher)
+):
+    """Get concurrency limits and current load of the inference executor"""
+    stats = executor.get_stats()
+    stats['search_batching'] = batcher.get_stats() if batcher is not None else None
+    return stats
+
+
 @router.get("/status/reranking")
 async def get_reranking_status(
     prompt_service: PromptService = Depends(get_prompt_service)
 ):
     """Check if reranking service is available"""
     try:
+        if not prompt_service.models_ready:
+            status = "loading"
+        else:
+            status = "available" if prompt_service.reranking_available else "unavailable"
         return {
             "reranking_available": prompt_service.reranking_available,
-            "status": "available" if prompt_service.reranking_available else "unavailable"
+            "status": status
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking reranking status: {str(e)}")
@@ -137,19 +404,72 @@ async def get_reranking_stats(
     try:
         stats = prompt_service.get_reranking_stats(results)
         return stats
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving reranking stats: {str(e)}")
 
 
-@router.post("/reindex")
-async def reindex_prompts(
-    prompt_service: PromptService = Depends(get_prompt_service)
+@router.post("/reindex", status_code=202)
+async def reindex_prompts(prompt_service: PromptService = Depends(get_prompt_service)):
+    """
+    Start reindexing all prompts in the background (useful when prompts are updated)
+    
+    Searches keep using the current index until the new one is swapped in.
+    """
+    try:
+        started = prompt_service.start_reindex()
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
+    if not started:
+        raise HTTPException(status_code=409, detail="A reindex is already running")
+    return {"message": "Reindexing started", "status": prompt_service.get_reindex_status()}
+
+
+@router.get("/reindex/status")
+async def get_reindex_status(prompt_service: PromptService = Depends(get_prompt_service)):
+    """Get the progress of the current or last reindex"""
+    return prompt_service.get_reindex_status()
+
+
+@router.put("/{prompt_id}/index")
+async def reindex_prompt(
+    prompt_id: str,
+    prompt_service: PromptService = Depends(get_prompt_service),
+    executor: InferenceExecutor = Depends(get_inference_executor)
 ):
-    """Reindex all prompts (useful when prompts are updated)"""
+    """Re-embed a single prompt from its file and update it in the index"""
     try:
-        prompt_service.reindex_prompts()
-        return {"message": "Successfully reindexed all prompts"}
+        prompt = await executor.run(prompt_service.reindex_prompt, prompt_id)
+        if not prompt:
+            raise HTTPException(status_code=404, detail=f"Prompt with ID '{prompt_id}' not found")
+        return {"message": f"Successfully reindexed prompt '{prompt_id}'"}
+    except ExecutorSaturatedError as e:
+        raise _saturated_error(e)
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reindexing prompts: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reindexing prompt: {str(e)}")
 
 
+@router.delete("/{prompt_id}/index")
+async def remove_prompt_from_index(
+    prompt_id: str,
+    prompt_service: PromptService = Depends(get_prompt_service),
+    executor: InferenceExecutor = Depends(get_inference_executor)
+):
+    """Remove a single prompt from the search index"""
+    try:
+        if not await executor.run(prompt_service.remove_prompt_from_index, prompt_id):
+            raise HTTPException(status_code=404, detail=f"Prompt with ID '{prompt_id}' is not indexed")
+        return {"message": f"Successfully removed prompt '{prompt_id}' from the index"}
+    except ExecutorSaturatedError as e:
+        raise _saturated_error(e)
+    except ModelsLoadingError as e:
+        raise _loading_error(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error removing prompt from index: {str(e)}")
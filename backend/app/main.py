@@ -1,7 +1,38 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.controllers.prompt_controller import router as prompt_router
-import time
+from app.services.metrics import metrics
+from app.services.service_registry import registry
+
+
+REQUEST_SECONDS = metrics.histogram(
+    "prompt_server_request_seconds",
+    "HTTP request latency, by endpoint and status code",
+    ("method", "handler", "status")
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services on startup and release them on shutdown"""
+    print("🚀 Starting Prompt Directory Server...")
+    print("📚 Loading prompt catalog...")
+    
+    # The catalog is ready here; models and the index keep loading in the
+    # background (see /health/ready) and are shared by all requests
+    load_time = registry.startup()
+    print(f"✅ Server ready! Catalog loaded in {load_time:.2f}s, models: {registry.model_state}")
+    
+    yield
+    
+    # Let searches already queued for a batch finish before the executor stops
+    if registry.batcher is not None:
+        await registry.batcher.close()
+    registry.shutdown()
 
 
 # Create FastAPI application
@@ -10,7 +41,8 @@ app = FastAPI(
     description="A FastAPI server for managing and serving prompts with variables",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -26,16 +58,20 @@ app.add_middleware(
 app.include_router(prompt_router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    print("🚀 Starting Prompt Directory Server...")
-    print("📚 Loading and embedding prompts...")
-    
-    # The embedding will happen automatically when PromptService is initialized
-    # This is handled in the dependency injection
-    time.sleep(1)  # Small delay to show the startup message
-    print("✅ Server ready!")
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Time every request into the request latency histogram"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by handler rather than path, so prompt ids do not create new series
+    endpoint = request.scope.get("endpoint")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        handler=endpoint.__name__ if endpoint is not None else "unmatched",
+        status=response.status_code
+    )
+    return response
 
 
 @app.get("/")
@@ -47,7 +83,10 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "prompts": "/api/prompts",
-            "health": "/health"
+            "health": "/health",
+            "metrics": "/metrics",
+            "liveness": "/health/live",
+            "readiness": "/health/ready"
         }
     }
 
@@ -55,7 +94,41 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "prompt-directory-server"}
+    return {
+        "status": "healthy",
+        "service": "prompt-directory-server",
+        **registry.get_status()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latency histograms, cache counters, inference load and index size in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check(
+    models: bool = Query(False, description="Also require the models and the search index to be loaded")
+):
+    """
+    Readiness probe
+    
+    Ready once the prompt catalog is loaded, which is enough for listing,
+    rendering and lexical search. With models=true, ready only once semantic
+    search is available too.
+    """
+    ready = registry.is_loaded and (registry.models_ready or not models)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", **registry.get_status()}
+    )
 
 
 if __name__ == "__main__":
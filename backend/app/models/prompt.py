@@ -1,5 +1,5 @@
-from typing import List, Optional, Union, Dict, Any
-from pydantic import BaseModel
+from typing import List, Optional, Union, Dict, Any, Literal
+from pydantic import BaseModel, Field
 from enum import Enum
 
 
@@ -39,13 +39,39 @@ class Prompt(BaseModel):
 
 
 class PromptList(BaseModel):
-    """Model for list of prompts"""
+    """Model for list of prompts (one page of it when paginated)"""
     prompts: List[Prompt]
     total: int
+    next_cursor: Optional[str] = None  # Cursor of the next page, None on the last one
 
 
 class PromptWithValues(BaseModel):
     """Model for prompt with filled variable values"""
     prompt: Prompt
     variable_values: Dict[str, Any]
-    rendered_text: str 
\ No newline at end of file
+    rendered_text: str
+
+
+class RenderRequestItem(BaseModel):
+    """Model for one item of a batch render request"""
+    prompt_id: str
+    variable_values: Dict[str, Any] = {}
+
+
+class BatchSearchRequest(BaseModel):
+    """Model for a batch search request"""
+    queries: List[str] = Field(..., min_length=1, max_length=10000)
+    top_k: int = Field(5, ge=1, le=20)
+    use_reranking: bool = True
+    relevance_threshold: float = Field(0.3, ge=0.0, le=1.0)
+    initial_candidates: int = Field(20, ge=5, le=50)
+    search_mode: Literal["semantic", "lexical", "hybrid"] = "semantic"
+    fusion: Literal["rrf", "weighted"] = "rrf"
+    tags: Optional[List[str]] = None
+    tag_match: Literal["any", "all"] = "any"
+
+
+class BatchSearchResponse(BaseModel):
+    """Model for batch search results, one list per query in request order"""
+    results: List[List[Dict[str, Any]]]
+    total_queries: int
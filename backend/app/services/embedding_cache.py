@@ -0,0 +1,171 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded cache of text embeddings
+
+    Entries are keyed by a SHA-256 hash of the model name and the embedded
+    text, so changing either one never returns a stale vector. Vectors are
+    stored in a SQLite database that survives restarts and can be shared by
+    several worker processes. When the cache grows beyond max_entries, the
+    least recently used entries are evicted.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _CHUNK_SIZE = 500
+
+    def __init__(self, path: Path, model_name: str, max_entries: int = 100000):
+        """
+        Initialize embedding cache
+
+        Args:
+            path: SQLite database file
+            model_name: Name of the model producing the embeddings
+            max_entries: Maximum number of cached embeddings
+        """
+        self.path = Path(path)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "dimension INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        """Cache key for a text embedded with this cache's model"""
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached embeddings
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Mapping of position in texts to cached embedding, for hits only
+        """
+        keys = [self._key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for start in range(0, len(keys), self._CHUNK_SIZE):
+                chunk = list(set(keys[start:start + self._CHUNK_SIZE]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, dimension, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, dimension, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dimension)
+
+            # Refresh recency of the hits
+            now = time.time()
+            hit_keys = list(found)
+            for start in range(0, len(hit_keys), self._CHUNK_SIZE):
+                chunk = hit_keys[start:start + self._CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                    [now, *chunk]
+                )
+            self._conn.commit()
+
+        results = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(results)
+        self.misses += len(texts) - len(results)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Store embeddings and evict the least recently used entries if needed
+
+        Args:
+            texts: Embedded texts
+            vectors: Embeddings, one row per text
+        """
+        now = time.time()
+        rows = [
+            (self._key(text), int(vector.shape[0]), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dimension, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def get_or_encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Get embeddings for texts, encoding and caching only the misses
+
+        Args:
+            texts: Texts to embed
+            encode: Function encoding a list of texts into a matrix
+
+        Returns:
+            Numpy float32 array of embeddings, in the same order as texts
+        """
+        cached = self.get_many(texts)
+        missing = [i for i in range(len(texts)) if i not in cached]
+
+        encoded = None
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = np.asarray(encode(missing_texts), dtype=np.float32)
+            self.put_many(missing_texts, encoded)
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        dimension = encoded.shape[1] if encoded is not None else next(iter(cached.values())).shape[0]
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        for i, vector in cached.items():
+            embeddings[i] = vector
+        if encoded is not None:
+            embeddings[missing] = encoded
+        return embeddings
+
+    def get_stats(self) -> Dict:
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def clear(self) -> None:
+        """Remove every cached embedding"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
@@ -1,73 +1,208 @@
+import hashlib
+import json
 import os
-import pickle
-from typing import List, Dict, Tuple, Optional
+import threading
+from typing import Callable, Iterable, List, Dict, Tuple, Optional
 import numpy as np
 from pathlib import Path
 from tqdm import tqdm
-from transformers import AutoTokenizer, AutoModel
-import torch
-import faiss
 
 from app.models.prompt import Prompt
+from app.services.encoder import TextEncoder, get_encoder
+from app.services.embedding_cache import EmbeddingCache
+from app.services.index_generation import IndexGeneration
+from app.services.index_snapshot import MetadataTable, SnapshotStore
+from app.services.metrics import stage_timer
+from app.services.query_cache import TTLCache
+from app.services.vector_index import IndexConfig, get_search_params, is_memory_mapped, normalize_vectors
 
 
 class EmbeddingService:
     """Service for managing prompt embeddings using FAISS and Hugging Face transformers"""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", index_dir: str = "embeddings"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        index_dir: str = "embeddings",
+        encoder: Optional[TextEncoder] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        query_cache_size: int = 1024,
+        query_cache_ttl: float = 600.0,
+        index_config: Optional[IndexConfig] = None,
+        chunk_tokens: int = 0,
+        chunk_overlap: int = 64,
+        max_chunks: int = 16,
+        snapshot_delay: float = 2.0
+    ):
         """
         Initialize embedding service
         
         Args:
             model_name: Name of the Hugging Face model to use
             index_dir: Directory to store FAISS index and metadata
+            encoder: Shared text encoder (defaults to the process-wide encoder for model_name)
+            embedding_cache: Persistent cache of document embeddings (optional)
+            query_cache_size: Maximum number of cached query embeddings (0 disables the cache)
+            query_cache_ttl: Seconds a cached query embedding stays valid
+            index_config: FAISS index backend and tuning (defaults to an exact flat index)
+            chunk_tokens: Tokens per content window of a long prompt (0 disables chunking)
+            chunk_overlap: Tokens shared by consecutive content windows
+            max_chunks: Maximum number of vectors per prompt, including the summary vector
+            snapshot_delay: Seconds incremental changes are collected before a
+                snapshot is written (0 writes one after every change)
         """
         self.model_name = model_name
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(exist_ok=True)
         
-        # Initialize Hugging Face model and tokenizer
-        print(f"Loading Hugging Face model: {model_name}")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
+        # Shared Hugging Face model and tokenizer
+        self.encoder = encoder or get_encoder(model_name)
+        self.embedding_cache = embedding_cache
         
-        # Set model to evaluation mode
-        self.model.eval()
+        # Normalized query text -> embedding
+        self.query_cache = TTLCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        
+        # Long prompts get extra vectors for overlapping windows of their content
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.max_chunks = max(1, max_chunks)
+        self.chunk_bits = (self.max_chunks - 1).bit_length() if chunk_tokens > 0 else 0
         
         # FAISS index and metadata
-        self.index = None
-        self.prompt_metadata = []
-        self.index_path = self.index_dir / "faiss_index.bin"
-        self.metadata_path = self.index_dir / "prompt_metadata.pkl"
+        # The index maps int64 labels to L2-normalized vectors, so inner
+        # product scores are cosine similarities; each prompt id keeps a
+        # stable label so it can be updated or removed in place. Both live
+        # in the current generation, which a full reindex replaces as a whole.
+        self.index_config = index_config or IndexConfig()
+        self._generation = self._new_generation()
+        self._lock = threading.RLock()
+        
+        # Changes applied while a new generation is being built, replayed onto it before the swap
+        self._rebuild_log: Optional[List[Tuple[Optional[np.ndarray], List]]] = None
+        
+        # Incremented on every change to the index, so cached results can be keyed by it
+        self.index_version = 0
+        
+        # Versioned snapshots of the index and metadata. Incremental changes
+        # are written together once snapshot_delay has passed, so a burst of
+        # edits costs one snapshot instead of one full copy of the index each
+        self.snapshots = SnapshotStore(self.index_dir)
+        self.snapshot_delay = snapshot_delay
+        self._unsaved = False
+        self._save_timer: Optional[threading.Timer] = None
         
         # Load existing index if available
         self._load_index()
     
+    def _new_generation(self, **kwargs) -> IndexGeneration:
+        """Create an index generation with the configured backend and chunking"""
+        return IndexGeneration(self.index_config, chunk_bits=self.chunk_bits, **kwargs)
+    
+    @property
+    def index(self):
+        """FAISS index of the current generation (None if nothing is indexed)"""
+        return self._generation.index
+    
+    @property
+    def prompt_metadata(self) -> MetadataTable:
+        """Metadata of the prompts in the current generation, keyed by index label"""
+        return self._generation.metadata
+    
     def _load_index(self):
-        """Load existing FAISS index and metadata if available"""
-        if self.index_path.exists() and self.metadata_path.exists():
+        """Load the current index snapshot, memory-mapped, if available"""
+        if (self.index_dir / "faiss_index.bin").exists():
+            print("Found an index in the old pickle format, it will be rebuilt")
+        
+        try:
+            snapshot = self.snapshots.load(mmap=True)
+            if snapshot is None:
+                return
+            
+            print("Loading existing FAISS index...")
+            manifest, index, metadata = snapshot
+            if manifest.get('index_type') != self.index_config.index_type:
+                raise ValueError(
+                    f"index type changed from {manifest.get('index_type')} to "
+                    f"{self.index_config.index_type}, the index must be rebuilt"
+                )
+            if manifest.get('chunk_bits', 0) != self.chunk_bits:
+                raise ValueError("chunking settings changed, the index must be rebuilt")
+            # Vectors of different encoder backends differ slightly and must not be mixed
+            if manifest.get('encoder_backend', 'torch') != self.encoder.backend:
+                raise ValueError(
+                    f"encoder backend changed from {manifest.get('encoder_backend', 'torch')} to "
+                    f"{self.encoder.backend}, the index must be rebuilt"
+                )
+            
+            self._generation = self._new_generation(
+                index=index,
+                metadata=metadata,
+                next_label=manifest['next_label'],
+                manifest=manifest,
+                mapped=True
+            )
+            self.index_version += 1
+            
+            print(f"Loaded index snapshot {manifest['version']} with {len(metadata)} prompts")
+        except Exception as e:
+            print(f"Error loading existing index: {e}")
+            self._generation = self._new_generation()
+    
+    def _save_index(self, generation: IndexGeneration):
+        """Write a generation as a new snapshot"""
+        generation.save(self.snapshots, {
+            'model_name': self.model_name,
+            'encoder_backend': self.encoder.backend,
+            'normalized': True
+        })
+        
+        # Drop files of the old pickle format, superseded by the snapshot
+        for name in ("faiss_index.bin", "prompt_metadata.pkl"):
+            old_path = self.index_dir / name
+            if old_path.exists():
+                old_path.unlink()
+    
+    def _schedule_save(self):
+        """Write the current generation after snapshot_delay, together with any further changes (lock held)"""
+        if self.snapshot_delay <= 0:
+            self._save_index(self._generation)
+            return
+        
+        self._unsaved = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.snapshot_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _save_now(self):
+        """Write the current generation at once, including changes waiting for the delayed save (lock held)"""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        self._unsaved = False
+        try:
+            self._save_index(self._generation)
+        except Exception:
+            # Keep the changes marked, so the next change or flush tries again
+            self._unsaved = True
+            raise
+    
+    def flush(self):
+        """Write a snapshot now if changes are waiting for the delayed save"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._unsaved:
+                return
+            
             try:
-                print("Loading existing FAISS index...")
-                self.index = faiss.read_index(str(self.index_path))
-                
-                with open(self.metadata_path, 'rb') as f:
-                    self.prompt_metadata = pickle.load(f)
-                
-                print(f"Loaded index with {len(self.prompt_metadata)} prompts")
+                self._save_now()
             except Exception as e:
-                print(f"Error loading existing index: {e}")
-                self.index = None
-                self.prompt_metadata = []
+                print(f"Error saving index snapshot: {e}")
     
-    def _save_index(self):
-        """Save FAISS index and metadata"""
-        if self.index is not None:
-            faiss.write_index(self.index, str(self.index_path))
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(self.prompt_metadata, f)
-            print(f"Saved index with {len(self.prompt_metadata)} prompts")
-    
-    def _create_text_for_embedding(self, prompt: Prompt) -> str:
+    @staticmethod
+    def _create_text_for_embedding(prompt: Prompt) -> str:
         """
         Create text for embedding from prompt data
         
@@ -97,98 +232,359 @@ class EmbeddingService:
         
         return " | ".join(text_parts)
     
-    def _encode_texts(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
+    @staticmethod
+    def prompt_fingerprint(prompt: Prompt) -> str:
+        """Hash of the prompt fields that go into its embeddings and metadata"""
+        content = json.dumps([prompt.title, prompt.description, prompt.prompt, prompt.tags], ensure_ascii=False)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
+    def _create_texts_for_embedding(self, prompt: Prompt) -> List[str]:
+        """
+        Create the texts embedded for a prompt
+        
+        The first text is the summary from _create_text_for_embedding. With
+        chunking enabled, a prompt whose content is cut short there also
+        gets one text per overlapping token window of its full content, each
+        prefixed with the title, so every part of it can be found.
+        
+        Args:
+            prompt: Prompt object
+            
+        Returns:
+            Texts to embed, at most max_chunks
+        """
+        texts = [self._create_text_for_embedding(prompt)]
+        if self.chunk_tokens > 0 and self.max_chunks > 1 and prompt.prompt and len(prompt.prompt) > 500:
+            windows = self.encoder.split_windows(
+                prompt.prompt,
+                window=self.chunk_tokens,
+                overlap=self.chunk_overlap,
+                max_windows=self.max_chunks - 1
+            )
+            texts.extend(f"Title: {prompt.title} | Content: {window}" for window in windows)
+        return texts
+    
+    def _encode_texts(
+        self,
+        texts: List[str],
+        show_progress: bool = True,
+        batch_size: Optional[int] = None,
+        use_cache: bool = True
+    ) -> np.ndarray:
         """
         Encode texts to embeddings using Hugging Face model
         
         Args:
             texts: List of text strings
             show_progress: Whether to show progress bar
+            batch_size: Number of texts per forward pass (defaults to the encoder setting)
+            use_cache: Whether to look up and store embeddings in the persistent cache
             
         Returns:
-            Numpy array of embeddings
+            Numpy array of embeddings, in the same order as texts
         """
-        embeddings = []
-        
-        iterator = tqdm(texts, desc="Generating embeddings") if show_progress else texts
-        
-        for text in iterator:
-            # Tokenize text
-            inputs = self.tokenizer(
-                text,
-                padding=True,
-                truncation=True,
-                max_length=1024,
-                return_tensors="pt"
-            )
-            
-            # Generate embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                # Use mean pooling of last hidden state
-                attention_mask = inputs['attention_mask']
-                embeddings_tensor = outputs.last_hidden_state * attention_mask.unsqueeze(-1)
-                embeddings_tensor = embeddings_tensor.sum(dim=1) / attention_mask.sum(dim=1, keepdim=True)
-                embedding = embeddings_tensor.squeeze().cpu().numpy()
-                embeddings.append(embedding)
+        def encode(batch: List[str]) -> np.ndarray:
+            return self.encoder.encode(batch, max_length=512, batch_size=batch_size, show_progress=show_progress)
         
-        return np.array(embeddings)
+        if use_cache and self.embedding_cache is not None:
+            return self.embedding_cache.get_or_encode(texts, encode)
+        return encode(texts)
     
-    def embed_prompts(self, prompts: List[Prompt], show_progress: bool = True) -> None:
+    def upsert_prompts(
+        self,
+        prompts: List[Prompt],
+        show_progress: bool = True,
+        batch_size: Optional[int] = None
+    ) -> None:
         """
-        Embed all prompts and store in FAISS index
+        Add or replace prompts in the FAISS index, keyed by prompt id
+        
+        The snapshot is written after snapshot_delay, together with any
+        further changes made in the meantime.
         
         Args:
             prompts: List of prompt objects
             show_progress: Whether to show progress bar
+            batch_size: Number of prompts per forward pass (defaults to the encoder setting)
         """
+        self._upsert_prompts(prompts, show_progress=show_progress, batch_size=batch_size, save_now=False)
+    
+    def _upsert_prompts(
+        self,
+        prompts: List[Prompt],
+        show_progress: bool,
+        batch_size: Optional[int],
+        save_now: bool
+    ) -> None:
+        """Embed prompts into the current generation, then save it now or after snapshot_delay"""
         if not prompts:
             print("No prompts to embed")
             return
         
+        # Last occurrence wins if the same id is passed twice
+        prompts = list({prompt.id: prompt for prompt in prompts}.values())
+        
         print(f"Embedding {len(prompts)} prompts...")
         
         # Prepare texts for embedding
+        texts, metadata = self._prepare_prompts(prompts, show_progress=show_progress)
+        
+        # Generate embeddings
+        print("Generating embeddings...")
+        embeddings = self._encode_texts(texts, show_progress=show_progress, batch_size=batch_size)
+        
+        # Normalize so that inner product is cosine similarity
+        embeddings = normalize_vectors(embeddings)
+        
+        with self._lock:
+            generation = self._generation
+            generation.ensure_writable(self.snapshots)
+            generation.upsert(embeddings, metadata)
+            if self._rebuild_log is not None:
+                self._rebuild_log.append((embeddings, metadata))
+            self.index_version += 1
+            if save_now:
+                self._save_now()
+            else:
+                self._schedule_save()
+        
+        print(f"Successfully embedded {len(prompts)} prompts")
+    
+    def _prepare_prompts(self, prompts: List[Prompt], show_progress: bool = False) -> Tuple[List[str], List[Dict]]:
+        """
+        Build embedding texts and metadata entries for prompts
+        
+        Args:
+            prompts: List of prompt objects
+            show_progress: Whether to show progress bar
+            
+        Returns:
+            Tuple of (texts, metadata): one metadata entry per prompt and its
+            texts in order, several for a chunked prompt (see 'chunks')
+        """
         texts = []
         metadata = []
         
         iterator = tqdm(prompts, desc="Preparing prompts") if show_progress else prompts
         
         for prompt in iterator:
-            text = self._create_text_for_embedding(prompt)
-            texts.append(text)
-            metadata.append({
+            prompt_texts = self._create_texts_for_embedding(prompt)
+            texts.extend(prompt_texts)
+            entry = {
                 'id': prompt.id,
                 'title': prompt.title,
                 'description': prompt.description,
-                'tags': prompt.tags
-            })
+                'tags': prompt.tags,
+                'fingerprint': self.prompt_fingerprint(prompt)
+            }
+            if len(prompt_texts) > 1:
+                entry['chunks'] = len(prompt_texts)
+            metadata.append(entry)
         
-        # Generate embeddings
-        print("Generating embeddings...")
-        embeddings = self._encode_texts(texts, show_progress=show_progress)
+        return texts, metadata
+    
+    def embed_prompts(
+        self,
+        prompts: List[Prompt],
+        show_progress: bool = True,
+        batch_size: Optional[int] = None
+    ) -> None:
+        """
+        Embed all prompts and store in FAISS index
         
-        # Convert to float32 for FAISS
-        embeddings = embeddings.astype('float32')
+        Prompts that are already indexed are replaced rather than duplicated.
+        The snapshot is written before returning, so another process can load
+        the index as soon as a full build is done.
         
-        # Create or update FAISS index
-        dimension = embeddings.shape[1]
+        Args:
+            prompts: List of prompt objects
+            show_progress: Whether to show progress bar
+            batch_size: Number of prompts per forward pass (defaults to the encoder setting)
+        """
+        self._upsert_prompts(prompts, show_progress=show_progress, batch_size=batch_size, save_now=True)
+    
+    def delete_prompts(self, prompt_ids: List[str]) -> int:
+        """
+        Remove prompts from the FAISS index
         
-        if self.index is None:
-            # Create new index
-            self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-            print(f"Created new FAISS index with dimension {dimension}")
+        Args:
+            prompt_ids: Ids of the prompts to remove
+            
+        Returns:
+            Number of prompts that were removed
+        """
+        with self._lock:
+            generation = self._generation
+            generation.ensure_writable(self.snapshots)
+            removed = generation.delete(prompt_ids)
+            if self._rebuild_log is not None:
+                self._rebuild_log.append((None, list(prompt_ids)))
+            if not removed:
+                return 0
+            self.index_version += 1
+            self._schedule_save()
+        
+        print(f"Removed {removed} prompts from index")
+        return removed
+    
+    def rebuild_index(
+        self,
+        load_prompts: Callable[[], Iterable[Prompt]],
+        progress: Optional[Callable[[str, int, int], None]] = None,
+        chunk_size: int = 1024
+    ) -> None:
+        """
+        Build a new index generation from scratch and swap it in
+        
+        The current generation keeps serving searches and incremental
+        updates while the new one is built. Updates made in the meantime are
+        replayed onto the new generation, which is then saved as a snapshot
+        and made current in a single step; searches already running finish
+        on the old generation.
+        
+        Args:
+            load_prompts: Returns every prompt the new index should contain.
+                It is called once changes are being tracked, so no update
+                made while the prompts are read is lost.
+            progress: Called with (phase, done, total) as the build advances
+            chunk_size: Number of texts encoded between progress reports
+            
+        Raises:
+            RuntimeError: If another rebuild is already running
+        """
+        def report(phase: str, done: int, total: int) -> None:
+            if progress is not None:
+                progress(phase, done, total)
+        
+        with self._lock:
+            if self._rebuild_log is not None:
+                raise RuntimeError("An index rebuild is already running")
+            self._rebuild_log = []
+        
+        try:
+            prompts = list({prompt.id: prompt for prompt in load_prompts()}.values())
+            texts, metadata = self._prepare_prompts(prompts)
+            
+            # Encode in chunks so progress can be reported
+            report("encoding", 0, len(texts))
+            chunks = []
+            for start in range(0, len(texts), chunk_size):
+                chunks.append(self._encode_texts(texts[start:start + chunk_size], show_progress=False))
+                report("encoding", min(start + chunk_size, len(texts)), len(texts))
+            
+            generation = self._new_generation()
+            if chunks:
+                report("building", 0, len(texts))
+                generation.upsert(normalize_vectors(np.vstack(chunks)), metadata)
+            
+            report("swapping", len(texts), len(texts))
+            with self._lock:
+                for embeddings, changes in self._rebuild_log:
+                    if embeddings is None:
+                        generation.delete(changes)
+                    else:
+                        generation.upsert(embeddings, changes)
+                
+                # The new snapshot already holds every change made so far
+                self._save_index(generation)
+                self._generation = generation
+                self._unsaved = False
+                self.index_version += 1
+        finally:
+            with self._lock:
+                self._rebuild_log = None
+        
+        print(f"Swapped in new index generation with {len(generation.metadata)} prompts")
+    
+    def contains(self, prompt_id: str) -> bool:
+        """Check whether a prompt is in the index"""
+        generation = self._generation
+        with generation.lock.read():
+            return generation.metadata.label_of(prompt_id) is not None
+    
+    def get_indexed_ids(self) -> List[str]:
+        """Get the ids of all indexed prompts"""
+        generation = self._generation
+        with generation.lock.read():
+            return generation.metadata.ids()
+    
+    def get_out_of_sync_ids(self, prompts: List[Prompt]) -> List[str]:
+        """
+        Compare the index with the current prompts
         
-        # Add vectors to index
-        self.index.add(embeddings)
+        Args:
+            prompts: Every prompt the index should contain
+            
+        Returns:
+            Ids of prompts that are missing from the index, were indexed with
+            different content, or are indexed but no longer exist
+        """
+        generation = self._generation
+        with generation.lock.read():
+            indexed = {entry['id']: entry.get('fingerprint') for entry in generation.metadata.values()}
+        
+        out_of_sync = [
+            prompt.id for prompt in prompts
+            if indexed.pop(prompt.id, None) != self.prompt_fingerprint(prompt)
+        ]
+        return out_of_sync + list(indexed)
+    
+    def normalize_query(self, query: str) -> str:
+        """
+        Normalize query text for cache lookups
         
-        # Update metadata
-        self.prompt_metadata.extend(metadata)
+        Whitespace is collapsed, and case is folded when the tokenizer
+        lowercases its input anyway, so the embedding is unchanged.
+        """
+        normalized = " ".join(query.split())
+        if self.encoder.is_uncased:
+            normalized = normalized.lower()
+        return normalized
+    
+    def encode_queries(self, queries: List[str], use_cache: bool = True) -> np.ndarray:
+        """
+        Encode search queries, reusing cached embeddings of repeated queries
         
-        # Save index
-        self._save_index()
+        Queries missing from the cache are encoded together in one batch.
         
-        print(f"Successfully embedded {len(prompts)} prompts")
+        Args:
+            queries: Search queries
+            use_cache: Whether to read and fill the query embedding cache
+            
+        Returns:
+            Float32 array of shape (len(queries), dimension) with unit-norm rows
+        """
+        keys = [self.normalize_query(query) for query in queries]
+        vectors: Dict[str, np.ndarray] = {}
+        
+        if use_cache:
+            for key in keys:
+                if key not in vectors:
+                    vector = self.query_cache.get(key)
+                    if vector is not None:
+                        vectors[key] = vector
+        
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            encoded = normalize_vectors(self._encode_texts(missing, show_progress=False, use_cache=False))
+            for key, vector in zip(missing, encoded):
+                vectors[key] = vector
+                if use_cache:
+                    self.query_cache.put(key, vector)
+        
+        return np.stack([vectors[key] for key in keys]).astype('float32')
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Encode a search query, reusing cached embeddings of repeated queries
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Float32 array of shape (1, dimension)
+        """
+        return self.encode_queries([query])
     
     def search_similar_prompts(self, query: str, top_k: int = 5) -> List[Dict]:
         """
@@ -201,50 +597,114 @@ class EmbeddingService:
         Returns:
             List of similar prompts with scores
         """
-        if self.index is None or len(self.prompt_metadata) == 0:
-            return []
+        return self.search_similar_prompts_batch([query], top_k)[0]
+    
+    def search_similar_prompts_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Search for similar prompts for several queries at once
         
-        # Encode query
-        query_embedding = self._encode_texts([query], show_progress=False)
-        query_embedding = query_embedding.astype('float32')
+        The queries are encoded in one batch and looked up with a single
+        FAISS search over the stacked query matrix.
         
-        # Search in FAISS index
-        scores, indices = self.index.search(query_embedding, min(top_k, len(self.prompt_metadata)))
+        Args:
+            queries: Search queries
+            top_k: Number of top results to return per query
+            
+        Returns:
+            One list of similar prompts with scores per query
+        """
+        if not queries:
+            return []
+        if self.index is None or len(self.prompt_metadata) == 0:
+            return [[] for _ in queries]
         
-        # Prepare results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.prompt_metadata):
-                result = self.prompt_metadata[idx].copy()
-                result['similarity_score'] = float(score)
-                results.append(result)
+        # Encode queries
+        query_embeddings = self.encode_queries(queries)
+        return self.search_by_vectors(query_embeddings, top_k)
+    
+    def search_by_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        tags: Optional[List[str]] = None,
+        tag_match: str = "any"
+    ) -> List[List[Dict]]:
+        """
+        Search for similar prompts with precomputed query embeddings
         
-        return results
+        Args:
+            query_embeddings: Float32 array with one unit-norm query embedding per row
+            top_k: Number of top results to return per query
+            tags: Normalized tags to restrict the search to (None or empty for no filter);
+                the filter is applied inside the FAISS search, so top_k results are
+                returned whenever that many prompts pass it
+            tag_match: "any" to require one of the tags, "all" to require every tag
+            
+        Returns:
+            One list of similar prompts with cosine similarity scores per query
+        """
+        # Searches keep using the generation they started on, even if a reindex swaps in a new one
+        with stage_timer("faiss_search"):
+            return self._generation.search(query_embeddings, top_k, tags=tags, tag_match=tag_match)
+    
+    def get_index_counts(self) -> Dict[str, int]:
+        """Get the number of indexed prompts and vectors, cheaply enough for every metrics scrape"""
+        generation = self._generation
+        return {
+            'prompts': len(generation.metadata),
+            'vectors': generation.index.ntotal if generation.index is not None else 0,
+            'stale_vectors': generation.stale_count
+        }
     
     def get_index_stats(self) -> Dict:
         """Get statistics about the FAISS index"""
-        if self.index is None:
-            return {
-                'total_prompts': 0,
-                'index_size': 0,
-                'dimension': 0
-            }
-        
-        return {
-            'total_prompts': len(self.prompt_metadata),
-            'index_size': self.index.ntotal,
-            'dimension': self.index.d
+        generation = self._generation
+        with generation.lock.read():
+            if generation.index is None:
+                stats = {
+                    'total_prompts': 0,
+                    'index_size': 0,
+                    'dimension': 0,
+                    'index_type': None
+                }
+            else:
+                stats = {
+                    'total_prompts': len(generation.metadata),
+                    'index_size': generation.index.ntotal,
+                    'vector_count': generation.metadata.vector_count,
+                    'dimension': generation.index.d,
+                    'index_type': generation.index_type,
+                    **get_search_params(generation.index),
+                    'tag_index': generation.tag_index.get_stats()
+                }
+                if generation.manifest is not None:
+                    stats['snapshot_version'] = generation.manifest['version']
+                    # From what was loaded: the mmap flag has no effect on flat and HNSW indexes
+                    stats['memory_mapped'] = is_memory_mapped(generation.index)
+                stats['unsaved_changes'] = self._unsaved
+        stats['configured_index_type'] = self.index_config.index_type
+        stats['chunking'] = {
+            'enabled': self.chunk_bits > 0,
+            'chunk_tokens': self.chunk_tokens,
+            'chunk_overlap': self.chunk_overlap,
+            'max_chunks': self.max_chunks
         }
+        stats['metric'] = 'cosine'
+        stats['encoder_backend'] = self.encoder.backend
+        
+        if self.embedding_cache is not None:
+            stats['embedding_cache'] = self.embedding_cache.get_stats()
+        
+        return stats
     
     def clear_index(self):
         """Clear the FAISS index and metadata"""
-        self.index = None
-        self.prompt_metadata = []
-        
-        # Remove saved files
-        if self.index_path.exists():
-            self.index_path.unlink()
-        if self.metadata_path.exists():
-            self.metadata_path.unlink()
+        with self._lock:
+            self._generation = self._new_generation()
+            self._unsaved = False
+            self.index_version += 1
+            
+            # Remove saved snapshots
+            self.snapshots.clear()
         
         print("Cleared FAISS index") 
\ No newline at end of file
@@ -0,0 +1,284 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from tqdm import tqdm
+from transformers import AutoTokenizer, AutoModel
+import torch
+
+from app.config import settings
+from app.services.metrics import record_stage
+
+
+# Inference backends of TextEncoder:
+# - torch: the fp32 PyTorch model
+# - int8: linear layers dynamically quantized to int8 (smaller, faster on CPU)
+# - torchscript: the fp32 model traced and frozen into a TorchScript graph
+# - onnx: the fp32 model exported to ONNX and run with ONNX Runtime
+ENCODER_BACKENDS = ("torch", "int8", "torchscript", "onnx")
+
+# Model inputs passed to traced and exported graphs, in forward() order
+_GRAPH_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class TextEncoder:
+    """Sentence encoder shared by the embedding and reranking services"""
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 32,
+        backend: str = "torch",
+        export_dir: str = "models"
+    ):
+        """
+        Initialize text encoder
+
+        Args:
+            model_name: Name of the Hugging Face model to use
+            batch_size: Default number of texts per forward pass
+            backend: Inference backend, one of ENCODER_BACKENDS
+            export_dir: Directory for exported ONNX graphs, reused across restarts
+        """
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend '{backend}', expected one of {', '.join(ENCODER_BACKENDS)}")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.backend = backend
+
+        # Initialize Hugging Face model and tokenizer; graph backends need
+        # the model to return plain tuples
+        print(f"Loading Hugging Face model: {model_name} ({backend})")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name, torchscript=backend in ("torchscript", "onnx"))
+
+        # Set model to evaluation mode
+        self.model.eval()
+
+        # Longest input the model has position embeddings for
+        self.max_length = getattr(self.model.config, "max_position_embeddings", 512)
+        self.dimension = self.model.config.hidden_size
+
+        # Uncased tokenizers lowercase their input, so case never changes an embedding
+        self.is_uncased = bool(getattr(self.tokenizer, "do_lower_case", False))
+
+        self._session = None
+        self._input_names: Tuple[str, ...] = ()
+        if backend == "int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == "torchscript":
+            self.model = self._trace()
+        elif backend == "onnx":
+            self._session = self._load_onnx(Path(export_dir))
+            # The PyTorch weights are no longer needed
+            self.model = None
+
+    def _example_inputs(self) -> Dict[str, torch.Tensor]:
+        """Tokenized example input for tracing and export"""
+        encoded = self.tokenizer(["An example sentence to trace the model"], return_tensors="pt")
+        self._input_names = tuple(name for name in _GRAPH_INPUTS if name in encoded)
+        return {name: encoded[name] for name in self._input_names}
+
+    def _trace(self) -> torch.jit.ScriptModule:
+        """Trace the model into a frozen TorchScript graph"""
+        example = self._example_inputs()
+        with torch.no_grad():
+            traced = torch.jit.trace(self.model, tuple(example.values()), strict=False)
+        return torch.jit.freeze(traced)
+
+    def _load_onnx(self, export_dir: Path):
+        """Export the model to ONNX (once) and open an ONNX Runtime session on it"""
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx encoder backend requires the onnxruntime package") from e
+
+        example = self._example_inputs()
+        path = export_dir / f"{self.model_name.replace('/', '__')}.onnx"
+        if not path.exists():
+            print(f"Exporting {self.model_name} to {path}")
+            export_dir.mkdir(parents=True, exist_ok=True)
+            axes = {0: "batch", 1: "tokens"}
+            torch.onnx.export(
+                self.model,
+                tuple(example.values()),
+                str(path),
+                input_names=list(self._input_names),
+                output_names=["last_hidden_state"],
+                dynamic_axes={name: axes for name in self._input_names + ("last_hidden_state",)},
+                opset_version=14
+            )
+
+        # Same thread budget per forward pass as PyTorch (see configure_torch_threads)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+    def _forward(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Run the backend on a padded batch and return the last hidden state"""
+        if self._session is not None:
+            feeds = {name: inputs[name].numpy() for name in self._input_names}
+            return torch.from_numpy(self._session.run(["last_hidden_state"], feeds)[0])
+        if self.backend == "torchscript":
+            return self.model(*(inputs[name] for name in self._input_names))[0]
+        return self.model(**inputs).last_hidden_state
+
+    @staticmethod
+    def mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """
+        Mean-pool token embeddings, ignoring padding positions
+
+        Args:
+            last_hidden_state: Model output of shape (batch, tokens, dim)
+            attention_mask: Attention mask of shape (batch, tokens)
+
+        Returns:
+            Sentence embeddings of shape (batch, dim)
+        """
+        mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+        summed = (last_hidden_state * mask).sum(dim=1)
+        counts = mask.sum(dim=1).clamp(min=1e-9)
+        return summed / counts
+
+    def encode(
+        self,
+        texts: List[str],
+        max_length: int = 512,
+        batch_size: Optional[int] = None,
+        show_progress: bool = False
+    ) -> np.ndarray:
+        """
+        Encode texts to sentence embeddings in length-bucketed batches
+
+        Texts are tokenized once, sorted by token count and grouped into
+        batches so that padding only extends to the longest text of each
+        batch. Embeddings are returned in the order of the input texts.
+        Time spent tokenizing and in forward passes is recorded as the
+        tokenize and forward stages.
+
+        Args:
+            texts: List of text strings
+            max_length: Maximum number of tokens per text (capped at the model limit)
+            batch_size: Number of texts per forward pass (defaults to self.batch_size)
+            show_progress: Whether to show progress bar
+
+        Returns:
+            Numpy float32 array of embeddings with one row per text
+        """
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        batch_size = batch_size or self.batch_size
+        max_length = min(max_length, self.max_length)
+
+        # Tokenize everything once, without padding, to learn the lengths
+        start = time.perf_counter()
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=max_length, padding=False)
+        tokenize_seconds = time.perf_counter() - start
+        forward_seconds = 0.0
+
+        # Sort by length so each batch is a bucket of similarly sized inputs
+        order = sorted(range(len(texts)), key=lambda i: len(encoded['input_ids'][i]))
+        batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+        iterator = tqdm(batches, desc="Generating embeddings") if show_progress else batches
+
+        for batch in iterator:
+            start = time.perf_counter()
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in batch]
+            inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+            padded = time.perf_counter()
+
+            with torch.no_grad():
+                last_hidden_state = self._forward(inputs)
+                pooled = self.mean_pool(last_hidden_state, inputs['attention_mask'])
+
+            # Scatter back to the original positions
+            embeddings[batch] = pooled.cpu().numpy()
+            tokenize_seconds += padded - start
+            forward_seconds += time.perf_counter() - padded
+
+        record_stage("tokenize", tokenize_seconds)
+        record_stage("forward", forward_seconds)
+        return embeddings
+
+    def split_windows(self, text: str, window: int, overlap: int, max_windows: int) -> List[str]:
+        """
+        Split text into overlapping windows of at most window tokens
+
+        Windows are cut on token boundaries but returned as slices of the
+        original text, so casing and whitespace are preserved.
+
+        Args:
+            text: Text to split
+            window: Maximum number of tokens per window
+            overlap: Number of tokens shared by consecutive windows
+            max_windows: Maximum number of windows; the rest of a longer text is dropped
+
+        Returns:
+            Windows in text order (just the text if it fits in one window)
+        """
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+        if len(offsets) <= window:
+            return [text]
+
+        stride = max(1, window - overlap)
+        windows = []
+        for start in range(0, len(offsets), stride):
+            end = min(start + window, len(offsets))
+            windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end == len(offsets) or len(windows) == max_windows:
+                break
+        return windows
+
+
+def configure_torch_threads(num_threads: int, interop_threads: int = 0) -> None:
+    """
+    Set the number of threads PyTorch (and ONNX Runtime) use
+
+    Args:
+        num_threads: Intra-op threads for one forward pass (ignored if not positive)
+        interop_threads: Threads running independent operators in parallel (ignored if not positive)
+    """
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # Only possible before PyTorch runs its first parallel operation
+            print(f"Could not set PyTorch inter-op threads: {e}")
+
+
+_encoders: Dict[Tuple[str, str], TextEncoder] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2", backend: Optional[str] = None) -> TextEncoder:
+    """
+    Get the process-wide encoder for a model, loading it on first use
+
+    Args:
+        model_name: Name of the Hugging Face model
+        backend: Inference backend (defaults to the ENCODER_BACKEND setting)
+
+    Returns:
+        Shared TextEncoder instance
+    """
+    backend = backend or settings.encoder_backend
+    with _encoders_lock:
+        encoder = _encoders.get((model_name, backend))
+        if encoder is None:
+            encoder = TextEncoder(
+                model_name,
+                batch_size=settings.encoder_batch_size,
+                backend=backend,
+                export_dir=settings.encoder_export_dir
+            )
+            _encoders[(model_name, backend)] = encoder
+        return encoder
@@ -0,0 +1,72 @@
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.encoder import TextEncoder
+from app.services.vector_index import normalize_vectors
+
+
+def _timed_encode(encoder: TextEncoder, texts: List[str]) -> Tuple[np.ndarray, float]:
+    """Encode normalized vectors and measure the time taken"""
+    start = time.perf_counter()
+    vectors = normalize_vectors(encoder.encode(texts))
+    return vectors, time.perf_counter() - start
+
+
+def compare_encoders(
+    reference: TextEncoder,
+    candidate: TextEncoder,
+    documents: List[str],
+    queries: List[str],
+    k: int = 10
+) -> Dict:
+    """
+    Measure how closely a candidate encoder backend reproduces a reference
+
+    Both encoders embed the documents and queries, and every query ranks
+    the documents by cosine similarity (exactly, without FAISS). The
+    candidate's recall@k is the share of the reference top-k it returns.
+
+    Args:
+        reference: Encoder of the reference backend (normally fp32 torch)
+        candidate: Encoder of the backend under test
+        documents: Document texts, as embedded for the index
+        queries: Search queries
+        k: Number of top documents compared per query
+
+    Returns:
+        Recall@k (mean and worst query), cosine similarity between the two
+        backends' vectors of the same document, and encoding times
+    """
+    k = min(k, len(documents))
+    reference_documents, reference_document_seconds = _timed_encode(reference, documents)
+    candidate_documents, candidate_document_seconds = _timed_encode(candidate, documents)
+    reference_queries, reference_query_seconds = _timed_encode(reference, queries)
+    candidate_queries, candidate_query_seconds = _timed_encode(candidate, queries)
+
+    reference_top = np.argsort(-(reference_queries @ reference_documents.T), axis=1)[:, :k]
+    candidate_top = np.argsort(-(candidate_queries @ candidate_documents.T), axis=1)[:, :k]
+    recalls = np.array([
+        len(set(expected) & set(found)) / k
+        for expected, found in zip(reference_top, candidate_top)
+    ])
+    agreement = np.sum(reference_documents * candidate_documents, axis=1)
+
+    return {
+        'reference_backend': reference.backend,
+        'candidate_backend': candidate.backend,
+        'documents': len(documents),
+        'queries': len(queries),
+        'k': k,
+        'recall_at_k': float(recalls.mean()) if len(recalls) else 1.0,
+        'min_recall_at_k': float(recalls.min()) if len(recalls) else 1.0,
+        'mean_vector_cosine': float(agreement.mean()) if len(agreement) else 1.0,
+        'min_vector_cosine': float(agreement.min()) if len(agreement) else 1.0,
+        'encode_seconds': {
+            'reference_documents': reference_document_seconds,
+            'candidate_documents': candidate_document_seconds,
+            'reference_queries': reference_query_seconds,
+            'candidate_queries': candidate_query_seconds
+        }
+    }
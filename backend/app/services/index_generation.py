@@ -0,0 +1,428 @@
+import math
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.services.index_snapshot import MetadataTable, SnapshotStore
+from app.services.tag_index import TagIndex, count_bits
+from app.services.vector_index import (
+    IndexConfig,
+    configure_search,
+    create_index,
+    get_index_type,
+    reconstruct_vectors,
+    search_with_selector,
+    StoragePositions,
+    supports_removal,
+    unwrap_index
+)
+
+
+class ReadWriteLock:
+    """
+    Lock held by any number of readers or by one writer
+
+    Writers are preferred: once one is waiting, new readers wait behind it,
+    so a steady stream of searches cannot starve updates. The writer may
+    take the lock again, for reading or writing, while it holds it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared with other readers"""
+        if self._writer == threading.get_ident():
+            yield
+            return
+
+        with self._condition:
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively"""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._condition.notify_all()
+
+
+class IndexGeneration:
+    """
+    One generation of the FAISS index together with its metadata
+
+    Incremental updates modify the current generation in place while holding
+    its lock for writing; searches hold it for reading and run concurrently
+    with each other. A full reindex builds a new generation on the side and the
+    embedding service swaps it in by replacing a single reference; searches
+    that already picked up the old generation finish on it, and it is freed
+    once the last of them drops its reference.
+
+    Prompts embedded as several chunks keep one label and one metadata row;
+    their vectors are stored under the ids (label << chunk_bits) + chunk, so
+    every hit maps straight back to its prompt without per-chunk metadata.
+    """
+
+    def __init__(
+        self,
+        config: IndexConfig,
+        index: Optional[faiss.Index] = None,
+        metadata: Optional[MetadataTable] = None,
+        next_label: int = 0,
+        manifest: Optional[Dict[str, Any]] = None,
+        mapped: bool = False,
+        chunk_bits: int = 0
+    ):
+        """
+        Initialize index generation
+
+        Args:
+            config: Index backend and tuning
+            index: Loaded FAISS index (None for an empty generation)
+            metadata: Metadata of the indexed prompts, keyed by label
+            next_label: Next unused index label
+            manifest: Manifest of the snapshot the generation was loaded from or saved to
+            mapped: Whether the index is memory-mapped from the snapshot and may be read-only
+            chunk_bits: Low bits of a vector id holding the chunk number (0 without chunking)
+        """
+        self.config = config
+        self.index = index
+        self.index_type = get_index_type(index) if index is not None else None
+        self.metadata = metadata if metadata is not None else MetadataTable()
+        self.next_label = next_label
+        self.manifest = manifest
+        self.mapped = mapped
+        self.chunk_bits = chunk_bits
+        self.lock = ReadWriteLock()
+        # Guards the lazily built caches below, which readers may fill in
+        self._cache_lock = threading.Lock()
+        # Incremented by every upsert and delete
+        self._changes = 0
+
+        # Built on the first filtered search, then kept in step with the metadata
+        self._tag_index: Optional[TagIndex] = None
+        # Vector ids in storage order of an id-mapped index, for filtered
+        # searches; reset whenever vectors are added or removed
+        self._positions: Optional[StoragePositions] = None
+
+        if index is not None:
+            configure_search(index, config)
+
+    @property
+    def stale_count(self) -> int:
+        """Number of vectors left in the index by removed or replaced prompts"""
+        return self.index.ntotal - self.metadata.vector_count if self.index is not None else 0
+
+    def _vector_ids(self, labels: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Ids of the vectors of each label, counts[i] consecutive chunks per label"""
+        starts = np.cumsum(counts) - counts
+        chunks = np.arange(int(counts.sum()), dtype='int64') - np.repeat(starts, counts)
+        return (np.repeat(labels, counts) << self.chunk_bits) + chunks
+
+    def _entry_vector_ids(self, labels: List[int], entries: List[Dict]) -> np.ndarray:
+        """Ids of the vectors of metadata entries stored under labels"""
+        return self._vector_ids(
+            np.array(labels, dtype='int64'),
+            np.array([entry.get('chunks', 1) for entry in entries], dtype='int64')
+        )
+
+    @property
+    def tag_index(self) -> TagIndex:
+        """Tag bitmaps of the indexed prompts (lock held)"""
+        with self._cache_lock:
+            if self._tag_index is None:
+                self._tag_index = TagIndex()
+                for label in self.metadata.labels():
+                    self._tag_index.add(label, self.metadata.get(label).get('tags') or [])
+            return self._tag_index
+
+    def _forget(self, entry: Optional[Dict], label: int) -> None:
+        """Drop a removed or replaced metadata entry from the tag bitmaps"""
+        if entry is not None and self._tag_index is not None:
+            self._tag_index.discard(label, entry.get('tags') or [])
+
+    def ensure_writable(self, snapshots: SnapshotStore) -> None:
+        """Replace a memory-mapped index with an in-memory copy before it is modified"""
+        with self.lock.write():
+            if self.mapped:
+                self.index = snapshots.read_index(self.manifest)
+                configure_search(self.index, self.config)
+                self.mapped = False
+                self._positions = None
+
+    def upsert(self, embeddings: np.ndarray, metadata: List[Dict]) -> None:
+        """
+        Add or replace prompts, keyed by prompt id
+
+        Args:
+            embeddings: Normalized float32 vectors, one per prompt or, for
+                entries with a 'chunks' count, that many consecutive rows
+            metadata: Metadata dicts (with an 'id' key), one per prompt
+        """
+        with self.lock.write():
+            self._changes += 1
+            if self.index is None:
+                # Create new index, trained on this batch if the backend needs it
+                self.index, self.index_type = create_index(self.config, embeddings)
+                print(f"Created new {self.index_type} FAISS index with dimension {embeddings.shape[1]}")
+
+            # Reuse the label of prompts that are already indexed. Indexes
+            # that cannot remove vectors get a fresh label instead, and the
+            # old vector stays behind as a stale entry skipped at search time.
+            removable = supports_removal(self.index)
+            labels = []
+            old_labels, old_entries = [], []
+            for entry in metadata:
+                label = self.metadata.label_of(entry['id'])
+                if label is not None and not removable:
+                    self._forget(self.metadata.remove(label), label)
+                    label = None
+                if label is None:
+                    label = self.next_label
+                    self.next_label += 1
+                else:
+                    old_labels.append(label)
+                    old_entries.append(self.metadata.get(label))
+                labels.append(label)
+
+            # Drop old vectors, then add the new ones under the same labels
+            if old_labels:
+                self.index.remove_ids(self._entry_vector_ids(old_labels, old_entries))
+            self.index.add_with_ids(embeddings, self._entry_vector_ids(labels, metadata))
+            self._positions = None
+
+            # Update metadata and tag bitmaps
+            for label, entry in zip(labels, metadata):
+                label = int(label)
+                self._forget(self.metadata.get(label), label)
+                self.metadata.put(label, entry)
+                if self._tag_index is not None:
+                    self._tag_index.add(label, entry.get('tags') or [])
+            self._maintain()
+
+    def delete(self, prompt_ids: List[str]) -> int:
+        """
+        Remove prompts
+
+        Args:
+            prompt_ids: Ids of the prompts to remove
+
+        Returns:
+            Number of prompts that were removed
+        """
+        with self.lock.write():
+            self._changes += 1
+            labels = [self.metadata.label_of(prompt_id) for prompt_id in prompt_ids]
+            labels = [label for label in labels if label is not None]
+            if not labels or self.index is None:
+                return 0
+
+            entries = [self.metadata.remove(label) for label in labels]
+            if supports_removal(self.index):
+                self.index.remove_ids(self._entry_vector_ids(labels, entries))
+                self._positions = None
+            for label, entry in zip(labels, entries):
+                self._forget(entry, label)
+            self._maintain()
+            return len(labels)
+
+    def _maintain(self) -> None:
+        """
+        Rebuild the index when its type or contents call for it
+
+        A flat index created because too few vectors were available to train
+        the configured backend is upgraded once enough prompts are indexed,
+        and an index that cannot remove vectors is compacted once most of its
+        entries are stale.
+        """
+        upgrade = (
+            self.index_type != self.config.index_type
+            and self.config.can_build(self.metadata.vector_count)
+        )
+        if upgrade or self.stale_count > self.metadata.vector_count:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Recreate the index from its live vectors, dropping stale entries"""
+        labels = sorted(self.metadata.labels())
+        ids = self._entry_vector_ids(labels, [self.metadata.get(label) for label in labels])
+        if len(ids):
+            vectors = reconstruct_vectors(self.index, ids)
+        else:
+            vectors = np.zeros((0, self.index.d), dtype='float32')
+
+        index, index_type = create_index(self.config, vectors)
+        index.add_with_ids(vectors, ids)
+        print(f"Rebuilt FAISS index as {index_type} with {len(labels)} prompts")
+        self.index, self.index_type = index, index_type
+        self._positions = None
+
+    def save(self, snapshots: SnapshotStore, info: Dict[str, Any]) -> None:
+        """
+        Write the generation as a new snapshot
+
+        The files are written while holding the lock for reading, so
+        searches carry on; the metadata is only switched over to the new
+        snapshot if nothing changed in the meantime.
+
+        Args:
+            snapshots: Snapshot store to write to
+            info: Extra manifest fields
+        """
+        with self.lock.read():
+            if self.index is None:
+                manifest = None
+                snapshots.clear()
+            else:
+                manifest = snapshots.save(self.index, self.metadata, {
+                    'next_label': self.next_label,
+                    'index_type': self.config.index_type,
+                    'chunk_bits': self.chunk_bits,
+                    **info
+                })
+            changes = self._changes
+
+        with self.lock.write():
+            if self.mapped:
+                # Still serving the snapshot it was loaded from
+                return
+            self.manifest = manifest
+            if manifest is None:
+                return
+            if self._changes == changes:
+                # Serve metadata from the snapshot just written instead of the
+                # in-memory overlay; the table leases the snapshot while it is in use
+                self.metadata = snapshots.open_metadata(manifest)
+            print(f"Saved index snapshot {manifest['version']} with {manifest['count']} prompts")
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        tags: Optional[List[str]] = None,
+        tag_match: str = "any"
+    ) -> List[List[Dict]]:
+        """
+        Search with precomputed query embeddings
+
+        A prompt embedded as several chunks scores as its best-matching chunk
+        (max-sim), reported as 'matched_chunk' when chunking is enabled.
+
+        Args:
+            query_embeddings: Float32 array with one unit-norm query embedding per row
+            top_k: Number of top results to return per query
+            tags: Normalized tags to restrict the search to (None or empty for no filter)
+            tag_match: "any" to require one of the tags, "all" to require every tag
+
+        Returns:
+            One list of similar prompts with cosine similarity scores per query
+        """
+        with self.lock.read():
+            if self.index is None or len(self.metadata) == 0:
+                return [[] for _ in range(len(query_embeddings))]
+
+            allowed = self.tag_index.match(tags, tag_match) if tags else None
+            wanted = min(top_k, count_bits(allowed)) if allowed is not None else top_k
+            if wanted == 0:
+                return [[] for _ in range(len(query_embeddings))]
+
+            # Ask for enough vector hits to cover top_k prompts on average,
+            # plus extra hits to make up for stale entries
+            chunks_per_prompt = math.ceil(self.metadata.vector_count / len(self.metadata))
+            k = min(wanted * chunks_per_prompt + (self.stale_count if allowed is None else 0), self.index.ntotal)
+            batch_results = self._collect(*self._search_vectors(query_embeddings, k, allowed))
+
+            # Search again, deeper, for queries whose hits fell on too few prompts
+            exhaustive = False
+            short = [row for row, results in enumerate(batch_results) if len(results) < wanted]
+            while short and (k < self.index.ntotal or (allowed is not None and not exhaustive)):
+                if k < self.index.ntotal:
+                    k = min(2 * k, self.index.ntotal)
+                else:
+                    exhaustive = True
+                rows = np.array(short)
+                for row, results in zip(short, self._collect(*self._search_vectors(query_embeddings[rows], k, allowed, exhaustive))):
+                    batch_results[row] = results
+                short = [row for row in short if len(batch_results[row]) < wanted]
+
+        return [results[:top_k] for results in batch_results]
+
+    def _search_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        allowed: Optional[np.ndarray],
+        exhaustive: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the index for k vectors per query, among the allowed labels if given (lock held)"""
+        if allowed is None:
+            return self.index.search(query_embeddings, k)
+
+        # Stale and removed entries are not in the tag bitmaps, so every hit is a live prompt
+        positions = None
+        if unwrap_index(self.index) is not self.index:
+            with self._cache_lock:
+                if self._positions is None:
+                    self._positions = StoragePositions(self.index)
+                positions = self._positions
+        return search_with_selector(
+            self.index, query_embeddings, k, allowed, positions,
+            chunk_bits=self.chunk_bits, exhaustive=exhaustive
+        )
+
+    def _collect(self, scores: np.ndarray, ids: np.ndarray) -> List[List[Dict]]:
+        """Turn vector hits into prompt results, keeping the best chunk of each prompt (lock held)"""
+        batch_results = []
+        for row_scores, row_ids in zip(scores, ids):
+            results = []
+            seen = set()
+            for score, vector_id in zip(row_scores, row_ids):
+                if vector_id < 0:
+                    continue
+                label = int(vector_id) >> self.chunk_bits
+                if label in seen:
+                    continue
+                entry = self.metadata.get(label)
+                if entry is None:
+                    continue
+                seen.add(label)
+                result = entry.copy()
+                result.pop('chunks', None)
+                result.pop('fingerprint', None)
+                result['similarity_score'] = float(score)
+                if self.chunk_bits:
+                    result['matched_chunk'] = int(vector_id) & ((1 << self.chunk_bits) - 1)
+                results.append(result)
+            batch_results.append(results)
+        return batch_results
@@ -0,0 +1,493 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, snapshots are only coordinated within the process
+    fcntl = None
+
+
+# Bumped whenever the snapshot layout changes; older snapshots are rebuilt
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Number of snapshots kept on disk, so workers still reading the previous one are not disturbed
+SNAPSHOTS_TO_KEEP = 2
+
+INDEX_FILE = "index.faiss"
+
+# Lock file serializing version allocation, manifest updates and cleanup between processes
+LOCK_FILE = "manifest.lock"
+
+# Metadata fields stored as string columns
+STRING_FIELDS = ("id", "title", "description")
+
+# Content fingerprint of each row, missing from snapshots written before it was recorded
+FINGERPRINT_FIELD = "fingerprint"
+
+
+def _write_strings(directory: Path, name: str, values: List[str]) -> None:
+    """Write strings as one UTF-8 blob plus an offsets array"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='int64')
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    np.save(directory / f"{name}_offsets.npy", offsets)
+    np.save(directory / f"{name}_data.npy", np.frombuffer(b"".join(encoded), dtype='uint8'))
+
+
+def _fsync_file(path: Path) -> None:
+    """Flush a written file to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(path: Path) -> None:
+    """Flush a directory's entries to disk, so files created or renamed in it survive a crash"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # Windows: directories cannot be opened, and renames need no separate flush
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _load_array(path: Path) -> np.ndarray:
+    """Load a .npy file memory-mapped (empty arrays cannot be mapped and are read instead)"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+
+class SnapshotLease:
+    """
+    Shared lock on a snapshot directory, held while its files are in use
+
+    Old snapshots are only deleted once an exclusive lock on their
+    directory can be taken, so a snapshot stays on disk as long as any
+    process, or any generation in this one, still reads from it. The lock
+    is released when the lease is released or garbage collected.
+    """
+
+    def __init__(self, directory: Path):
+        self._fd: Optional[int] = None
+        if fcntl is not None:
+            self._fd = os.open(directory, os.O_RDONLY)
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+
+    def release(self) -> None:
+        """Release the lock"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.release()
+
+
+def _try_lock_exclusive(directory: Path) -> Optional[int]:
+    """Lock a snapshot directory for deletion, returning the locked fd or None if it is leased"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class StringColumn:
+    """Read-only column of strings backed by memory-mapped arrays"""
+
+    def __init__(self, directory: Path, name: str):
+        self.offsets = _load_array(directory / f"{name}_offsets.npy")
+        self.data = _load_array(directory / f"{name}_data.npy")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return self.data[self.offsets[position]:self.offsets[position + 1]].tobytes().decode('utf-8')
+
+
+class MetadataTable:
+    """
+    Prompt metadata keyed by index label
+
+    Rows of the last saved snapshot are read lazily from memory-mapped
+    columns (labels, ids, titles, descriptions and tags with offsets), so
+    loading costs next to nothing and the pages are shared by every worker
+    process. Rows added, replaced or removed since then are kept in a small
+    in-memory overlay until the next snapshot is written.
+
+    A prompt embedded as several chunks has a 'chunks' entry with its number
+    of vectors; rows without one have a single vector. Rows may carry a
+    'fingerprint' of the prompt content they were embedded from.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, lease: Optional[SnapshotLease] = None):
+        """
+        Initialize metadata table
+
+        Args:
+            directory: Snapshot directory to read the base rows from (None for an empty table)
+            lease: Lease on directory, held for as long as the table maps its files
+        """
+        self._lease = lease
+        self._base_labels = np.zeros(0, dtype='int64')
+        self._base_columns: Dict[str, StringColumn] = {}
+        self._base_id_order = np.zeros(0, dtype='int64')
+        self._tag_offsets = np.zeros(1, dtype='int64')
+        self._base_chunks: Optional[np.ndarray] = None
+
+        # Changes since the snapshot
+        self._overlay: Dict[int, Dict] = {}
+        self._overlay_ids: Dict[str, int] = {}
+        self._removed: Set[int] = set()
+
+        if directory is not None:
+            self._base_labels = _load_array(directory / "labels.npy")
+            self._base_id_order = _load_array(directory / "id_order.npy")
+            self._tag_offsets = _load_array(directory / "tag_offsets.npy")
+            for name in STRING_FIELDS + ("tags",):
+                self._base_columns[name] = StringColumn(directory, name)
+            if (directory / f"{FINGERPRINT_FIELD}_offsets.npy").exists():
+                self._base_columns[FINGERPRINT_FIELD] = StringColumn(directory, FINGERPRINT_FIELD)
+            # Snapshots written without chunking have no chunk counts
+            if (directory / "chunks.npy").exists():
+                self._base_chunks = _load_array(directory / "chunks.npy")
+        self._count = len(self._base_labels)
+        self._vector_count = int(self._base_chunks.sum()) if self._base_chunks is not None else self._count
+
+    def _base_position(self, label: int) -> Optional[int]:
+        """Row position of a label in the base columns, if present and not removed"""
+        if label in self._removed:
+            return None
+        position = int(np.searchsorted(self._base_labels, label))
+        if position < len(self._base_labels) and self._base_labels[position] == label:
+            return position
+        return None
+
+    def _base_row(self, position: int) -> Dict:
+        """Materialize one base row as a metadata dict"""
+        description = self._base_columns['description'][position]
+        tags = self._base_columns['tags']
+        row = {
+            'id': self._base_columns['id'][position],
+            'title': self._base_columns['title'][position],
+            'description': description or None,
+            'tags': [tags[i] for i in range(self._tag_offsets[position], self._tag_offsets[position + 1])]
+        }
+        if self._base_chunks is not None and self._base_chunks[position] > 1:
+            row['chunks'] = int(self._base_chunks[position])
+        fingerprints = self._base_columns.get(FINGERPRINT_FIELD)
+        if fingerprints is not None and fingerprints[position]:
+            row[FINGERPRINT_FIELD] = fingerprints[position]
+        return row
+
+    def get(self, label: int) -> Optional[Dict]:
+        """Get the metadata of a label, or None if it is not in the table"""
+        entry = self._overlay.get(label)
+        if entry is not None:
+            return entry
+        position = self._base_position(label)
+        return self._base_row(position) if position is not None else None
+
+    def put(self, label: int, entry: Dict) -> None:
+        """Add or replace the metadata of a label"""
+        self.remove(label)
+        self._overlay[label] = entry
+        self._overlay_ids[entry['id']] = label
+        self._count += 1
+        self._vector_count += entry.get('chunks', 1)
+
+    def remove(self, label: int) -> Optional[Dict]:
+        """Remove a label, returning its metadata if it was present"""
+        entry = self._overlay.pop(label, None)
+        if entry is not None:
+            if self._overlay_ids.get(entry['id']) == label:
+                del self._overlay_ids[entry['id']]
+            self._count -= 1
+            self._vector_count -= entry.get('chunks', 1)
+            return entry
+
+        position = self._base_position(label)
+        if position is None:
+            return None
+        self._removed.add(label)
+        entry = self._base_row(position)
+        self._count -= 1
+        self._vector_count -= entry.get('chunks', 1)
+        return entry
+
+    def label_of(self, prompt_id: str) -> Optional[int]:
+        """Get the label of a prompt id, or None if it is not in the table"""
+        label = self._overlay_ids.get(prompt_id)
+        if label is not None:
+            return label
+
+        # Binary search over the base rows in id order
+        ids = self._base_columns.get('id')
+        low, high = 0, len(self._base_id_order)
+        while low < high:
+            middle = (low + high) // 2
+            if ids[int(self._base_id_order[middle])] < prompt_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._base_id_order):
+            position = int(self._base_id_order[low])
+            label = int(self._base_labels[position])
+            if ids[position] == prompt_id and label not in self._removed:
+                return label
+        return None
+
+    def labels(self) -> Iterator[int]:
+        """Iterate over all labels, base rows first"""
+        for label in self._base_labels:
+            label = int(label)
+            if label not in self._removed and label not in self._overlay:
+                yield label
+        yield from self._overlay
+
+    def ids(self) -> List[str]:
+        """Get the prompt ids of all rows"""
+        return [self.get(label)['id'] for label in self.labels()]
+
+    def values(self) -> Iterator[Dict]:
+        """Iterate over the metadata of all rows"""
+        for label in self.labels():
+            yield self.get(label)
+
+    def __contains__(self, label: int) -> bool:
+        return label in self._overlay or self._base_position(label) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def vector_count(self) -> int:
+        """Number of vectors of all rows, counting every chunk"""
+        return self._vector_count
+
+    def write(self, directory: Path) -> None:
+        """Write all rows as columns into a snapshot directory"""
+        labels = sorted(self.labels())
+        rows = [self.get(label) for label in labels]
+
+        tags = [tag for row in rows for tag in (row.get('tags') or [])]
+        tag_offsets = np.zeros(len(rows) + 1, dtype='int64')
+        np.cumsum([len(row.get('tags') or []) for row in rows], out=tag_offsets[1:])
+
+        ids = [row['id'] for row in rows]
+        np.save(directory / "labels.npy", np.array(labels, dtype='int64'))
+        np.save(directory / "id_order.npy", np.array(sorted(range(len(ids)), key=ids.__getitem__), dtype='int64'))
+        np.save(directory / "tag_offsets.npy", tag_offsets)
+        if any(row.get('chunks', 1) > 1 for row in rows):
+            np.save(directory / "chunks.npy", np.array([row.get('chunks', 1) for row in rows], dtype='uint16'))
+        for name in STRING_FIELDS + (FINGERPRINT_FIELD,):
+            _write_strings(directory, name, [row.get(name) or "" for row in rows])
+        _write_strings(directory, "tags", tags)
+
+
+class SnapshotStore:
+    """
+    Versioned on-disk snapshots of the FAISS index and its metadata
+
+    Each snapshot is a directory under snapshots/ holding the FAISS index
+    and the metadata columns. It is written under a temporary name, flushed
+    to disk and renamed into place, then manifest.json is atomically
+    replaced to point at it, so a crash at any point leaves the previous
+    snapshot intact and the index and metadata can never get out of sync.
+
+    Several worker processes may share the directory. Allocating a version,
+    replacing the manifest and deleting old snapshots happen under an
+    exclusive lock on manifest.lock, and a snapshot that is still leased by
+    a reader (see SnapshotLease) is never deleted.
+    """
+
+    def __init__(self, index_dir: Path):
+        """
+        Initialize snapshot store
+
+        Args:
+            index_dir: Directory holding the manifest and the snapshots
+        """
+        self.index_dir = Path(index_dir)
+        self.snapshots_dir = self.index_dir / "snapshots"
+        self.manifest_path = self.index_dir / "manifest.json"
+        self.lock_path = self.index_dir / LOCK_FILE
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """Hold the manifest lock, shared or exclusive, across processes"""
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        """Read the manifest of the current snapshot, if any"""
+        if not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, mmap: bool = True) -> Optional[Tuple[Dict[str, Any], faiss.Index, MetadataTable]]:
+        """
+        Load the current snapshot
+
+        Args:
+            mmap: Memory-map the index instead of reading it into memory. An
+                index loaded this way may be read-only and must be reloaded
+                with mmap=False before it is modified.
+
+        Returns:
+            Tuple of (manifest, index, metadata), or None if there is no snapshot
+
+        Raises:
+            ValueError: If the snapshot was written in an unsupported format
+        """
+        with self._locked(exclusive=False):
+            manifest = self.read_manifest()
+            if manifest is None:
+                return None
+            if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"snapshot format {manifest.get('format_version')} is not supported")
+            metadata = self._open_metadata(manifest)
+
+        index = self.read_index(manifest, mmap=mmap)
+        if index.ntotal != manifest['index_size'] or len(metadata) != manifest['count']:
+            raise ValueError(f"snapshot {manifest['snapshot']} does not match its manifest")
+        return manifest, index, metadata
+
+    def _open_metadata(self, manifest: Dict[str, Any]) -> MetadataTable:
+        """Lease a snapshot and map its metadata columns (manifest lock held)"""
+        directory = self.snapshots_dir / manifest['snapshot']
+        return MetadataTable(directory, lease=SnapshotLease(directory))
+
+    def open_metadata(self, manifest: Dict[str, Any]) -> MetadataTable:
+        """Lease a snapshot and map its metadata columns"""
+        with self._locked(exclusive=False):
+            return self._open_metadata(manifest)
+
+    def read_index(self, manifest: Dict[str, Any], mmap: bool = False) -> faiss.Index:
+        """Read the FAISS index of a snapshot"""
+        path = self.snapshots_dir / manifest['snapshot'] / INDEX_FILE
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP if mmap else 0)
+
+    def save(self, index: faiss.Index, metadata: MetadataTable, info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Write a new snapshot and make it current
+
+        Args:
+            index: FAISS index to save
+            metadata: Metadata of the indexed prompts
+            info: Extra manifest fields (index type, labels, model, ...)
+
+        Returns:
+            Manifest of the new snapshot
+        """
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write everything under a name private to this writer; the version
+        # is only allocated once the files are complete
+        staging = self.snapshots_dir / f".staging-{os.getpid()}-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            faiss.write_index(index, str(staging / INDEX_FILE))
+            metadata.write(staging)
+
+            # The files must be on disk before the manifest can point at them
+            for path in staging.iterdir():
+                _fsync_file(path)
+            _fsync_directory(staging)
+
+            with self._locked():
+                version = self._next_version()
+                name = f"{version:08d}"
+                os.replace(staging, self.snapshots_dir / name)
+                _fsync_directory(self.snapshots_dir)
+
+                manifest = {
+                    'format_version': SNAPSHOT_FORMAT_VERSION,
+                    'version': version,
+                    'snapshot': name,
+                    'created_at': time.time(),
+                    'index_size': int(index.ntotal),
+                    'count': len(metadata),
+                    'dimension': int(index.d),
+                    **info
+                }
+                manifest_tmp = self.manifest_path.with_suffix(".json.tmp")
+                with open(manifest_tmp, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(manifest_tmp, self.manifest_path)
+                _fsync_directory(self.index_dir)
+
+                self._remove_old_snapshots(version)
+        finally:
+            # Only this writer's own staging directory is ever removed
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+        return manifest
+
+    def _next_version(self) -> int:
+        """Allocate the next snapshot version (manifest lock held)"""
+        previous = self.read_manifest()
+        versions = [int(path.name) for path in self.snapshots_dir.iterdir() if path.name.isdigit()]
+        return max(versions + [previous['version'] if previous else 0]) + 1
+
+    def _remove_old_snapshots(self, current_version: int) -> None:
+        """Delete snapshots older than the ones being kept, unless a reader still leases them (manifest lock held)"""
+        for path in self.snapshots_dir.iterdir():
+            if not path.name.isdigit() or int(path.name) > current_version - SNAPSHOTS_TO_KEEP:
+                continue
+            if fcntl is None:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+
+            fd = _try_lock_exclusive(path)
+            if fd is None:
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                os.close(fd)
+
+    def clear(self) -> None:
+        """Delete the manifest and every snapshot"""
+        with self._locked():
+            if self.manifest_path.exists():
+                self.manifest_path.unlink()
+            if self.snapshots_dir.exists():
+                shutil.rmtree(self.snapshots_dir)
@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference executor has no room for another task"""
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for CPU-bound model inference
+
+    Route handlers await run() instead of calling the model directly, so
+    the event loop stays free for other requests and health checks. At most
+    max_workers tasks run at once and at most max_queue more may wait; any
+    further task is rejected immediately with ExecutorSaturatedError so that
+    latency stays bounded under load.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 32):
+        """
+        Initialize inference executor
+
+        Args:
+            max_workers: Number of tasks that may run concurrently
+            max_queue: Number of tasks that may wait for a free worker
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rejected = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of tasks running or waiting"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of tasks waiting for a free worker"""
+        return max(0, self._in_flight - self.max_workers)
+
+    def _acquire(self) -> None:
+        """Reserve a slot or raise if the executor is saturated"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError("Inference queue is full, retry later")
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        """Free a slot"""
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking function on the pool and await its result
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            Whatever fn returns
+
+        Raises:
+            ExecutorSaturatedError: If all workers are busy and the queue is full
+        """
+        self._acquire()
+        try:
+            # Propagate context variables (e.g. request-scoped state) to the worker thread
+            context = contextvars.copy_context()
+            future = self._executor.submit(functools.partial(context.run, fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+
+        # Free the slot when the work finishes, even if the awaiting request was cancelled
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict:
+        """Get concurrency limits and current load"""
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self._in_flight,
+            'queue_depth': self.queue_depth,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running tasks"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,207 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.models.prompt import Prompt
+
+
+# Words and identifiers such as "code-review", "snake_case" or "v1.2"
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+SUBTOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms
+
+    Compound identifiers are kept whole and also split into their parts, so
+    "code-review" matches queries for "code-review", "code" and "review".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = SUBTOKEN_PATTERN.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over prompts
+
+    Covers the same fields as the embedding text (title, description,
+    content and tags), with the full prompt body rather than its first 500
+    characters. Prompts are added, replaced and removed one at a time, so
+    the index can follow the prompt catalog incrementally. Searching needs
+    no model, which makes it a cheap first stage when the encoder is busy.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize BM25 index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+
+        # term -> {prompt id: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _create_text(prompt: Prompt) -> str:
+        """Text indexed for a prompt"""
+        parts = [prompt.title, prompt.description or "", prompt.prompt, " ".join(prompt.tags)]
+        return "\n".join(parts)
+
+    def upsert(self, prompts: Iterable[Prompt]) -> None:
+        """Add or replace prompts, keyed by prompt id"""
+        with self._lock:
+            for prompt in prompts:
+                self._remove(prompt.id)
+
+                terms = Counter(tokenize(self._create_text(prompt)))
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[prompt.id] = frequency
+                self._doc_terms[prompt.id] = terms
+                self._doc_lengths[prompt.id] = sum(terms.values())
+                self._total_length += self._doc_lengths[prompt.id]
+
+    def remove(self, prompt_ids: Iterable[str]) -> None:
+        """Remove prompts by id"""
+        with self._lock:
+            for prompt_id in prompt_ids:
+                self._remove(prompt_id)
+
+    def _remove(self, prompt_id: str) -> None:
+        """Remove one prompt (lock held)"""
+        terms = self._doc_terms.pop(prompt_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings[term]
+            del postings[prompt_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(prompt_id)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 20,
+        accept: Optional[Callable[[str], bool]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank prompts by BM25 score
+
+        Args:
+            query: Search query
+            top_k: Number of top results to return
+            accept: Predicate on prompt ids; prompts it rejects are left out
+                before the top_k cut, so filtered searches still fill top_k
+
+        Returns:
+            List of (prompt id, score), best first; prompts sharing no term with the query are left out
+        """
+        with self._lock:
+            num_docs = len(self._doc_lengths)
+            if num_docs == 0:
+                return []
+            average_length = self._total_length / num_docs
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for prompt_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self._doc_lengths[prompt_id] / average_length
+                    score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                    scores[prompt_id] = scores.get(prompt_id, 0.0) + score
+
+        candidates = scores.items()
+        if accept is not None:
+            candidates = [(prompt_id, score) for prompt_id, score in candidates if accept(prompt_id)]
+        return heapq.nlargest(top_k, candidates, key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def get_stats(self) -> Dict:
+        """Get index size"""
+        with self._lock:
+            return {
+                'documents': len(self._doc_lengths),
+                'terms': len(self._postings),
+                'average_length': self._total_length / len(self._doc_lengths) if self._doc_lengths else 0.0
+            }
+
+
+# Ways to combine semantic and lexical rankings in hybrid search
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def fuse_results(
+    semantic: List[Dict],
+    lexical: List[Dict],
+    method: str = "rrf",
+    rrf_k: int = 60,
+    semantic_weight: float = 0.5
+) -> List[Dict]:
+    """
+    Merge a semantic and a lexical result list into one ranking
+
+    With "rrf" (reciprocal rank fusion) each list contributes
+    1 / (rrf_k + rank) per prompt, which needs no score calibration. With
+    "weighted", the cosine similarity and the BM25 score (scaled by the best
+    BM25 score in the list) are mixed with semantic_weight.
+
+    Args:
+        semantic: Results with a 'similarity_score', best first
+        lexical: Results with a 'lexical_score', best first
+        method: One of FUSION_METHODS
+        rrf_k: Rank offset for reciprocal rank fusion
+        semantic_weight: Weight of the semantic score in weighted fusion
+
+    Returns:
+        Merged results with a 'fused_score', best first
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {', '.join(FUSION_METHODS)}")
+
+    merged: Dict[str, Dict] = {}
+    fused: Dict[str, float] = {}
+
+    max_lexical = max((result['lexical_score'] for result in lexical), default=0.0) or 1.0
+    for weight, results in ((semantic_weight, semantic), (1 - semantic_weight, lexical)):
+        for rank, result in enumerate(results):
+            prompt_id = result['id']
+            if prompt_id in merged:
+                merged[prompt_id].update(result)
+            else:
+                merged[prompt_id] = result.copy()
+
+            if method == "rrf":
+                score = 1.0 / (rrf_k + rank + 1)
+            elif results is lexical:
+                score = weight * result['lexical_score'] / max_lexical
+            else:
+                score = weight * max(0.0, result['similarity_score'])
+            fused[prompt_id] = fused.get(prompt_id, 0.0) + score
+
+    for prompt_id, result in merged.items():
+        result['fused_score'] = fused[prompt_id]
+    return sorted(merged.values(), key=lambda result: result['fused_score'], reverse=True)
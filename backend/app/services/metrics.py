@@ -0,0 +1,243 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+# Stages timed by stage_timer, roughly in request order
+STAGES = ("yaml_load", "tokenize", "forward", "faiss_search", "lexical_search", "rerank", "serialize")
+
+# Histogram bucket bounds in seconds, from sub-millisecond lookups to full reindexes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# One sample: label values by name, and the value
+Sample = Tuple[Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Render labels in Prometheus text format, e.g. {stage="rerank"}"""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, keeping integers free of a decimal point"""
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing count, one per combination of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add amount to the counter with the given label values"""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        """Lines of the counter in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.label_names, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets
+
+    Each combination of label values keeps one count per bucket plus a sum
+    and a total count, which is all Prometheus needs to compute quantiles.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one value with the given label values"""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            counts, totals = series
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        """Lines of the histogram in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, totals) in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels({**labels, 'le': _format_value(bound)})
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(totals[0])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(totals[1])}")
+        return lines
+
+
+class CollectedMetric:
+    """Gauge or counter whose samples were read from a service at scrape time"""
+
+    def __init__(self, name: str, help_text: str, samples: List[Sample], metric_type: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.samples = samples
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        """Lines of the metric in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.samples:
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text format
+
+    Counters and histograms are updated where the work happens. State that
+    already lives in services (cache counters, queue depth, index size) is
+    exposed through collectors that read it at scrape time, so nothing has
+    to be kept in step.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram]] = {}
+        self._collectors: List[Callable[[], List[CollectedMetric]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        """Register a counter (or return the one already registered under name)"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text, label_names)
+            return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Register a histogram (or return the one already registered under name)"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, label_names, buckets)
+            return self._metrics[name]
+
+    def add_collector(self, collect: Callable[[], List[CollectedMetric]]) -> None:
+        """Register a callback returning metrics to render on each scrape"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def remove_collector(self, collect: Callable[[], List[CollectedMetric]]) -> None:
+        """Unregister a collector added with add_collector"""
+        with self._lock:
+            if collect in self._collectors:
+                self._collectors.remove(collect)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            try:
+                collected = collect()
+            except Exception as e:
+                # A failing collector must not take down the whole scrape
+                print(f"Metrics collector failed: {e}")
+                continue
+            for metric in collected:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "prompt_server_stage_seconds",
+    "Time spent per processing stage",
+    ("stage",)
+)
+
+# Timings of the request being profiled, if any (see profiling)
+_profile: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("profile", default=None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record time spent in a stage, in the histogram and in the active profile"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    profile = _profile.get()
+    if profile is not None:
+        profile[stage] = profile.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one occurrence of a stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def profiling() -> Iterator[Dict[str, float]]:
+    """
+    Collect the stage timings of the enclosed block
+
+    The timings dict is shared through a context variable, so work handed
+    to the inference executor (which copies the context) is included.
+
+    Yields:
+        Seconds per stage, filled in as stages complete
+    """
+    profile: Dict[str, float] = {}
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
@@ -0,0 +1,272 @@
+import base64
+import binascii
+import bisect
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.models.prompt import Prompt, PromptList
+from app.services.metrics import stage_timer
+from app.services.prompt_template import CompiledTemplate
+
+
+class CatalogEntry:
+    """A parsed prompt file together with the file state it was parsed from"""
+
+    __slots__ = ("path", "mtime", "size", "prompt", "template", "version", "_data")
+
+    def __init__(self, path: Path, mtime: float, size: int, prompt: Prompt, version: int = 0):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.prompt = prompt
+        # Catalog version the entry was loaded at; changes only when the file is re-parsed
+        self.version = version
+        self._data: Optional[Dict[str, Any]] = None
+
+        # Compile and validate the template once, when the file is loaded
+        self.template = CompiledTemplate(prompt.prompt, (variable.name for variable in prompt.variables))
+        if self.template.undeclared:
+            print(f"Prompt '{prompt.id}' in {path} uses undeclared placeholders: {', '.join(self.template.undeclared)}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The prompt as JSON-ready data, built once per entry"""
+        if self._data is None:
+            self._data = self.prompt.model_dump(mode="json")
+        return self._data
+
+
+ChangeListener = Callable[[List[Prompt], List[str]], None]
+
+
+class PromptCatalog:
+    """
+    In-memory catalog of validated prompts, keyed by id
+
+    A refresh stats every prompt file and only re-parses files whose mtime
+    or size changed since they were last loaded. Each entry carries the
+    prompt's compiled template. Every change bumps the catalog version, and
+    the serialized listing is cached per version.
+
+    Listing pages are ordered by prompt id. A cursor is the opaque,
+    URL-safe encoding of the last id on the previous page, so pages stay
+    consistent when prompts are added or removed in between.
+    """
+
+    def __init__(self, prompts_dir: Path, loader: Callable[[Path], Optional[Prompt]]):
+        """
+        Initialize prompt catalog
+
+        Args:
+            prompts_dir: Directory containing YAML prompt files
+            loader: Function parsing one prompt file (returns None on error)
+        """
+        self.prompts_dir = Path(prompts_dir)
+        self.loader = loader
+        self.version = 0
+        # Distinguishes this catalog's versions from those of earlier processes
+        self.instance_id = uuid.uuid4().hex[:8]
+
+        self._entries: Dict[Path, CatalogEntry] = {}
+        self._by_id: Dict[str, CatalogEntry] = {}
+        self._failed: Dict[Path, Tuple[float, int]] = {}
+        self._listing_json: Optional[Tuple[int, bytes]] = None
+        self._sorted_ids: Optional[Tuple[int, List[str]]] = None
+        self._last_refresh: Optional[float] = None
+        self._listeners: List[ChangeListener] = []
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """
+        Register a callback invoked after each refresh that changed the catalog
+
+        Args:
+            listener: Called with (upserted prompts, removed prompt ids)
+        """
+        self._listeners.append(listener)
+
+    def _scan(self) -> Dict[Path, Tuple[float, int]]:
+        """Get (mtime, size) for every prompt file in the directory"""
+        snapshot = {}
+        for pattern in ("*.yml", "*.yaml"):
+            for file_path in self.prompts_dir.glob(pattern):
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[file_path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def refresh(self, max_age: float = 0.0) -> Tuple[List[Prompt], List[str]]:
+        """
+        Bring the catalog up to date with the prompts directory
+
+        Args:
+            max_age: Skip the scan if the last one is more recent than this many seconds
+
+        Returns:
+            Tuple of (upserted prompts, removed prompt ids)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_refresh is not None and now - self._last_refresh < max_age:
+                return [], []
+            self._last_refresh = now
+
+            snapshot = self._scan()
+            entries = dict(self._entries)
+            changed_paths = []
+
+            for path in list(entries):
+                if path not in snapshot:
+                    del entries[path]
+                    changed_paths.append(path)
+
+            for path, state in snapshot.items():
+                entry = entries.get(path)
+                if entry is not None and (entry.mtime, entry.size) == state:
+                    continue
+                if entry is None and self._failed.get(path) == state:
+                    continue
+
+                prompt = self.loader(path)
+                if prompt is None:
+                    # Remember the broken state so it is not re-parsed on every refresh
+                    self._failed[path] = state
+                    entries.pop(path, None)
+                else:
+                    self._failed.pop(path, None)
+                    entries[path] = CatalogEntry(path, state[0], state[1], prompt, self.version + 1)
+                changed_paths.append(path)
+
+            for path in list(self._failed):
+                if path not in snapshot:
+                    del self._failed[path]
+
+            if not changed_paths:
+                return [], []
+
+            by_id = {entry.prompt.id: entry for entry in sorted(entries.values(), key=lambda e: str(e.path))}
+            upserted = [entry.prompt for prompt_id, entry in by_id.items() if self._by_id.get(prompt_id) is not entry]
+            removed_ids = [prompt_id for prompt_id in self._by_id if prompt_id not in by_id]
+
+            # Swap in the new state; readers always see a consistent mapping
+            self._entries = entries
+            self._by_id = by_id
+            self.version += 1
+
+        if upserted or removed_ids:
+            for listener in self._listeners:
+                listener(upserted, removed_ids)
+
+        return upserted, removed_ids
+
+    def get(self, prompt_id: str) -> Optional[Prompt]:
+        """Get a prompt by id"""
+        entry = self._by_id.get(prompt_id)
+        return entry.prompt if entry is not None else None
+
+    def get_entry(self, prompt_id: str) -> Optional[CatalogEntry]:
+        """Get the catalog entry for a prompt id"""
+        return self._by_id.get(prompt_id)
+
+    def get_all(self) -> List[Prompt]:
+        """Get every prompt in the catalog"""
+        return [entry.prompt for entry in self._by_id.values()]
+
+    def get_ids(self) -> List[str]:
+        """Get the ids of every prompt in the catalog"""
+        return list(self._by_id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get_listing_json(self) -> Tuple[int, bytes]:
+        """Get (catalog version, serialized PromptList) for the current catalog version"""
+        cached = self._listing_json
+        if cached is not None and cached[0] == self.version:
+            return cached
+
+        with self._lock:
+            version = self.version
+            prompts = self.get_all()
+            with stage_timer("serialize"):
+                content = PromptList(prompts=prompts, total=len(prompts)).model_dump_json().encode("utf-8")
+            self._listing_json = (version, content)
+            return self._listing_json
+
+    def _get_sorted_ids(self) -> Tuple[int, List[str]]:
+        """Get (version, prompt ids in sorted order), cached per catalog version"""
+        cached = self._sorted_ids
+        if cached is not None and cached[0] == self.version:
+            return cached
+
+        with self._lock:
+            cached = (self.version, sorted(self._by_id))
+            self._sorted_ids = cached
+            return cached
+
+    @staticmethod
+    def encode_cursor(prompt_id: str) -> str:
+        """Encode a prompt id as a listing cursor"""
+        return base64.urlsafe_b64encode(prompt_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> str:
+        """Decode a listing cursor into the prompt id it points after"""
+        try:
+            prompt_id = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            prompt_id = ""
+        if not prompt_id:
+            raise ValueError(f"Invalid cursor: '{cursor}'")
+        return prompt_id
+
+    def get_page_json(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[int, bytes]:
+        """
+        Serialize one page of the listing, optionally with only some fields
+
+        Args:
+            cursor: Cursor returned with the previous page (None for the first page)
+            limit: Maximum number of prompts on the page (None for all remaining)
+            fields: Prompt fields to include (None for all); the id is always included
+
+        Returns:
+            Tuple of (catalog version, serialized page)
+
+        Raises:
+            ValueError: If the cursor or a field name is invalid
+        """
+        if fields is not None:
+            unknown = [name for name in fields if name not in Prompt.model_fields]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            fields = ["id"] + [name for name in dict.fromkeys(fields) if name != "id"]
+
+        with self._lock:
+            version, ids = self._get_sorted_ids()
+            by_id = self._by_id
+
+        start = bisect.bisect_right(ids, self.decode_cursor(cursor)) if cursor else 0
+        end = len(ids) if limit is None else min(start + limit, len(ids))
+
+        with stage_timer("serialize"):
+            prompts = []
+            for prompt_id in ids[start:end]:
+                data = by_id[prompt_id].as_dict()
+                prompts.append(data if fields is None else {name: data[name] for name in fields})
+
+            content = json.dumps({
+                'prompts': prompts,
+                'total': len(ids),
+                'next_cursor': self.encode_cursor(ids[end - 1]) if end < len(ids) else None
+            }).encode("utf-8")
+        return version, content
@@ -1,31 +1,177 @@
 import os
+import threading
+import time
 import yaml
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Iterable, Iterator, Tuple
 from pathlib import Path
 
 from app.models.prompt import Prompt, Variable, VariableType, PromptList, PromptWithValues
-from app.services.embedding_service import EmbeddingService
-from app.services.reranking_service import RerankingService
+from app.services.prompt_catalog import PromptCatalog, CatalogEntry
+from app.services.query_cache import TTLCache
+from app.services.lexical_index import BM25Index, FUSION_METHODS, fuse_results
+from app.services.metrics import stage_timer
+from app.services.tag_index import TAG_MATCH_MODES, matches_tags, normalize_tags
+
+if TYPE_CHECKING:
+    from app.services.embedding_service import EmbeddingService
+    from app.services.reranking_service import RerankingService
+    from app.services.vector_index import IndexConfig
+
+
+# Retrieval used for the initial candidates of a search
+SEARCH_MODES = ("semantic", "lexical", "hybrid")
+
+
+class ModelsLoadingError(RuntimeError):
+    """Raised when an operation needs the models before they have finished loading"""
 
 
 class PromptService:
-    """Service for managing prompts"""
+    """
+    Service for managing prompts
+    
+    Works in two stages. The prompt catalog and the BM25 index are built in
+    the constructor and serve listing, lookup, rendering and lexical search
+    right away. The encoder, the FAISS index and reranking come with
+    load_models, which imports torch, transformers and faiss and may run on
+    a background thread; until it finishes, operations that need them raise
+    ModelsLoadingError.
+    """
     
-    def __init__(self, prompts_dir: str = "prompts"):
+    def __init__(
+        self,
+        prompts_dir: str = "prompts",
+        index_dir: str = "embeddings",
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        embedding_cache_size: int = 100000,
+        catalog_refresh_interval: float = 1.0,
+        query_cache_size: int = 1024,
+        query_cache_ttl: float = 600.0,
+        result_cache_size: int = 1024,
+        result_cache_ttl: float = 60.0,
+        index_config: Optional["IndexConfig"] = None,
+        chunk_tokens: int = 0,
+        chunk_overlap: int = 64,
+        max_chunks: int = 16,
+        snapshot_delay: float = 2.0,
+        rrf_k: int = 60,
+        hybrid_semantic_weight: float = 0.5,
+        load_models: bool = True
+    ):
         self.prompts_dir = Path(prompts_dir)
         self.prompts_dir.mkdir(exist_ok=True)
         
+        # Parsed prompts, re-read only when a file's mtime or size changes
+        self.catalog = PromptCatalog(self.prompts_dir, self.load_prompt_from_file)
+        self.catalog_refresh_interval = catalog_refresh_interval
+        
+        # BM25 index over the same fields as the embeddings, kept in sync with the catalog
+        self.lexical_index = BM25Index()
+        self.rrf_k = rrf_k
+        self.hybrid_semantic_weight = hybrid_semantic_weight
+        self.catalog.add_listener(self._on_catalog_change)
+        self.catalog.refresh()
+        
+        # Full search results keyed by query, parameters and index version
+        self.result_cache = TTLCache(max_size=result_cache_size, ttl=result_cache_ttl)
+        
+        # Progress of the last full reindex
+        self._reindex_lock = threading.Lock()
+        self._reindex_status: Dict[str, Any] = {'state': 'idle'}
+        
+        # Model-backed services, created by load_models
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self._model_options: Dict[str, Any] = {
+            'embedding_cache_size': embedding_cache_size,
+            'query_cache_size': query_cache_size,
+            'query_cache_ttl': query_cache_ttl,
+            'index_config': index_config,
+            'chunk_tokens': chunk_tokens,
+            'chunk_overlap': chunk_overlap,
+            'max_chunks': max_chunks,
+            'snapshot_delay': snapshot_delay
+        }
+        self.embedding_service: Optional["EmbeddingService"] = None
+        self.reranking_service: Optional["RerankingService"] = None
+        self.reranking_available = False
+        self.models_ready = False
+        
+        if load_models:
+            self.load_models(build_index=False)
+    
+    def load_models(self, build_index: bool = True, index_config: Optional["IndexConfig"] = None) -> None:
+        """
+        Load the encoder, the FAISS index and the reranking service
+        
+        Args:
+            build_index: Embed all prompts if no index was loaded from disk
+            index_config: Index backend and tuning (defaults to the one given to the constructor)
+        """
+        # Heavy dependencies (torch, transformers, faiss) are imported here, on first use
+        from app.services.encoder import get_encoder
+        from app.services.embedding_cache import EmbeddingCache
+        from app.services.embedding_service import EmbeddingService
+        from app.services.reranking_service import RerankingService
+        
+        options = self._model_options
+        
+        # One encoder (model, tokenizer and pooling) shared by both services
+        encoder = get_encoder(self.model_name)
+        
+        # Persistent document embedding cache (disabled when size is 0), keyed
+        # by backend too since backends produce slightly different vectors
+        embedding_cache = None
+        if options['embedding_cache_size'] > 0:
+            index_path = Path(self.index_dir)
+            index_path.mkdir(exist_ok=True)
+            embedding_cache = EmbeddingCache(
+                index_path / "embedding_cache.sqlite3",
+                model_name=self.model_name if encoder.backend == "torch" else f"{self.model_name}:{encoder.backend}",
+                max_entries=options['embedding_cache_size']
+            )
+        
         # Initialize embedding service
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = EmbeddingService(
+            model_name=self.model_name,
+            index_dir=self.index_dir,
+            encoder=encoder,
+            embedding_cache=embedding_cache,
+            query_cache_size=options['query_cache_size'],
+            query_cache_ttl=options['query_cache_ttl'],
+            index_config=index_config or options['index_config'],
+            chunk_tokens=options['chunk_tokens'],
+            chunk_overlap=options['chunk_overlap'],
+            max_chunks=options['max_chunks'],
+            snapshot_delay=options['snapshot_delay']
+        )
         
         # Initialize reranking service (with error handling)
         try:
-            self.reranking_service = RerankingService()
+            self.reranking_service = RerankingService(
+                model_name=self.model_name,
+                encoder=encoder,
+                embedding_cache=embedding_cache
+            )
             self.reranking_available = True
         except Exception as e:
             print(f"Reranking service initialization failed: {e}")
             self.reranking_service = None
             self.reranking_available = False
+        
+        if build_index:
+            self.ensure_index()
+        self.models_ready = True
+    
+    def _require_models(self) -> None:
+        """Raise ModelsLoadingError unless load_models has finished"""
+        if not self.models_ready:
+            raise ModelsLoadingError("Models are still loading, try again shortly")
+    
+    def _on_catalog_change(self, upserted: List[Prompt], removed_ids: List[str]) -> None:
+        """Apply catalog changes to the lexical index"""
+        self.lexical_index.remove(removed_ids)
+        self.lexical_index.upsert(upserted)
     
     def _embed_all_prompts(self):
         """Embed all prompts during service initialization"""
@@ -33,32 +179,31 @@ class PromptService:
         if prompts:
             self.embedding_service.embed_prompts(prompts, show_progress=True)
     
+    def _precompute_rerank_vectors(self):
+        """Encode reranking document vectors for every indexed prompt"""
+        if self.reranking_available and self.embedding_service.prompt_metadata:
+            self.reranking_service.precompute_document_vectors(list(self.embedding_service.prompt_metadata.values()))
+    
+    def ensure_index(self) -> None:
+        """Build the embedding index if none was loaded from disk"""
+        if self.embedding_service.index is None:
+            self._embed_all_prompts()
+        self._precompute_rerank_vectors()
+    
     def _load_all_prompts(self) -> List[Prompt]:
-        """Load all prompts from files without creating PromptList"""
-        prompts = []
-        
-        # Find all YAML files in prompts directory
-        for file_path in self.prompts_dir.glob("*.yml"):
-            prompt = self.load_prompt_from_file(file_path)
-            if prompt:
-                prompts.append(prompt)
-        
-        # Also check for .yaml files
-        for file_path in self.prompts_dir.glob("*.yaml"):
-            prompt = self.load_prompt_from_file(file_path)
-            if prompt:
-                prompts.append(prompt)
-        
-        return prompts
-    def _load_by_id(self, prompt_id: str) -> Optional[Prompt]:
-        """Load a single prompt from files without creating PromptList"""
-        file_path = self.prompts_dir / f"{prompt_id}.yml"
-        return self.load_prompt_from_file(file_path)
-    
-    def load_prompt_from_file(self, file_path: Path) -> Optional[Prompt]:
+        """Load all prompts, re-parsing only files that changed on disk"""
+        self.catalog.refresh()
+        return self.catalog.get_all()
+    
+    def _refresh_catalog(self) -> None:
+        """Pick up file changes, scanning the directory at most once per refresh interval"""
+        self.catalog.refresh(max_age=self.catalog_refresh_interval)
+    
+    @staticmethod
+    def load_prompt_from_file(file_path: Path) -> Optional[Prompt]:
         """Load a single prompt from YAML file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
+            with stage_timer("yaml_load"), open(file_path, 'r', encoding='utf-8') as file:
                 data = yaml.safe_load(file)
             
             # Convert variables from dict to Variable objects
@@ -92,23 +237,56 @@ class PromptService:
     
     def get_all_prompts(self) -> PromptList:
         """Get all prompts from the prompts directory"""
-        prompts = self._load_all_prompts()
+        self._refresh_catalog()
+        prompts = self.catalog.get_all()
         return PromptList(prompts=prompts, total=len(prompts))
     
+    def get_all_prompts_json(self) -> Tuple[int, bytes]:
+        """Get (catalog version, serialized PromptList), cached until the catalog changes"""
+        self._refresh_catalog()
+        return self.catalog.get_listing_json()
+    
+    def get_prompts_page_json(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[int, bytes]:
+        """
+        Get one page of prompts, ordered by id, as serialized JSON
+
+        Args:
+            cursor: Cursor returned with the previous page (None for the first page)
+            limit: Maximum number of prompts on the page (None for all remaining)
+            fields: Prompt fields to include (None for all)
+
+        Returns:
+            Tuple of (catalog version, serialized page)
+        """
+        self._refresh_catalog()
+        return self.catalog.get_page_json(cursor, limit, fields)
+    
+    def get_catalog_version(self) -> int:
+        """Get the version of the up-to-date catalog (bumped on every change)"""
+        self._refresh_catalog()
+        return self.catalog.version
+    
     def get_prompt_by_id(self, prompt_id: str) -> Optional[Prompt]:
         """Get a specific prompt by ID"""
-        return self._load_by_id(prompt_id)
+        self._refresh_catalog()
+        return self.catalog.get(prompt_id)
     
-    def render_prompt_with_variables(self, prompt_id: str, variable_values: Dict[str, Any]) -> Optional[PromptWithValues]:
-        """Render a prompt with variable values"""
-        prompt = self.get_prompt_by_id(prompt_id)
-        if not prompt:
-            return None
-        
-        rendered_text = prompt.prompt
+    def get_prompt_entry(self, prompt_id: str) -> Optional[CatalogEntry]:
+        """Get the catalog entry (prompt, compiled template, version) for a prompt ID"""
+        self._refresh_catalog()
+        return self.catalog.get_entry(prompt_id)
+    
+    def _render_entry(self, entry: CatalogEntry, variable_values: Dict[str, Any]) -> str:
+        """Render a catalog entry's compiled template with variable values"""
+        values = {}
         
-        # Replace variables in the text
-        for variable in prompt.variables:
+        # Resolve declared variables
+        for variable in entry.prompt.variables:
             var_name = variable.name
             var_value = variable_values.get(var_name)
             
@@ -120,23 +298,81 @@ class PromptService:
                 else:
                     var_value = ""
             
-            # Replace placeholder in text (format: {{variable_name}})
-            placeholder = f"{{{{{var_name}}}}}"
-            rendered_text = rendered_text.replace(placeholder, str(var_value))
+            values[var_name] = str(var_value)
+        
+        # Placeholders that are not declared are filled only when a value is given
+        for var_name in entry.template.undeclared:
+            if variable_values.get(var_name) is not None:
+                values[var_name] = str(variable_values[var_name])
+        
+        # Single pass over the precompiled template (format: {{variable_name}})
+        return entry.template.render(values)
+    
+    def render_prompt_with_variables(self, prompt_id: str, variable_values: Dict[str, Any]) -> Optional[PromptWithValues]:
+        """Render a prompt with variable values"""
+        self._refresh_catalog()
+        entry = self.catalog.get_entry(prompt_id)
+        if not entry:
+            return None
         
         return PromptWithValues(
-            prompt=prompt,
+            prompt=entry.prompt,
             variable_values=variable_values,
-            rendered_text=rendered_text
+            rendered_text=self._render_entry(entry, variable_values)
         )
     
+    def render_prompts_batch(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Render many (prompt id, variable values) pairs
+        
+        Each prompt is looked up in the catalog once per batch. Errors are
+        reported per item so one bad item does not fail the whole batch.
+        
+        Args:
+            items: Pairs of prompt id and variable values
+            
+        Yields:
+            One result per item, in order: either 'rendered_text' or 'error' with a 'status' code
+        """
+        self._refresh_catalog()
+        entries: Dict[str, Optional[CatalogEntry]] = {}
+        
+        for index, (prompt_id, variable_values) in enumerate(items):
+            if prompt_id not in entries:
+                entries[prompt_id] = self.catalog.get_entry(prompt_id)
+            entry = entries[prompt_id]
+            
+            if entry is None:
+                yield {
+                    'index': index,
+                    'prompt_id': prompt_id,
+                    'status': 404,
+                    'error': f"Prompt with ID '{prompt_id}' not found"
+                }
+                continue
+            
+            try:
+                yield {
+                    'index': index,
+                    'prompt_id': prompt_id,
+                    'rendered_text': self._render_entry(entry, variable_values or {})
+                }
+            except ValueError as e:
+                yield {'index': index, 'prompt_id': prompt_id, 'status': 400, 'error': str(e)}
+            except Exception as e:
+                yield {'index': index, 'prompt_id': prompt_id, 'status': 500, 'error': f"Error rendering prompt: {str(e)}"}
+    
     def search_prompts(
         self, 
         query: str, 
         top_k: int = 5, 
         use_reranking: bool = True,
         relevance_threshold: float = 0.3,
-        initial_candidates: int = 20
+        initial_candidates: int = 20,
+        search_mode: str = "semantic",
+        fusion: str = "rrf",
+        tags: Optional[List[str]] = None,
+        tag_match: str = "any"
     ) -> List[Dict]:
         """
         Search for similar prompts using embeddings with optional reranking
@@ -147,43 +383,430 @@ class PromptService:
             use_reranking: Whether to use reranking for better results
             relevance_threshold: Minimum relevance score for reranking
             initial_candidates: Number of initial candidates from FAISS
+            search_mode: "semantic" (FAISS), "lexical" (BM25, no model and no
+                reranking) or "hybrid" (both, fused)
+            fusion: How hybrid search combines rankings, "rrf" or "weighted"
+            tags: Only return prompts with these tags (case-insensitive); the
+                filter is applied during retrieval, not to the final top_k
+            tag_match: "any" to require one of the tags, "all" to require every tag
             
         Returns:
             List of similar prompts with scores
         """
-        # Get initial candidates from FAISS
-        initial_results = self.embedding_service.search_similar_prompts(query, initial_candidates)
+        return self.search_prompts_many([{
+            'query': query,
+            'top_k': top_k,
+            'use_reranking': use_reranking,
+            'relevance_threshold': relevance_threshold,
+            'initial_candidates': initial_candidates,
+            'search_mode': search_mode,
+            'fusion': fusion,
+            'tags': tags,
+            'tag_match': tag_match
+        }])[0]
+    
+    def search_prompts_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        use_reranking: bool = True,
+        relevance_threshold: float = 0.3,
+        initial_candidates: int = 20,
+        search_mode: str = "semantic",
+        fusion: str = "rrf",
+        tags: Optional[List[str]] = None,
+        tag_match: str = "any",
+        chunk_size: int = 1024
+    ) -> List[List[Dict]]:
+        """
+        Search for many queries with the same parameters
         
-        if not use_reranking or not initial_results or not self.reranking_available:
-            # Return top_k from initial results
-            return initial_results[:top_k]
+        Meant for offline jobs and backfills: queries are processed in
+        chunks, each encoded in batches, looked up with one multi-query
+        FAISS search and reranked in a vectorized way. The query and result
+        caches are bypassed so a large backfill does not evict entries that
+        interactive searches rely on.
         
-        try:
-            # Apply reranking with relevance filtering
-            reranked_results = self.reranking_service.rerank_results(
-                query=query,
-                candidates=initial_results,
-                top_k=top_k,
-                relevance_threshold=relevance_threshold,
-                show_progress=True
+        Args:
+            queries: Search queries
+            top_k: Number of top results to return per query
+            use_reranking: Whether to use reranking for better results
+            relevance_threshold: Minimum relevance score for reranking
+            initial_candidates: Number of initial candidates from FAISS
+            search_mode: "semantic", "lexical" or "hybrid" (see search_prompts)
+            fusion: How hybrid search combines rankings, "rrf" or "weighted"
+            tags: Only return prompts with these tags (see search_prompts)
+            tag_match: "any" to require one of the tags, "all" to require every tag
+            chunk_size: Number of queries processed per pass
+            
+        Returns:
+            One list of similar prompts with scores per query, in order
+        """
+        results: List[List[Dict]] = []
+        for start in range(0, len(queries), chunk_size):
+            results.extend(self.search_prompts_many([{
+                'query': query,
+                'top_k': top_k,
+                'use_reranking': use_reranking,
+                'relevance_threshold': relevance_threshold,
+                'initial_candidates': initial_candidates,
+                'search_mode': search_mode,
+                'fusion': fusion,
+                'tags': tags,
+                'tag_match': tag_match
+            } for query in queries[start:start + chunk_size]], use_cache=False))
+        return results
+    
+    def search_prompts_many(self, requests: List[Dict[str, Any]], use_cache: bool = True) -> List[List[Dict]]:
+        """
+        Run several searches, each with its own parameters, in one pass
+        
+        Requests answered by the result cache are skipped; the remaining
+        semantic and hybrid queries are encoded in one batch, looked up with
+        a single FAISS search and reranked together, each with its own
+        parameters. Lexical queries never touch the model.
+        
+        Args:
+            requests: Keyword arguments of search_prompts, one dict per search
+            use_cache: Whether to read and fill the query and result caches
+            
+        Returns:
+            One result list per request, in order
+            
+        Raises:
+            ModelsLoadingError: If a semantic or hybrid search arrives before the models are loaded
+        """
+        requests = [{
+            'query': request['query'],
+            'top_k': request.get('top_k', 5),
+            'use_reranking': request.get('use_reranking', True),
+            'relevance_threshold': request.get('relevance_threshold', 0.3),
+            'initial_candidates': request.get('initial_candidates', 20),
+            'search_mode': request.get('search_mode', 'semantic'),
+            'fusion': request.get('fusion', 'rrf'),
+            'tags': tuple(normalize_tags(request.get('tags'))),
+            'tag_match': request.get('tag_match', 'any')
+        } for request in requests]
+        
+        for request in requests:
+            if request['search_mode'] not in SEARCH_MODES:
+                raise ValueError(f"Unknown search mode '{request['search_mode']}', expected one of {', '.join(SEARCH_MODES)}")
+            if request['fusion'] not in FUSION_METHODS:
+                raise ValueError(f"Unknown fusion method '{request['fusion']}', expected one of {', '.join(FUSION_METHODS)}")
+            if request['tag_match'] not in TAG_MATCH_MODES:
+                raise ValueError(f"Unknown tag match '{request['tag_match']}', expected one of {', '.join(TAG_MATCH_MODES)}")
+        
+        # Lexical search works while the models load; the result cache is
+        # keyed by the index version, so it waits for them
+        if any(request['search_mode'] != 'lexical' for request in requests):
+            self._require_models()
+        use_cache = use_cache and self.models_ready
+        
+        # BM25 follows the catalog, so pick up file changes as other reads do
+        if any(request['search_mode'] != 'semantic' for request in requests):
+            self._refresh_catalog()
+        
+        results: List[Optional[List[Dict]]] = [None] * len(requests)
+        cache_keys: List[Optional[tuple]] = [None] * len(requests)
+        
+        if use_cache and self.result_cache.enabled:
+            index_version = self.embedding_service.index_version
+            for i, request in enumerate(requests):
+                cache_keys[i] = (
+                    self.embedding_service.normalize_query(request['query']),
+                    request['top_k'],
+                    request['use_reranking'] and self.reranking_available,
+                    request['relevance_threshold'],
+                    request['initial_candidates'],
+                    request['search_mode'],
+                    request['fusion'],
+                    request['tags'],
+                    request['tag_match'],
+                    index_version,
+                    self.catalog.version
+                )
+                cached = self.result_cache.get(cache_keys[i])
+                if cached is not None:
+                    results[i] = [result.copy() for result in cached]
+        
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        # Encode every query that needs the model in one batch and get initial
+        # candidates from FAISS with one search per tag filter, each at the
+        # largest depth requested with that filter
+        semantic = [i for i in pending if requests[i]['search_mode'] != 'lexical']
+        initial_batches: Dict[int, List[Dict]] = {}
+        if semantic:
+            query_vectors = self.embedding_service.encode_queries(
+                [requests[i]['query'] for i in semantic],
+                use_cache=use_cache
             )
+            groups: Dict[tuple, List[int]] = {}
+            for row, i in enumerate(semantic):
+                groups.setdefault((requests[i]['tags'], requests[i]['tag_match']), []).append(row)
             
-            return reranked_results
-        except Exception as e:
-            print(f"Reranking failed, falling back to initial results: {e}")
-            # Return top_k from initial results if reranking fails
-            return initial_results[:top_k]
+            for (tags, tag_match), rows in groups.items():
+                candidates = max(requests[semantic[row]]['initial_candidates'] for row in rows)
+                group_results = self.embedding_service.search_by_vectors(
+                    query_vectors[rows],
+                    candidates,
+                    tags=list(tags),
+                    tag_match=tag_match
+                )
+                for row, initial_results in zip(rows, group_results):
+                    i = semantic[row]
+                    initial_batches[i] = initial_results[:requests[i]['initial_candidates']]
+        
+        # Get BM25 candidates, fused with the FAISS candidates in hybrid mode
+        for i in pending:
+            request = requests[i]
+            if request['search_mode'] == 'semantic':
+                continue
+            
+            lexical_results = self._search_lexical(
+                request['query'],
+                request['initial_candidates'],
+                tags=list(request['tags']),
+                tag_match=request['tag_match']
+            )
+            if request['search_mode'] == 'lexical':
+                initial_batches[i] = lexical_results
+            else:
+                initial_batches[i] = fuse_results(
+                    initial_batches[i],
+                    lexical_results,
+                    method=request['fusion'],
+                    rrf_k=self.rrf_k,
+                    semantic_weight=self.hybrid_semantic_weight
+                )[:request['initial_candidates']]
+        
+        # Without reranking, return top_k from initial results
+        for i in pending:
+            results[i] = initial_batches[i][:requests[i]['top_k']]
+        
+        # Rerank the rest together, with relevance filtering
+        rerank_rows = []
+        if self.reranking_available:
+            rerank_rows = [
+                row for row, i in enumerate(semantic)
+                if requests[i]['use_reranking'] and initial_batches[i]
+            ]
+        if rerank_rows:
+            with stage_timer("rerank"):
+                reranked = self.reranking_service.rerank_results_batch(
+                    query_vectors[rerank_rows],
+                    [initial_batches[semantic[row]] for row in rerank_rows],
+                    top_k=[requests[semantic[row]]['top_k'] for row in rerank_rows],
+                    relevance_threshold=[requests[semantic[row]]['relevance_threshold'] for row in rerank_rows]
+                )
+            for row, reranked_results in zip(rerank_rows, reranked):
+                results[semantic[row]] = reranked_results
+        
+        for i in pending:
+            if cache_keys[i] is not None:
+                self.result_cache.put(cache_keys[i], [result.copy() for result in results[i]])
+        
+        return results
+    
+    def _search_lexical(
+        self,
+        query: str,
+        top_k: int,
+        tags: Optional[List[str]] = None,
+        tag_match: str = "any"
+    ) -> List[Dict]:
+        """
+        Search the BM25 index
+        
+        Args:
+            query: Search query
+            top_k: Number of top results to return
+            tags: Normalized tags to restrict the search to (None or empty for no filter)
+            tag_match: "any" to require one of the tags, "all" to require every tag
+            
+        Returns:
+            List of matching prompts with their BM25 'lexical_score'
+        """
+        accept = None
+        if tags:
+            def accept(prompt_id: str) -> bool:
+                prompt = self.catalog.get(prompt_id)
+                return prompt is not None and matches_tags(prompt.tags, tags, tag_match)
+        
+        with stage_timer("lexical_search"):
+            hits = self.lexical_index.search(query, top_k, accept=accept)
+        
+        results = []
+        for prompt_id, score in hits:
+            prompt = self.catalog.get(prompt_id)
+            if prompt is not None:
+                results.append({
+                    'id': prompt.id,
+                    'title': prompt.title,
+                    'description': prompt.description,
+                    'tags': prompt.tags,
+                    'lexical_score': score
+                })
+        return results
+    
+    def get_cache_stats(self) -> Dict:
+        """Get hit/miss counters of the query embedding and search result caches"""
+        self._require_models()
+        return {
+            'query_embeddings': self.embedding_service.query_cache.get_stats(),
+            'search_results': self.result_cache.get_stats()
+        }
     
     def get_embedding_stats(self) -> Dict:
-        """Get statistics about the embedding index"""
-        return self.embedding_service.get_index_stats()
+        """Get statistics about the embedding and lexical indexes"""
+        self._require_models()
+        stats = self.embedding_service.get_index_stats()
+        stats['lexical_index'] = self.lexical_index.get_stats()
+        return stats
     
     def get_reranking_stats(self, results: List[Dict]) -> Dict:
         """Get statistics about reranking results"""
+        self._require_models()
         return self.reranking_service.get_reranking_stats(results)
     
+    def reindex_prompt(self, prompt_id: str) -> Optional[Prompt]:
+        """
+        Re-embed a single prompt from its file and update it in the index
+        
+        Args:
+            prompt_id: Id of the prompt to reindex
+            
+        Returns:
+            The reindexed prompt, or None if it does not exist
+        """
+        prompt = self.get_prompt_by_id(prompt_id)
+        if not prompt:
+            return None
+        
+        self.apply_prompt_changes([prompt], [])
+        return prompt
+    
+    def remove_prompt_from_index(self, prompt_id: str) -> bool:
+        """
+        Remove a single prompt from the index
+        
+        Args:
+            prompt_id: Id of the prompt to remove
+            
+        Returns:
+            True if the prompt was indexed and has been removed
+        """
+        self._require_models()
+        return self.embedding_service.delete_prompts([prompt_id]) > 0
+    
+    def apply_prompt_changes(self, upserted: List[Prompt], removed_ids: List[str]) -> None:
+        """
+        Apply an incremental set of prompt changes to the index
+        
+        Args:
+            upserted: Prompts that were created or modified
+            removed_ids: Ids of prompts that were deleted
+        """
+        self._require_models()
+        if removed_ids:
+            self.embedding_service.delete_prompts(removed_ids)
+        
+        if upserted:
+            self.embedding_service.upsert_prompts(upserted, show_progress=False)
+            if self.reranking_available:
+                self.reranking_service.precompute_document_vectors([
+                    {'title': prompt.title, 'description': prompt.description, 'tags': prompt.tags}
+                    for prompt in upserted
+                ])
+    
+    def _begin_reindex(self) -> bool:
+        """Mark a full reindex as running, unless one already is"""
+        with self._reindex_lock:
+            if self._reindex_status['state'] == 'running':
+                return False
+            self._reindex_status = {
+                'state': 'running',
+                'phase': 'loading',
+                'processed': 0,
+                'total': 0,
+                'started_at': time.time(),
+                'finished_at': None,
+                'error': None
+            }
+            return True
+    
+    def _update_reindex_status(self, **fields: Any) -> None:
+        """Update fields of the reindex status"""
+        with self._reindex_lock:
+            self._reindex_status.update(fields)
+    
+    def _on_reindex_progress(self, phase: str, processed: int, total: int) -> None:
+        """Record progress reported by the index rebuild"""
+        self._update_reindex_status(phase=phase, processed=processed, total=total)
+    
+    def start_reindex(self) -> bool:
+        """
+        Start a full reindex on a background thread
+        
+        Returns:
+            False if a reindex is already running
+        """
+        self._require_models()
+        if not self._begin_reindex():
+            return False
+        
+        thread = threading.Thread(target=self._reindex_in_background, name="reindex", daemon=True)
+        thread.start()
+        return True
+    
+    def _reindex_in_background(self) -> None:
+        """Background thread body for start_reindex"""
+        try:
+            self._run_reindex()
+        except Exception as e:
+            print(f"Reindexing failed: {e}")
+    
     def reindex_prompts(self) -> None:
-        """Reindex all prompts (useful when prompts are updated)"""
+        """
+        Reindex all prompts (useful when prompts are updated)
+        
+        Runs in the calling thread; see start_reindex for the background variant.
+        
+        Raises:
+            RuntimeError: If a reindex is already running
+        """
+        self._require_models()
+        if not self._begin_reindex():
+            raise RuntimeError("A reindex is already running")
+        self._run_reindex()
+    
+    def _run_reindex(self) -> None:
+        """
+        Build a new index generation from all prompts and swap it in
+        
+        Searches keep using the current index until the new one is ready.
+        """
         print("Reindexing all prompts...")
-        self.embedding_service.clear_index()
-        self._embed_all_prompts() 
\ No newline at end of file
+        try:
+            self.embedding_service.rebuild_index(self._load_all_prompts, progress=self._on_reindex_progress)
+            self.result_cache.clear()
+            
+            self._update_reindex_status(phase='reranking')
+            self._precompute_rerank_vectors()
+            
+            self._update_reindex_status(state='completed', phase=None, finished_at=time.time())
+        except Exception as e:
+            self._update_reindex_status(state='failed', error=str(e), finished_at=time.time())
+            raise
+    
+    def get_reindex_status(self) -> Dict[str, Any]:
+        """Get the state and progress of the current or last full reindex"""
+        with self._reindex_lock:
+            status = dict(self._reindex_status)
+        
+        if 'started_at' in status:
+            status['duration_seconds'] = (status['finished_at'] or time.time()) - status['started_at']
+        status['index_version'] = self.embedding_service.index_version if self.embedding_service is not None else None
+        return status
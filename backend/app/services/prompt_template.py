@@ -0,0 +1,60 @@
+import re
+from typing import Dict, Iterable, List
+
+
+# Placeholders use the {{variable_name}} format
+PLACEHOLDER_PATTERN = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+class CompiledTemplate:
+    """
+    Prompt text parsed once into literal segments and placeholder names
+
+    Rendering walks the segments and joins them in a single pass, so the
+    cost is proportional to the output size rather than to the number of
+    variables times the text length.
+    """
+
+    __slots__ = ("literals", "names", "undeclared")
+
+    def __init__(self, text: str, declared: Iterable[str] = ()):
+        """
+        Parse a prompt text
+
+        Args:
+            text: Prompt text containing {{variable_name}} placeholders
+            declared: Names of the variables declared for the prompt
+        """
+        self.literals: List[str] = []
+        self.names: List[str] = []
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.literals.append(text[position:match.start()])
+            self.names.append(match.group(1))
+            position = match.end()
+        self.literals.append(text[position:])
+
+        # Placeholders with no matching variable declaration, in order of appearance
+        declared = set(declared)
+        self.undeclared: List[str] = list(dict.fromkeys(name for name in self.names if name not in declared))
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Render the template
+
+        Placeholders without a value are kept verbatim.
+
+        Args:
+            values: Mapping of placeholder name to replacement text
+
+        Returns:
+            Rendered text
+        """
+        literals = self.literals
+        parts = [literals[0]]
+        for name, literal in zip(self.names, literals[1:]):
+            value = values.get(name)
+            parts.append(f"{{{{{name}}}}}" if value is None else value)
+            parts.append(literal)
+        return "".join(parts)
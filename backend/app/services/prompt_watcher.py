@@ -0,0 +1,127 @@
+import threading
+import time
+from typing import List, Optional, Set
+
+from app.models.prompt import Prompt
+from app.services.prompt_service import PromptService
+
+
+
+class PromptWatcher:
+    """
+    Background watcher that keeps the catalog and index in sync with the prompts directory
+
+    The watcher periodically refreshes the prompt catalog, which re-parses
+    only files whose mtime or size changed. Changed prompt ids (whether the
+    change was picked up by the watcher or by a request) are collected until
+    the directory has been quiet for the debounce period, then applied to
+    the index incrementally. Everything runs on a daemon thread, off the
+    request path, and needs nothing beyond the filesystem.
+    """
+
+    def __init__(self, prompt_service: PromptService, interval: float = 1.0, debounce: float = 0.5):
+        """
+        Initialize prompt watcher
+
+        Args:
+            prompt_service: Service whose catalog and index are kept in sync
+            interval: Seconds between directory scans
+            debounce: Seconds without further changes before a burst is applied
+        """
+        self.prompt_service = prompt_service
+        self.interval = interval
+        self.debounce = debounce
+
+        self._pending: Set[str] = set()
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        prompt_service.catalog.add_listener(self._on_catalog_change)
+
+    def _on_catalog_change(self, upserted: List[Prompt], removed_ids: List[str]) -> None:
+        """Record prompt ids changed by a catalog refresh"""
+        with self._lock:
+            self._pending.update(prompt.id for prompt in upserted)
+            self._pending.update(removed_ids)
+            self._last_change = time.monotonic()
+
+    def start(self) -> None:
+        """Sync the index with the directory and start watching in the background"""
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prompt-watcher", daemon=True)
+        self._thread.start()
+        print(f"Watching {self.prompt_service.prompts_dir} for prompt changes")
+
+    def stop(self) -> None:
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+    def _run(self) -> None:
+        """Watcher thread body"""
+        try:
+            self._initial_sync()
+        except Exception as e:
+            print(f"Prompt watcher initial sync failed: {e}")
+
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Prompt watcher error: {e}")
+
+    def _initial_sync(self) -> None:
+        """Queue prompts whose file changed, appeared or disappeared since the index was saved"""
+        self.prompt_service.catalog.refresh()
+        out_of_sync = self.prompt_service.embedding_service.get_out_of_sync_ids(self.prompt_service.catalog.get_all())
+        if not out_of_sync:
+            return
+        with self._lock:
+            self._pending.update(out_of_sync)
+        self._apply()
+
+    def poll(self, force: bool = False) -> None:
+        """
+        Refresh the catalog once and apply changes if the debounce period has passed
+
+        Args:
+            force: Apply pending changes immediately, ignoring the debounce period
+        """
+        self.prompt_service.catalog.refresh()
+
+        with self._lock:
+            ready = self._pending and (force or time.monotonic() - self._last_change >= self.debounce)
+        if ready:
+            self._apply()
+
+    def _apply(self) -> None:
+        """
+        Upsert prompts present in the catalog and remove the others from the index
+
+        If applying fails, the ids go back into the pending set and are
+        retried after the next debounce period.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+
+        try:
+            catalog = self.prompt_service.catalog
+            upserted = [catalog.get(prompt_id) for prompt_id in sorted(pending) if catalog.get(prompt_id) is not None]
+            removed_ids = [prompt_id for prompt_id in sorted(pending) if catalog.get(prompt_id) is None]
+
+            if upserted or removed_ids:
+                print(f"Prompt changes detected: {len(upserted)} updated, {len(removed_ids)} removed")
+                self.prompt_service.apply_prompt_changes(upserted, removed_ids)
+        except Exception:
+            with self._lock:
+                self._pending |= pending
+                self._last_change = time.monotonic()
+            raise
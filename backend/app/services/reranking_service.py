@@ -1,27 +1,41 @@
-import torch
-from transformers import AutoTokenizer, AutoModel
-from typing import List, Dict, Tuple
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
 import numpy as np
-from tqdm import tqdm
+
+from app.services.encoder import TextEncoder, get_encoder
+from app.services.embedding_cache import EmbeddingCache
 
 
 class RerankingService:
     """Service for reranking search results with relevance filtering"""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        encoder: Optional[TextEncoder] = None,
+        max_cached_documents: int = 10000,
+        embedding_cache: Optional[EmbeddingCache] = None
+    ):
         """
         Initialize reranking service
         
         Args:
             model_name: Name of the model for reranking (using same model as embedding for consistency)
+            encoder: Shared text encoder (defaults to the process-wide encoder for model_name)
+            max_cached_documents: Maximum number of document vectors kept in memory
+            embedding_cache: Persistent cache backing the in-memory document vectors (optional)
         """
         self.model_name = model_name
-        print(f"Loading reranking model: {model_name}")
         
-        # Load model and tokenizer
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
-        self.model.eval()
+        # Reuse the encoder loaded for embeddings instead of a second copy
+        self.encoder = encoder or get_encoder(model_name)
+        
+        # Normalized document vectors keyed by document text (LRU)
+        self.max_cached_documents = max_cached_documents
+        self._document_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.embedding_cache = embedding_cache
     
     def rerank_results(
         self, 
@@ -29,7 +43,8 @@ class RerankingService:
         candidates: List[Dict], 
         top_k: int = 5,
         relevance_threshold: float = 0.3,
-        show_progress: bool = True
+        show_progress: bool = False,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[Dict]:
         """
         Rerank search results using semantic similarity
@@ -39,7 +54,8 @@ class RerankingService:
             candidates: List of candidate prompts from FAISS search
             top_k: Number of top results to return
             relevance_threshold: Minimum relevance score to include
-            show_progress: Whether to show progress bar
+            show_progress: Whether to show progress bar when encoding uncached documents
+            query_vector: Precomputed query embedding (encoded here if not given)
             
         Returns:
             Reranked list of prompts with relevance scores
@@ -48,36 +64,101 @@ class RerankingService:
             return []
         
         try:
-            # Prepare query-document pairs
-            pairs = []
-            for candidate in candidates:
-                doc_text = self._create_document_text(candidate)
-                pairs.append((query, doc_text))
+            documents = [self._create_document_text(candidate) for candidate in candidates]
             
             # Get similarity scores
-            scores = self._get_similarity_scores(pairs, show_progress)
-            
-            # Combine candidates with scores and filter by threshold
-            scored_candidates = []
-            for candidate, score in zip(candidates, scores):
-                candidate_copy = candidate.copy()
-                candidate_copy['relevance_score'] = float(score)
-                candidate_copy['reranked_score'] = float(score)
-                
-                if score >= relevance_threshold:
-                    scored_candidates.append(candidate_copy)
+            scores = self._get_similarity_scores(query, documents, show_progress, query_vector)
             
-            # Sort by relevance score (descending)
-            scored_candidates.sort(key=lambda x: x['relevance_score'], reverse=True)
-            
-            # Return top_k results
-            return scored_candidates[:top_k]
+            return self._select(candidates, scores, top_k, relevance_threshold)
             
         except Exception as e:
             print(f"Error in reranking: {e}")
             # Fallback to original results
             return candidates[:top_k]
     
+    def rerank_results_batch(
+        self,
+        query_vectors: np.ndarray,
+        candidate_lists: List[List[Dict]],
+        top_k: List[int],
+        relevance_threshold: List[float]
+    ) -> List[List[Dict]]:
+        """
+        Rerank the candidates of several queries at once
+        
+        Document vectors for every distinct candidate are fetched (or
+        encoded) in one batch, and all scores are computed with a single
+        batched product over a padded candidate matrix.
+        
+        Args:
+            query_vectors: Query embeddings, one row per query
+            candidate_lists: Candidate prompts from FAISS search, one list per query
+            top_k: Number of top results to return, per query
+            relevance_threshold: Minimum relevance score to include, per query
+            
+        Returns:
+            Reranked list of prompts with relevance scores, one per query
+        """
+        if not candidate_lists:
+            return []
+        
+        try:
+            # One vector per distinct document across all queries
+            documents = [
+                [self._create_document_text(candidate) for candidate in candidates]
+                for candidates in candidate_lists
+            ]
+            unique_documents = list(dict.fromkeys(document for row in documents for document in row))
+            if not unique_documents:
+                return [[] for _ in candidate_lists]
+            
+            positions = {document: i for i, document in enumerate(unique_documents)}
+            document_vectors = self._get_document_vectors(unique_documents)
+            
+            # Pad candidate lists to a (queries, candidates) index matrix
+            width = max(len(row) for row in documents)
+            index = np.zeros((len(documents), width), dtype=np.int64)
+            for i, row in enumerate(documents):
+                index[i, :len(row)] = [positions[document] for document in row]
+            
+            queries = self._normalize(np.asarray(query_vectors, dtype=np.float32))
+            scores = np.einsum('qcd,qd->qc', document_vectors[index], queries)
+            scores = np.clip(scores, 0.0, 1.0)
+            
+            return [
+                self._select(candidates, scores[i, :len(candidates)], top_k[i], relevance_threshold[i])
+                for i, candidates in enumerate(candidate_lists)
+            ]
+            
+        except Exception as e:
+            print(f"Error in batch reranking: {e}")
+            # Fallback to original results
+            return [candidates[:k] for candidates, k in zip(candidate_lists, top_k)]
+    
+    def _select(
+        self,
+        candidates: List[Dict],
+        scores: np.ndarray,
+        top_k: int,
+        relevance_threshold: float
+    ) -> List[Dict]:
+        """Attach scores, drop candidates under the threshold and keep the top_k best"""
+        # Combine candidates with scores and filter by threshold
+        scored_candidates = []
+        for candidate, score in zip(candidates, scores):
+            candidate_copy = candidate.copy()
+            candidate_copy['relevance_score'] = float(score)
+            candidate_copy['reranked_score'] = float(score)
+            
+            if score >= relevance_threshold:
+                scored_candidates.append(candidate_copy)
+        
+        # Sort by relevance score (descending)
+        scored_candidates.sort(key=lambda x: x['relevance_score'], reverse=True)
+        
+        # Return top_k results
+        return scored_candidates[:top_k]
+    
     def _create_document_text(self, candidate: Dict) -> str:
         """
         Create document text from candidate metadata
@@ -101,71 +182,92 @@ class RerankingService:
         
         return " | ".join(parts)
     
+    def precompute_document_vectors(self, candidates: List[Dict], show_progress: bool = False) -> None:
+        """
+        Encode and cache document vectors ahead of search time
+        
+        Args:
+            candidates: Prompt metadata entries (as stored in the embedding index)
+            show_progress: Whether to show progress bar
+        """
+        documents = [self._create_document_text(candidate) for candidate in candidates]
+        self._get_document_vectors(documents, show_progress)
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize the rows of a matrix"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+    
+    def _get_document_vectors(self, documents: List[str], show_progress: bool = False) -> np.ndarray:
+        """
+        Get normalized vectors for documents, encoding uncached ones in one batch
+        
+        Args:
+            documents: Document texts
+            show_progress: Whether to show progress bar
+            
+        Returns:
+            Matrix with one normalized vector per document
+        """
+        vectors: Dict[str, np.ndarray] = {}
+        
+        with self._lock:
+            for document in documents:
+                vector = self._document_vectors.get(document)
+                if vector is not None:
+                    self._document_vectors.move_to_end(document)
+                    vectors[document] = vector
+        
+        missing = [document for document in dict.fromkeys(documents) if document not in vectors]
+        if missing:
+            def encode(batch: List[str]) -> np.ndarray:
+                return self.encoder.encode(batch, max_length=512, show_progress=show_progress)
+            
+            if self.embedding_cache is not None:
+                encoded = self._normalize(self.embedding_cache.get_or_encode(missing, encode))
+            else:
+                encoded = self._normalize(encode(missing))
+            
+            with self._lock:
+                for document, vector in zip(missing, encoded):
+                    vectors[document] = vector
+                    self._document_vectors[document] = vector
+                while len(self._document_vectors) > self.max_cached_documents:
+                    self._document_vectors.popitem(last=False)
+        
+        return np.stack([vectors[document] for document in documents])
+    
     def _get_similarity_scores(
         self, 
-        pairs: List[Tuple[str, str]], 
-        show_progress: bool = True
-    ) -> List[float]:
+        query: str, 
+        documents: List[str], 
+        show_progress: bool = False,
+        query_vector: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
-        Get similarity scores for query-document pairs
+        Get cosine similarity scores between a query and documents
+        
+        The query is encoded once, document vectors come from the cache (or
+        one batched forward pass for misses), and all scores are computed
+        with a single matrix-vector product.
         
         Args:
-            pairs: List of (query, document) pairs
+            query: Search query
+            documents: Document texts
             show_progress: Whether to show progress bar
+            query_vector: Precomputed query embedding (encoded here if not given)
             
         Returns:
-            List of similarity scores
-        """
-        scores = []
-        
-        iterator = tqdm(pairs, desc="Reranking results") if show_progress else pairs
-        
-        for query, document in iterator:
-            try:
-                # Tokenize both query and document
-                query_inputs = self.tokenizer(
-                    query,
-                    padding=True,
-                    truncation=True,
-                    max_length=512,
-                    return_tensors="pt"
-                )
-                
-                doc_inputs = self.tokenizer(
-                    document,
-                    padding=True,
-                    truncation=True,
-                    max_length=512,
-                    return_tensors="pt"
-                )
-                
-                # Generate embeddings
-                with torch.no_grad():
-                    query_outputs = self.model(**query_inputs)
-                    doc_outputs = self.model(**doc_inputs)
-                    
-                    # Use mean pooling
-                    query_attention_mask = query_inputs['attention_mask']
-                    doc_attention_mask = doc_inputs['attention_mask']
-                    
-                    query_embeddings = query_outputs.last_hidden_state * query_attention_mask.unsqueeze(-1)
-                    query_embeddings = query_embeddings.sum(dim=1) / query_attention_mask.sum(dim=1, keepdim=True)
-                    
-                    doc_embeddings = doc_outputs.last_hidden_state * doc_attention_mask.unsqueeze(-1)
-                    doc_embeddings = doc_embeddings.sum(dim=1) / doc_attention_mask.sum(dim=1, keepdim=True)
-                    
-                    # Calculate cosine similarity
-                    query_emb = query_embeddings.squeeze().cpu().numpy()
-                    doc_emb = doc_embeddings.squeeze().cpu().numpy()
-                    
-                    similarity = np.dot(query_emb, doc_emb) / (np.linalg.norm(query_emb) * np.linalg.norm(doc_emb))
-                    scores.append(max(0.0, min(1.0, similarity)))  # Clamp to [0, 1]
-                    
-            except Exception as e:
-                print(f"Error calculating similarity: {e}")
-                scores.append(0.0)  # Fallback score
-        
-        return scores
+            Array of similarity scores clamped to [0, 1]
+        """
+        if query_vector is None:
+            query_vector = self.encoder.encode([query], max_length=512)
+        query_vector = self._normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        document_vectors = self._get_document_vectors(documents, show_progress)
+        
+        scores = document_vectors @ query_vector
+        return np.clip(scores, 0.0, 1.0)
     
     def filter_by_relevance(
         self, 
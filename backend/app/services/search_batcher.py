@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.inference_executor import InferenceExecutor
+from app.services.prompt_service import PromptService
+
+
+class SearchBatcher:
+    """
+    Async micro-batcher for concurrent search requests
+
+    Searches arriving within a short window (or until max_batch_size have
+    queued up) are handed to PromptService.search_prompts_many as one task
+    on the inference executor. The queries are encoded in a single forward
+    pass and looked up with a single FAISS search, and each caller receives
+    its own results. This trades up to max_wait seconds of latency for much
+    higher throughput under concurrent load.
+    """
+
+    def __init__(
+        self,
+        prompt_service: PromptService,
+        executor: InferenceExecutor,
+        max_batch_size: int = 16,
+        max_wait: float = 0.005
+    ):
+        """
+        Initialize search batcher
+
+        Args:
+            prompt_service: Service running the searches
+            executor: Executor the batched searches run on
+            max_batch_size: Flush as soon as this many searches are queued
+            max_wait: Seconds to wait for more searches after the first one arrives
+        """
+        self.prompt_service = prompt_service
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.batched_requests = 0
+
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The event loop keeps only weak references to tasks, so batches in
+        # flight are held here until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def search(self, **request: Any) -> List[Dict]:
+        """
+        Queue a search and wait for its results
+
+        Args:
+            **request: Keyword arguments of PromptService.search_prompts
+
+        Returns:
+            List of similar prompts with scores
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Send everything queued so far as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Send the searches still queued and wait for every batch in flight"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        """Run one batch on the executor and resolve every caller's future"""
+        self.batches += 1
+        self.batched_requests += len(batch)
+
+        try:
+            results = await self.executor.run(
+                self.prompt_service.search_prompts_many,
+                [request for request, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """Get batching settings and the average batch size so far"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'avg_batch_size': self.batched_requests / self.batches if self.batches else 0.0
+        }
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.inference_executor import InferenceExecutor
+from app.services.metrics import CollectedMetric, metrics
+from app.services.prompt_service import PromptService
+from app.services.prompt_watcher import PromptWatcher
+from app.services.search_batcher import SearchBatcher
+
+
+class ServiceRegistry:
+    """
+    Process-wide registry for long-lived services
+
+    Services are created once per process and the same PromptService
+    instance is handed to every request. Startup comes in two stages: the
+    prompt catalog and the BM25 index are ready as soon as startup returns,
+    while the models and the FAISS index load afterwards, on a background
+    thread unless BACKGROUND_LOADING is off. Each uvicorn worker is a
+    separate process and owns its own registry; PyTorch modules cannot be
+    shared safely between processes.
+    """
+
+    def __init__(self):
+        self._prompt_service: Optional[PromptService] = None
+        self.watcher: Optional[PromptWatcher] = None
+        self.executor: Optional[InferenceExecutor] = None
+        self.batcher: Optional[SearchBatcher] = None
+        self._lock = threading.RLock()
+        self._loader: Optional[threading.Thread] = None
+        self.load_time: Optional[float] = None
+        # Model loading stage: pending, loading, ready or failed
+        self.model_state = "pending"
+        self.model_load_time: Optional[float] = None
+        self.model_error: Optional[str] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the catalog-backed services have been created"""
+        return self._prompt_service is not None
+
+    @property
+    def models_ready(self) -> bool:
+        """Whether the models and the FAISS index have finished loading"""
+        return self.model_state == "ready"
+
+    def startup(self) -> float:
+        """
+        Create the services and start loading models
+
+        Safe to call more than once; only the first call does any work.
+
+        Returns:
+            Time spent before catalog endpoints can serve, in seconds
+        """
+        with self._lock:
+            if self._prompt_service is None:
+                start = time.perf_counter()
+                self.model_state = "pending"
+                self.model_load_time = None
+                self.model_error = None
+
+                service = PromptService(
+                    prompts_dir=settings.prompts_dir,
+                    index_dir=settings.index_dir,
+                    model_name=settings.model_name,
+                    embedding_cache_size=settings.embedding_cache_size,
+                    catalog_refresh_interval=settings.catalog_refresh_interval,
+                    query_cache_size=settings.query_cache_size,
+                    query_cache_ttl=settings.query_cache_ttl,
+                    result_cache_size=settings.result_cache_size,
+                    result_cache_ttl=settings.result_cache_ttl,
+                    chunk_tokens=settings.chunk_tokens,
+                    chunk_overlap=settings.chunk_overlap,
+                    max_chunks=settings.max_chunks,
+                    snapshot_delay=settings.snapshot_delay,
+                    rrf_k=settings.rrf_k,
+                    hybrid_semantic_weight=settings.hybrid_semantic_weight,
+                    load_models=False
+                )
+
+                self._prompt_service = service
+                self.executor = InferenceExecutor(
+                    max_workers=settings.inference_workers,
+                    max_queue=settings.inference_queue_size
+                )
+                if settings.search_batch_window_ms > 0:
+                    self.batcher = SearchBatcher(
+                        service,
+                        self.executor,
+                        max_batch_size=settings.search_batch_max_size,
+                        max_wait=settings.search_batch_window_ms / 1000
+                    )
+                self.load_time = time.perf_counter() - start
+                metrics.add_collector(self.collect_metrics)
+
+                if settings.background_loading:
+                    self._loader = threading.Thread(target=self._load_models, args=(service,), name="model-loader", daemon=True)
+                    self._loader.start()
+                else:
+                    self._load_models(service)
+
+        return self.load_time
+
+    @staticmethod
+    def _index_config():
+        """FAISS index settings (imports faiss, so only called while loading models)"""
+        from app.services.vector_index import IndexConfig
+
+        return IndexConfig(
+            index_type=settings.index_type,
+            nlist=settings.index_nlist,
+            nprobe=settings.index_nprobe,
+            hnsw_m=settings.hnsw_m,
+            ef_construction=settings.hnsw_ef_construction,
+            ef_search=settings.hnsw_ef_search,
+            pq_m=settings.pq_m,
+            pq_nbits=settings.pq_nbits
+        )
+
+    def _load_models(self, service: PromptService) -> None:
+        """Load the models and the FAISS index, then start watching the prompts directory"""
+        from app.services.encoder import configure_torch_threads
+
+        self.model_state = "loading"
+        start = time.perf_counter()
+        try:
+            # Split the cores between concurrent inference tasks
+            torch_threads = settings.torch_threads or max(1, (os.cpu_count() or 1) // settings.inference_workers)
+            configure_torch_threads(torch_threads, settings.torch_interop_threads)
+
+            service.load_models(build_index=settings.index_on_startup, index_config=self._index_config())
+        except Exception as e:
+            print(f"Model loading failed: {e}")
+            self.model_error = str(e)
+            self.model_state = "failed"
+            return
+
+        self.model_load_time = time.perf_counter() - start
+        self.model_state = "ready"
+        print(f"Models and index loaded in {self.model_load_time:.2f}s")
+
+        # Watching only makes sense once changes can be embedded
+        with self._lock:
+            if settings.watch_prompts and self._prompt_service is service:
+                self.watcher = PromptWatcher(
+                    service,
+                    interval=settings.watch_interval,
+                    debounce=settings.watch_debounce
+                )
+                self.watcher.start()
+
+    def collect_metrics(self) -> List[CollectedMetric]:
+        """Read cache counters, inference load and index size for a metrics scrape"""
+        service = self._prompt_service
+        executor = self.executor
+        if service is None:
+            return []
+
+        collected = [
+            CollectedMetric("prompt_server_models_ready", "Whether models and the search index are loaded", [({}, float(self.models_ready))]),
+            CollectedMetric("prompt_server_catalog_prompts", "Prompts in the catalog", [({}, len(service.catalog))]),
+            CollectedMetric("prompt_server_lexical_documents", "Prompts in the BM25 index", [({}, len(service.lexical_index))])
+        ]
+
+        if executor is not None:
+            collected += [
+                CollectedMetric("prompt_server_inference_in_flight", "Inference tasks running or waiting", [({}, executor.in_flight)]),
+                CollectedMetric("prompt_server_inference_queue_depth", "Inference tasks waiting for a free worker", [({}, executor.queue_depth)]),
+                CollectedMetric("prompt_server_inference_rejected_total", "Inference tasks rejected because the queue was full", [({}, executor.rejected)], "counter")
+            ]
+
+        caches = {'search_results': service.result_cache}
+        embedding_service = service.embedding_service
+        if embedding_service is not None:
+            caches['query_embeddings'] = embedding_service.query_cache
+            if embedding_service.embedding_cache is not None:
+                caches['document_embeddings'] = embedding_service.embedding_cache
+            counts = embedding_service.get_index_counts()
+            collected += [
+                CollectedMetric("prompt_server_index_prompts", "Prompts in the FAISS index", [({}, counts['prompts'])]),
+                CollectedMetric("prompt_server_index_vectors", "Vectors in the FAISS index, including stale ones", [({}, counts['vectors'])]),
+                CollectedMetric("prompt_server_index_stale_vectors", "Vectors left in the FAISS index by replaced or removed prompts", [({}, counts['stale_vectors'])])
+            ]
+
+        collected += [
+            CollectedMetric("prompt_server_cache_hits_total", "Cache lookups answered from the cache", [({'cache': name}, cache.hits) for name, cache in caches.items()], "counter"),
+            CollectedMetric("prompt_server_cache_misses_total", "Cache lookups that missed", [({'cache': name}, cache.misses) for name, cache in caches.items()], "counter")
+        ]
+        return collected
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the loading stage of the services, for the health endpoints"""
+        return {
+            "services_loaded": self.is_loaded,
+            "load_time_seconds": self.load_time,
+            "models": {
+                "state": self.model_state,
+                "load_time_seconds": self.model_load_time,
+                "error": self.model_error
+            }
+        }
+
+    def get_prompt_service(self) -> PromptService:
+        """Get the shared prompt service, loading it on first use"""
+        if self._prompt_service is None:
+            self.startup()
+        return self._prompt_service
+
+    def get_executor(self) -> InferenceExecutor:
+        """Get the shared inference executor, loading services on first use"""
+        if self.executor is None:
+            self.startup()
+        return self.executor
+
+    def shutdown(self) -> None:
+        """Stop background work and release loaded services"""
+        with self._lock:
+            metrics.remove_collector(self.collect_metrics)
+            if self.watcher is not None:
+                self.watcher.stop()
+                self.watcher = None
+            self.batcher = None
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+            # Write index changes still waiting for the delayed snapshot
+            if self._prompt_service is not None and self._prompt_service.embedding_service is not None:
+                self._prompt_service.embedding_service.flush()
+            self._prompt_service = None
+            self._loader = None
+            self.load_time = None
+            self.model_state = "pending"
+            self.model_load_time = None
+            self.model_error = None
+
+
+registry = ServiceRegistry()
@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# How a search filter with several tags is applied
+TAG_MATCH_MODES = ("any", "all")
+
+# Number of set bits in each byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype='int64')
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+    """Lowercase, strip and deduplicate tags, in sorted order"""
+    return sorted({tag.strip().lower() for tag in (tags or []) if tag and tag.strip()})
+
+
+def matches_tags(prompt_tags: Iterable[str], tags: List[str], tag_match: str = "any") -> bool:
+    """
+    Check the tags of one prompt against a filter
+
+    Args:
+        prompt_tags: Tags of the prompt
+        tags: Normalized filter tags (see normalize_tags)
+        tag_match: "any" to require one of the tags, "all" to require every tag
+
+    Returns:
+        True if the prompt passes the filter
+    """
+    present = set(normalize_tags(prompt_tags))
+    if tag_match == "all":
+        return all(tag in present for tag in tags)
+    return any(tag in present for tag in tags)
+
+
+def count_bits(bitmap: np.ndarray) -> int:
+    """Number of labels set in a bitmap"""
+    return int(_POPCOUNT[bitmap].sum())
+
+
+def bitmap_contains(bitmap: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Boolean array telling which labels are set in a bitmap"""
+    labels = np.asarray(labels, dtype='int64')
+    in_range = (labels >= 0) & (labels < len(bitmap) * 8)
+    clipped = np.where(in_range, labels, 0)
+    return in_range & ((bitmap[clipped >> 3] >> (clipped & 7)) & 1).astype(bool)
+
+
+def bitmap_labels(bitmap: np.ndarray) -> np.ndarray:
+    """Sorted labels set in a bitmap, touching only its non-zero bytes"""
+    nonzero = np.flatnonzero(bitmap)
+    bits = np.unpackbits(bitmap[nonzero, None], axis=1, bitorder='little')
+    rows, columns = np.nonzero(bits)
+    return (nonzero[rows] << 3) + columns
+
+
+class TagIndex:
+    """
+    Bitmaps of index labels per tag
+
+    Each tag maps to a packed bitmap with bit i (little-endian within each
+    byte) set when the prompt with label i carries the tag. That is the
+    layout faiss.IDSelectorBitmap reads, so a filter is turned into a FAISS
+    selector with a few vectorized OR/AND operations and no per-prompt work.
+    Tags are matched case-insensitively.
+    """
+
+    def __init__(self):
+        self._bitmaps: Dict[str, np.ndarray] = {}
+        self._num_bytes = 0
+
+    def _grow(self, label: int) -> None:
+        """Make every bitmap large enough to hold label"""
+        needed = (label >> 3) + 1
+        if needed <= self._num_bytes:
+            return
+
+        # Double the capacity so a stream of new labels is amortized
+        self._num_bytes = max(needed, 2 * self._num_bytes)
+        for tag, bitmap in self._bitmaps.items():
+            grown = np.zeros(self._num_bytes, dtype='uint8')
+            grown[:len(bitmap)] = bitmap
+            self._bitmaps[tag] = grown
+
+    def add(self, label: int, tags: Iterable[str]) -> None:
+        """Set label in the bitmaps of its tags"""
+        self._grow(label)
+        for tag in normalize_tags(tags):
+            bitmap = self._bitmaps.get(tag)
+            if bitmap is None:
+                bitmap = self._bitmaps[tag] = np.zeros(self._num_bytes, dtype='uint8')
+            bitmap[label >> 3] |= np.uint8(1 << (label & 7))
+
+    def discard(self, label: int, tags: Iterable[str]) -> None:
+        """Clear label from the bitmaps of its tags"""
+        for tag in normalize_tags(tags):
+            bitmap = self._bitmaps.get(tag)
+            if bitmap is None or (label >> 3) >= len(bitmap):
+                continue
+            bitmap[label >> 3] &= np.uint8(~(1 << (label & 7)) & 0xFF)
+            if not bitmap.any():
+                del self._bitmaps[tag]
+
+    def match(self, tags: List[str], tag_match: str = "any") -> np.ndarray:
+        """
+        Bitmap of the labels passing a tag filter
+
+        Args:
+            tags: Normalized filter tags (see normalize_tags)
+            tag_match: "any" to require one of the tags, "all" to require every tag
+
+        Returns:
+            Packed uint8 bitmap over all labels
+        """
+        if tag_match not in TAG_MATCH_MODES:
+            raise ValueError(f"Unknown tag match '{tag_match}', expected one of {', '.join(TAG_MATCH_MODES)}")
+
+        bitmaps = [self._bitmaps.get(tag) for tag in tags]
+        if not bitmaps or (tag_match == "all" and any(bitmap is None for bitmap in bitmaps)):
+            return np.zeros(self._num_bytes, dtype='uint8')
+
+        bitmaps = [bitmap for bitmap in bitmaps if bitmap is not None]
+        result = np.zeros(self._num_bytes, dtype='uint8')
+        if bitmaps:
+            result[:] = bitmaps[0]
+            combine = np.bitwise_and if tag_match == "all" else np.bitwise_or
+            for bitmap in bitmaps[1:]:
+                combine(result, bitmap, out=result)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._bitmaps)
+
+    def get_stats(self) -> Dict:
+        """Get the number of tags and the memory held by their bitmaps"""
+        return {
+            'tags': len(self._bitmaps),
+            'bitmap_bytes': self._num_bytes * len(self._bitmaps)
+        }
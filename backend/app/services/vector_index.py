@@ -0,0 +1,324 @@
+import math
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.services.tag_index import bitmap_contains, bitmap_labels, count_bits
+
+
+# Index backends that can be selected with IndexConfig.index_type
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS warns when k-means gets fewer training points than this per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Filters allowing at most this share of the vectors list their ids in a
+# hashed selector instead of translating the whole bitmap
+MAX_BATCH_SELECTOR_SHARE = 0.05
+
+
+class IndexConfig:
+    """
+    FAISS index backend and its tuning parameters
+
+    All backends use inner product over L2-normalized vectors, so scores
+    are cosine similarities in [-1, 1]:
+
+    - flat: exact brute-force search; best for up to ~100k prompts
+    - ivf_flat: inverted lists over k-means cells; needs a training step,
+      search visits nprobe of nlist cells
+    - hnsw: graph search; no training, search effort set by ef_search.
+      Vectors cannot be removed, so replaced prompts leave stale entries
+      until the index is compacted
+    - ivf_pq: inverted lists with product-quantized vectors; smallest
+      memory footprint, approximate scores
+    """
+
+    def __init__(
+        self,
+        index_type: str = "flat",
+        nlist: int = 0,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        pq_m: int = 0,
+        pq_nbits: int = 8
+    ):
+        """
+        Initialize index configuration
+
+        Args:
+            index_type: One of INDEX_TYPES
+            nlist: Number of IVF cells (0 = about 4 * sqrt(number of vectors))
+            nprobe: Number of IVF cells visited per search
+            hnsw_m: Number of HNSW graph neighbors per vector
+            ef_construction: HNSW search depth while building
+            ef_search: HNSW search depth while querying
+            pq_m: Number of PQ sub-quantizers (0 = one per 8 dimensions)
+            pq_nbits: Bits per PQ sub-quantizer code
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+
+    def get_nlist(self, num_vectors: int) -> int:
+        """Number of IVF cells for an index of num_vectors vectors"""
+        return self.nlist or max(1, int(4 * math.sqrt(num_vectors)))
+
+    def min_training_size(self, num_vectors: int) -> int:
+        """Number of vectors needed to train the index (0 if it needs no training)"""
+        if self.index_type == "ivf_flat":
+            return MIN_POINTS_PER_CENTROID * self.get_nlist(num_vectors)
+        if self.index_type == "ivf_pq":
+            return MIN_POINTS_PER_CENTROID * max(self.get_nlist(num_vectors), 2 ** self.pq_nbits)
+        return 0
+
+    def can_build(self, num_vectors: int) -> bool:
+        """Whether enough vectors are available to build the configured index type"""
+        return num_vectors >= self.min_training_size(num_vectors)
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of vectors scaled to unit L2 norm, row by row"""
+    vectors = np.array(vectors, dtype='float32', order='C', copy=True)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _auto_pq_m(dimension: int) -> int:
+    """Largest sub-quantizer count that divides dimension, with at least 8 dimensions each"""
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def unwrap_index(index: faiss.Index) -> faiss.Index:
+    """Get the index underneath an id map"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """Get the INDEX_TYPES name of a FAISS index"""
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Whether vectors can be removed from the index"""
+    return not isinstance(unwrap_index(index), faiss.IndexHNSW)
+
+
+def is_memory_mapped(index: faiss.Index) -> bool:
+    """
+    Whether the vectors of an index are served from a memory-mapped file
+
+    faiss only honours IO_FLAG_MMAP for the inverted lists of IVF indexes;
+    flat and HNSW indexes are read into memory whatever the flag.
+    """
+    base = unwrap_index(index)
+    if not isinstance(base, faiss.IndexIVF):
+        return False
+    return isinstance(faiss.downcast_InvertedLists(base.invlists), faiss.OnDiskInvertedLists)
+
+
+def reconstruct_vectors(index: faiss.Index, ids: np.ndarray) -> np.ndarray:
+    """
+    Get the stored vectors of the given vector ids
+
+    IVF indexes can only look a vector up by id through a direct map, which
+    is added here on first use. It is a hash table since vector ids are not
+    contiguous. IVF-PQ returns the decoded, approximate vectors.
+    """
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexIVF) and base.direct_map.type == faiss.DirectMap.NoMap:
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index.reconstruct_batch(np.ascontiguousarray(ids, dtype='int64'))
+
+
+def configure_search(index: faiss.Index, config: IndexConfig) -> None:
+    """Apply the search-time parameters (nprobe, efSearch) of config to an index"""
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = max(1, min(config.nprobe, base.nlist))
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = config.ef_search
+
+
+def create_index(config: IndexConfig, vectors: np.ndarray) -> Tuple[faiss.Index, str]:
+    """
+    Create an empty index for the configured backend, trained on vectors
+
+    IVF indexes need enough vectors to train their k-means cells; with
+    fewer, an exact flat index is created instead. Vectors are not added.
+
+    Args:
+        config: Index configuration
+        vectors: Normalized float32 vectors used for training
+
+    Returns:
+        Tuple of (index accepting add_with_ids, index type that was created)
+    """
+    num_vectors, dimension = vectors.shape
+    index_type = config.index_type
+
+    if not config.can_build(num_vectors):
+        print(
+            f"{num_vectors} vectors are not enough to train the {index_type} index "
+            f"(need {config.min_training_size(num_vectors)}), using a flat index"
+        )
+        index_type = "flat"
+
+    if index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = config.ef_construction
+        index = faiss.IndexIDMap2(base)
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = config.get_nlist(num_vectors)
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            pq_m = config.pq_m or _auto_pq_m(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, config.pq_nbits, faiss.METRIC_INNER_PRODUCT)
+        # IVF indexes store ids natively and support removal without an id map
+        index.train(vectors)
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    configure_search(index, config)
+    return index, index_type
+
+
+def get_search_params(index: faiss.Index) -> Dict:
+    """Get the search-time parameters in effect for an index"""
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return {'nlist': base.nlist, 'nprobe': base.nprobe}
+    if isinstance(base, faiss.IndexHNSW):
+        return {'ef_search': base.hnsw.efSearch}
+    return {}
+
+
+class StoragePositions:
+    """
+    Vector ids of an id-mapped index in storage order
+
+    The wrapped index only knows storage positions, so filters over labels
+    are translated through this table. Build it once per index state and
+    rebuild it after vectors are added or removed.
+    """
+
+    def __init__(self, index: faiss.Index):
+        self.ids = faiss.vector_to_array(index.id_map)
+        self._order = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = self.ids[self._order]
+
+    def of_labels(self, labels: np.ndarray, chunk_bits: int = 0) -> np.ndarray:
+        """Storage positions of every vector stored under the given labels"""
+        labels = np.asarray(labels, dtype='int64')
+        starts = np.searchsorted(self._sorted_ids, labels << chunk_bits)
+        ends = np.searchsorted(self._sorted_ids, (labels + 1) << chunk_bits)
+        counts = ends - starts
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return self._order[offsets + np.arange(int(counts.sum()), dtype='int64')]
+
+
+def _batch_selector(ids: np.ndarray) -> Tuple[faiss.IDSelector, np.ndarray]:
+    """Hashed selector over a list of ids, returned with the array it was built from"""
+    ids = np.ascontiguousarray(ids, dtype='int64')
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids
+
+
+def search_with_selector(
+    index: faiss.Index,
+    queries: np.ndarray,
+    k: int,
+    bitmap: np.ndarray,
+    positions: Optional[StoragePositions] = None,
+    chunk_bits: int = 0,
+    exhaustive: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search only among the labels set in a bitmap
+
+    The filter is applied inside the FAISS search through an ID selector,
+    so the nearest allowed vectors are returned rather than whatever
+    survives a post-filter of the global top-k. Graph and IVF searches may
+    still come back short when few vectors pass the filter; exhaustive
+    visits every IVF cell, or scans the vectors stored by an HNSW graph
+    directly (its traversal cannot pass through filtered-out nodes).
+
+    A filter allowing only a small share of the vectors becomes a hashed
+    selector over their ids, at a cost proportional to the filter; larger
+    filters become a bitmap selector over the whole index.
+
+    Args:
+        index: Index to search
+        queries: Float32 array with one unit-norm query per row
+        k: Number of results per query
+        bitmap: Packed little-endian bitmap of allowed labels
+        positions: Storage positions of an id map, kept by the caller between searches
+        chunk_bits: Low bits of a vector id holding the chunk number; the
+            label of vector id i is i >> chunk_bits
+        exhaustive: Trade speed for complete results
+
+    Returns:
+        Tuple of (scores, vector ids), with -1 ids where fewer than k results were found
+    """
+    base = unwrap_index(index)
+    id_mapped = base is not index
+    if id_mapped and positions is None:
+        positions = StoragePositions(index)
+
+    # Both arrays must stay alive during the search, selectors read them in place
+    selected = None
+    if count_bits(bitmap) << chunk_bits <= MAX_BATCH_SELECTOR_SHARE * index.ntotal:
+        labels = bitmap_labels(bitmap)
+        if id_mapped:
+            # Id maps do not pass search parameters on to the wrapped index,
+            # so it is searched directly with the filter in storage positions
+            selector, selected = _batch_selector(positions.of_labels(labels, chunk_bits))
+        else:
+            chunks = np.arange(1 << chunk_bits, dtype='int64')
+            selector, selected = _batch_selector(((labels[:, None] << chunk_bits) + chunks).ravel())
+    else:
+        if id_mapped:
+            bitmap = np.packbits(bitmap_contains(bitmap, positions.ids >> chunk_bits), bitorder='little')
+        elif chunk_bits:
+            # Ids are stored natively: give every chunk of an allowed label its bit
+            bits = np.unpackbits(bitmap, bitorder='little').astype(bool)
+            bitmap = np.packbits(np.repeat(bits, 1 << chunk_bits), bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nlist if exhaustive else base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW) and not exhaustive:
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(base.hnsw.efSearch, k))
+    else:
+        params = faiss.SearchParameters(sel=selector)
+        if isinstance(base, faiss.IndexHNSW):
+            base = faiss.downcast_index(base.storage)
+
+    scores, ids = base.search(queries, k, params=params)
+    if id_mapped:
+        ids = np.where(ids >= 0, positions.ids[np.maximum(ids, 0)], -1)
+    return scores, ids
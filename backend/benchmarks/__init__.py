@@ -0,0 +1,7 @@
+"""
+Benchmark suite for the Prompt Directory Server
+
+Generates synthetic prompt libraries and measures index build time, cold
+start, search latency, render throughput, memory and HTTP throughput under
+concurrent load, entirely offline. Run it with ``python -m benchmarks``.
+"""
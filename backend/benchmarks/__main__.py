@@ -0,0 +1,116 @@
+"""
+Run the benchmark suite on synthetic prompt libraries
+
+Generates (or reuses) a corpus per size, benchmarks each size in a fresh
+process and writes machine-readable results. Exits with status 1 when a
+metric breaks a limit in the thresholds file or regresses against a
+baseline run by more than --max-regression.
+
+    python -m benchmarks --sizes 1000,100000 --output results.json --baseline previous.json
+
+Runs offline: the Hugging Face model must already be in the local cache.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import settings
+from benchmarks.report import check_thresholds, compare_to_baseline
+
+DEFAULT_THRESHOLDS = Path(__file__).parent / "thresholds.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000", help="Comma-separated corpus sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--work-dir", default="benchmark_data", help="Directory for corpora and indexes, reused across runs")
+    parser.add_argument("--output", help="File to write the results to (default: standard output)")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS), help="JSON file with absolute limits per corpus size")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Largest acceptable relative regression against the baseline")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for corpora, queries and request mix")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per search configuration")
+    parser.add_argument("--renders", type=int, default=5000, help="Prompts rendered for the throughput measurement")
+    parser.add_argument("--load-requests", type=int, default=2000, help="HTTP requests sent under concurrent load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    thresholds = json.loads(Path(args.thresholds).read_text()) if args.thresholds else {}
+    baseline = json.loads(Path(args.baseline).read_text())['results'] if args.baseline else {}
+
+    # Never reach out to the Hugging Face Hub
+    env = dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+
+    results = {}
+    failures = []
+    for size in sizes:
+        print(f"Benchmarking {size} prompts...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as scratch:
+            output = Path(scratch) / "result.json"
+            subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.suite",
+                    "--size", str(size),
+                    "--work-dir", args.work_dir,
+                    "--output", str(output),
+                    "--seed", str(args.seed),
+                    "--queries", str(args.queries),
+                    "--renders", str(args.renders),
+                    "--load-requests", str(args.load_requests),
+                    "--concurrency", str(args.concurrency)
+                ],
+                env=env,
+                # Service logs go to stderr so the results can be piped from stdout
+                stdout=sys.stderr,
+                check=True
+            )
+            metrics = json.loads(output.read_text())
+
+        results[str(size)] = metrics
+        failures += check_thresholds(size, metrics, thresholds)
+        failures += compare_to_baseline(size, metrics, baseline.get(str(size)), args.max_regression)
+
+    report = {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'model_name': settings.model_name,
+            'encoder_backend': settings.encoder_backend,
+            'index_type': settings.index_type,
+            'chunk_tokens': settings.chunk_tokens,
+            'inference_workers': settings.inference_workers,
+            'search_batch_window_ms': settings.search_batch_window_ms,
+            'seed': args.seed,
+            'queries': args.queries,
+            'load_requests': args.load_requests,
+            'concurrency': args.concurrency
+        },
+        'results': results,
+        'failures': failures
+    }
+
+    content = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(content + "\n")
+    else:
+        print(content)
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Measure the startup of a fresh server process
+
+Run by the benchmark suite in a new interpreter, so imports and model
+loading are as slow as on a real start. Writes the timings as JSON.
+
+    python -m benchmarks.cold_start --prompts-dir P --index-dir I --output cold.json
+"""
+
+import argparse
+import json
+import time
+
+
+def main() -> None:
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts-dir", required=True, help="Directory containing YAML prompt files")
+    parser.add_argument("--index-dir", required=True, help="Directory holding the index snapshot to load")
+    parser.add_argument("--output", required=True, help="File to write the timings to")
+    args = parser.parse_args()
+
+    from app.main import app  # noqa: F401 (importing the app is part of the start)
+    from app.config import settings
+    from app.services.service_registry import registry
+    imported = time.perf_counter()
+
+    settings.prompts_dir = args.prompts_dir
+    settings.index_dir = args.index_dir
+    settings.background_loading = False
+    settings.embedding_cache_size = 0
+    settings.watch_prompts = False
+    registry.startup()
+    ready = time.perf_counter()
+
+    if registry.model_state != "ready":
+        raise SystemExit(f"Models failed to load: {registry.model_error}")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'cold_start_import_seconds': imported - start,
+            'cold_start_catalog_seconds': registry.load_time,
+            'cold_start_models_seconds': registry.model_load_time,
+            'cold_start_seconds': ready - start
+        }, file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+
+# Bump when the generator changes, so cached corpora are regenerated
+CORPUS_VERSION = 1
+
+# Marker file describing the corpus in a prompts directory
+MANIFEST_NAME = "corpus.json"
+
+DOMAINS = [
+    "code review", "unit testing", "sql queries", "api design", "incident reports",
+    "release notes", "customer emails", "meeting notes", "job descriptions", "marketing copy",
+    "data analysis", "system design", "security audits", "onboarding guides", "bug triage",
+    "product requirements", "user interviews", "performance tuning", "legal summaries", "translation"
+]
+VERBS = [
+    "write", "review", "summarize", "refactor", "explain", "draft", "improve", "translate",
+    "outline", "critique", "simplify", "expand", "classify", "compare", "debug", "plan"
+]
+OBJECTS = [
+    "a checklist", "a short report", "step-by-step instructions", "a table", "an executive summary",
+    "a list of risks", "test cases", "a migration plan", "follow-up questions", "acceptance criteria",
+    "a style guide", "edge cases", "a rollout plan", "talking points", "a decision record"
+]
+QUALIFIERS = [
+    "concise", "detailed", "friendly", "formal", "beginner-friendly", "technical", "skeptical",
+    "structured", "actionable", "thorough", "neutral", "persuasive"
+]
+FILLER = (
+    "Keep the answer focused on what matters most to the reader. Point out assumptions, "
+    "call out anything that is ambiguous and prefer concrete examples over general advice. "
+    "Use headings where they help and keep each section short."
+).split()
+VARIABLES = ["subject", "language", "audience", "tone", "context", "deadline"]
+TAGS = [domain.split()[0] for domain in DOMAINS] + [f"team-{i}" for i in range(40)] + [f"topic-{i}" for i in range(140)]
+
+
+def _zipf_choice(rng: random.Random, items: List[str]) -> str:
+    """Pick an item with a long-tailed distribution, favouring the front of the list"""
+    return items[min(int(rng.paretovariate(1.2)) - 1, len(items) - 1)]
+
+
+def make_prompt(index: int, rng: random.Random) -> Dict:
+    """Build the YAML data of one synthetic prompt"""
+    domain = rng.choice(DOMAINS)
+    verb = rng.choice(VERBS)
+    obj = rng.choice(OBJECTS)
+    qualifier = rng.choice(QUALIFIERS)
+    variables = rng.sample(VARIABLES, rng.randint(1, 3))
+
+    # Mostly short prompts, with a tail of long ones that exercise chunking
+    words = rng.randint(40, 140) if rng.random() < 0.9 else rng.randint(600, 1800)
+    body = " ".join(rng.choice(FILLER) for _ in range(words))
+    placeholders = " ".join(f"{name.title()}: {{{{{name}}}}}." for name in variables)
+
+    tags = {domain.split()[0]}
+    tag_count = rng.randint(1, 4)
+    while len(tags) < tag_count:
+        tags.add(_zipf_choice(rng, TAGS))
+
+    return {
+        'id': f"bench-{index:07d}",
+        'title': f"{verb.title()} {obj} for {domain}",
+        'description': f"A {qualifier} prompt to {verb} {obj} about {domain}",
+        'prompt': f"You are an expert in {domain}. {verb.title()} {obj} in a {qualifier} style. {placeholders}\n\n{body}\n",
+        'variables': [{'name': name, 'description': f"The {name} to use"} for name in variables],
+        'tags': sorted(tags)
+    }
+
+
+def generate_corpus(prompts_dir: Path, size: int, seed: int = 0) -> Path:
+    """
+    Write a synthetic library of YAML prompt files
+
+    The same size and seed always produce the same files. A directory that
+    already holds that corpus is left as it is, so repeated runs skip the
+    generation.
+
+    Args:
+        prompts_dir: Directory to write the prompts to
+        size: Number of prompts
+        seed: Random seed
+
+    Returns:
+        The prompts directory
+    """
+    prompts_dir = Path(prompts_dir)
+    manifest_path = prompts_dir / MANIFEST_NAME
+    manifest = {'version': CORPUS_VERSION, 'size': size, 'seed': seed}
+    if manifest_path.exists() and json.loads(manifest_path.read_text()) == manifest:
+        return prompts_dir
+
+    prompts_dir.mkdir(parents=True, exist_ok=True)
+    for stale in prompts_dir.glob("bench-*.yml"):
+        stale.unlink()
+
+    rng = random.Random(seed)
+    for index in range(size):
+        data = make_prompt(index, rng)
+        with open(prompts_dir / f"{data['id']}.yml", 'w', encoding='utf-8') as file:
+            yaml.safe_dump(data, file, sort_keys=False, width=120)
+
+    manifest_path.write_text(json.dumps(manifest))
+    return prompts_dir
+
+
+def generate_queries(count: int, seed: int = 0) -> List[str]:
+    """Search queries drawn from the same vocabulary as the corpus"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        shape = rng.random()
+        if shape < 0.4:
+            queries.append(f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} for {rng.choice(DOMAINS)}")
+        elif shape < 0.7:
+            queries.append(f"{rng.choice(QUALIFIERS)} {rng.choice(DOMAINS)}")
+        else:
+            queries.append(rng.choice(DOMAINS))
+    return queries
+
+
+def render_values() -> Dict[str, str]:
+    """Variable values that fill every placeholder the generator uses"""
+    return {name: f"example {name}" for name in VARIABLES}
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.report import latency_summary
+
+
+# One request: (name for reporting, method, path with query string, JSON body or None)
+Request = Tuple[str, str, str, Optional[Any]]
+
+
+async def run_load(app: Any, make_request: Callable[[int], Request], total: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Drive an ASGI app in-process with concurrent clients
+
+    Requests go through the full FastAPI stack (routing, validation,
+    serialization, the inference executor and micro-batching) without a
+    network socket. The app's services must already be started.
+
+    Args:
+        app: ASGI application
+        make_request: Builds the i-th request
+        total: Number of requests to send
+        concurrency: Number of clients sending requests at the same time
+
+    Returns:
+        Throughput, latency percentiles, error rate, and latency and status
+        codes per request name
+    """
+    transport = httpx.ASGITransport(app=app)
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, Counter] = {}
+    next_index = iter(range(total))
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for index in next_index:
+            name, method, url, body = make_request(index)
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.setdefault(name, []).append(time.perf_counter() - start)
+            statuses.setdefault(name, Counter())[response.status_code] += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    errors = sum(count for codes in statuses.values() for code, count in codes.items() if code >= 400)
+    return {
+        'load_requests_per_second': total / elapsed if elapsed else 0.0,
+        **latency_summary(all_latencies, "load"),
+        'load_error_rate': errors / total if total else 0.0,
+        'requests': {
+            name: {
+                **latency_summary(values, "latency"),
+                'count': len(values),
+                'status_codes': {str(code): count for code, count in sorted(statuses[name].items())}
+            }
+            for name, values in sorted(latencies.items())
+        }
+    }
@@ -0,0 +1,99 @@
+import resource
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Every metric of a benchmark run and whether lower or higher values are better
+METRICS = {
+    'catalog_load_seconds': "lower",
+    'index_build_seconds': "lower",
+    'cold_start_import_seconds': "lower",
+    'cold_start_catalog_seconds': "lower",
+    'cold_start_models_seconds': "lower",
+    'cold_start_seconds': "lower",
+    'search_p50_ms': "lower",
+    'search_p99_ms': "lower",
+    'search_rerank_p50_ms': "lower",
+    'search_rerank_p99_ms': "lower",
+    'lexical_search_p50_ms': "lower",
+    'lexical_search_p99_ms': "lower",
+    'renders_per_second': "higher",
+    'load_requests_per_second': "higher",
+    'load_p50_ms': "lower",
+    'load_p99_ms': "lower",
+    'load_error_rate': "lower",
+    'peak_rss_mb': "lower"
+}
+
+
+def latency_summary(seconds: Sequence[float], prefix: str) -> Dict[str, float]:
+    """p50 and p99 of latencies, in milliseconds, as prefix_p50_ms and prefix_p99_ms"""
+    if not seconds:
+        return {}
+    p50, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 99])
+    return {f"{prefix}_p50_ms": float(p50), f"{prefix}_p99_ms": float(p99)}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def check_thresholds(size: int, metrics: Dict[str, float], thresholds: Dict[str, Dict]) -> List[str]:
+    """
+    Check metrics against absolute limits
+
+    Args:
+        size: Corpus size the metrics were measured at
+        metrics: Metric values by name
+        thresholds: Limits per corpus size (as a string) or "default", each
+            mapping metric names to {"max": ...} and/or {"min": ...}
+
+    Returns:
+        One message per violated limit
+    """
+    limits = thresholds.get(str(size), thresholds.get("default", {}))
+    failures = []
+    for name, limit in limits.items():
+        value = metrics.get(name)
+        if value is None:
+            continue
+        if 'max' in limit and value > limit['max']:
+            failures.append(f"{size}: {name} = {value:.4g}, above the limit of {limit['max']}")
+        if 'min' in limit and value < limit['min']:
+            failures.append(f"{size}: {name} = {value:.4g}, below the limit of {limit['min']}")
+    return failures
+
+
+def compare_to_baseline(
+    size: int,
+    metrics: Dict[str, float],
+    baseline: Optional[Dict[str, float]],
+    max_regression: float
+) -> List[str]:
+    """
+    Compare metrics with an earlier run
+
+    Args:
+        size: Corpus size the metrics were measured at
+        metrics: Metric values by name
+        baseline: Metric values of the earlier run at the same size (None to skip)
+        max_regression: Largest acceptable relative change for the worse, e.g. 0.2 for 20%
+
+    Returns:
+        One message per metric that regressed by more than max_regression
+    """
+    failures = []
+    for name, value in metrics.items():
+        previous = (baseline or {}).get(name)
+        direction = METRICS.get(name)
+        if previous is None or direction is None or previous <= 0:
+            continue
+        change = (value - previous) / previous if direction == "lower" else (previous - value) / previous
+        if change > max_regression:
+            failures.append(f"{size}: {name} regressed by {change:.0%} ({previous:.4g} -> {value:.4g})")
+    return failures
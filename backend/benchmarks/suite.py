@@ -0,0 +1,179 @@
+"""
+Benchmark the server on one synthetic corpus size
+
+Run by ``python -m benchmarks`` in a fresh interpreter per corpus size, so
+memory peaks and caches do not carry over between sizes. Writes the
+metrics as JSON.
+
+    python -m benchmarks.suite --size 1000 --work-dir bench --output result.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+from benchmarks.corpus import generate_corpus, generate_queries, render_values
+from benchmarks.load import Request, run_load
+from benchmarks.report import latency_summary, peak_rss_mb
+
+
+def _time_searches(service: Any, queries: List[str], **params: Any) -> List[float]:
+    """Latency of each query, run one at a time with the caches bypassed"""
+    # Warm up so one-time costs (first forward pass, lazy tag bitmaps) are not counted
+    for query in queries[:5]:
+        service.search_prompts_many([{'query': query, **params}], use_cache=False)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        service.search_prompts_many([{'query': query, **params}], use_cache=False)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _time_renders(service: Any, prompt_ids: List[str]) -> float:
+    """Renders per second over the given prompts"""
+    values = render_values()
+    start = time.perf_counter()
+    for prompt_id in prompt_ids:
+        service.render_prompt_with_variables(prompt_id, values)
+    return len(prompt_ids) / (time.perf_counter() - start)
+
+
+def _measure_cold_start(prompts_dir: Path, index_dir: Path) -> Dict[str, float]:
+    """Start a fresh server process on the built index and read its timings"""
+    with tempfile.TemporaryDirectory() as scratch:
+        output = Path(scratch) / "cold_start.json"
+        subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.cold_start",
+                "--prompts-dir", str(prompts_dir),
+                "--index-dir", str(index_dir),
+                "--output", str(output)
+            ],
+            check=True
+        )
+        return json.loads(output.read_text())
+
+
+def run_size(
+    size: int,
+    work_dir: Path,
+    seed: int = 0,
+    queries: int = 200,
+    renders: int = 5000,
+    load_requests: int = 2000,
+    concurrency: int = 16
+) -> Dict[str, Any]:
+    """
+    Run every measurement on one corpus size
+
+    Args:
+        size: Number of prompts in the corpus
+        work_dir: Directory for the corpus and the index (the corpus is reused across runs)
+        seed: Random seed for the corpus, queries and request mix
+        queries: Number of queries timed per search configuration
+        renders: Number of prompts rendered for the throughput measurement
+        load_requests: Number of HTTP requests sent under concurrent load
+        concurrency: Number of concurrent clients
+
+    Returns:
+        Metrics by name (see report.METRICS) plus a per-request load breakdown
+    """
+    from app.config import settings
+    from app.main import app
+    from app.services.service_registry import registry
+
+    prompts_dir = generate_corpus(work_dir / f"corpus-{size}" / "prompts", size, seed)
+    index_dir = work_dir / f"corpus-{size}" / "index"
+    shutil.rmtree(index_dir, ignore_errors=True)
+
+    # Build the index from scratch: no embedding cache, no background loading
+    settings.prompts_dir = str(prompts_dir)
+    settings.index_dir = str(index_dir)
+    settings.background_loading = False
+    settings.embedding_cache_size = 0
+    settings.index_on_startup = True
+    settings.watch_prompts = False
+    registry.startup()
+    if registry.model_state != "ready":
+        raise RuntimeError(f"Models failed to load: {registry.model_error}")
+
+    metrics: Dict[str, Any] = {
+        'catalog_load_seconds': registry.load_time,
+        'index_build_seconds': registry.model_load_time
+    }
+    # The cold start must load the snapshot the parent wrote, not race its delayed save
+    registry.get_prompt_service().embedding_service.flush()
+    metrics.update(_measure_cold_start(prompts_dir, index_dir))
+
+    service = registry.get_prompt_service()
+    query_list = generate_queries(queries, seed)
+    metrics.update(latency_summary(_time_searches(service, query_list, use_reranking=False), "search"))
+    metrics.update(latency_summary(_time_searches(service, query_list, use_reranking=True), "search_rerank"))
+    metrics.update(latency_summary(_time_searches(service, query_list, search_mode="lexical"), "lexical_search"))
+
+    rng = random.Random(seed + 2)
+    prompt_ids = [f"bench-{rng.randrange(size):07d}" for _ in range(renders)]
+    metrics['renders_per_second'] = _time_renders(service, prompt_ids)
+
+    values = render_values()
+
+    def make_request(index: int) -> Request:
+        """Mixed traffic: mostly searches, then lookups and renders"""
+        prompt_id = prompt_ids[index % len(prompt_ids)]
+        query = query_list[index % len(query_list)]
+        kind = index % 10
+        if kind < 4:
+            return ("search", "GET", "/api/prompts/search/?" + urlencode({'query': query}), None)
+        if kind == 4:
+            return ("lexical_search", "GET", "/api/prompts/search/?" + urlencode({'query': query, 'search_mode': 'lexical'}), None)
+        if kind < 7:
+            return ("get_prompt", "GET", f"/api/prompts/{prompt_id}", None)
+        if kind == 7:
+            return ("get_variables", "GET", f"/api/prompts/{prompt_id}/variables", None)
+        return ("render", "POST", f"/api/prompts/{prompt_id}/render", values)
+
+    metrics.update(asyncio.run(run_load(app, make_request, load_requests, concurrency)))
+    metrics['peak_rss_mb'] = peak_rss_mb()
+
+    registry.shutdown()
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, required=True, help="Number of prompts in the corpus")
+    parser.add_argument("--work-dir", required=True, help="Directory for corpora and indexes")
+    parser.add_argument("--output", required=True, help="File to write the metrics to")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per search configuration")
+    parser.add_argument("--renders", type=int, default=5000, help="Prompts rendered for the throughput measurement")
+    parser.add_argument("--load-requests", type=int, default=2000, help="HTTP requests sent under concurrent load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    args = parser.parse_args()
+
+    metrics = run_size(
+        args.size,
+        Path(args.work_dir),
+        seed=args.seed,
+        queries=args.queries,
+        renders=args.renders,
+        load_requests=args.load_requests,
+        concurrency=args.concurrency
+    )
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(metrics, file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Check an encoder backend against the fp32 PyTorch model on the prompt corpus
+
+Embeds every prompt and a set of queries with both backends and reports
+recall@k of the candidate's rankings against the fp32 rankings. Exits with
+status 1 when recall falls below --min-recall.
+
+    python check_encoder.py --backend int8 --k 10
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.config import settings
+from app.services.encoder import ENCODER_BACKENDS, TextEncoder, configure_torch_threads
+from app.services.encoder_check import compare_encoders
+from app.services.embedding_service import EmbeddingService
+from app.services.prompt_catalog import PromptCatalog
+from app.services.prompt_service import PromptService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS, default=settings.encoder_backend, help="Backend to check")
+    parser.add_argument("--model", default=settings.model_name, help="Hugging Face model name")
+    parser.add_argument("--prompts-dir", default=settings.prompts_dir, help="Directory containing YAML prompt files")
+    parser.add_argument("--queries", help="File with one query per line (default: prompt titles and descriptions)")
+    parser.add_argument("--k", type=int, default=10, help="Number of top results compared per query")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Lowest acceptable mean recall@k")
+    parser.add_argument("--threads", type=int, default=settings.torch_threads, help="PyTorch threads (0 = default)")
+    args = parser.parse_args()
+
+    catalog = PromptCatalog(Path(args.prompts_dir), PromptService.load_prompt_from_file)
+    catalog.refresh()
+    prompts = catalog.get_all()
+    if not prompts:
+        print(f"No prompts found in {args.prompts_dir}", file=sys.stderr)
+        return 2
+
+    documents = [EmbeddingService._create_text_for_embedding(prompt) for prompt in prompts]
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [prompt.title for prompt in prompts] + [prompt.description for prompt in prompts if prompt.description]
+
+    configure_torch_threads(args.threads)
+    reference = TextEncoder(args.model, batch_size=settings.encoder_batch_size, backend="torch")
+    candidate = TextEncoder(
+        args.model,
+        batch_size=settings.encoder_batch_size,
+        backend=args.backend,
+        export_dir=settings.encoder_export_dir
+    )
+
+    report = compare_encoders(reference, candidate, documents, queries, k=args.k)
+    print(json.dumps(report, indent=2))
+    return 0 if report['recall_at_k'] >= args.min_recall else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
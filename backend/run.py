@@ -5,11 +5,13 @@ Startup script for the Prompt Directory Server
 
 import uvicorn
 
+from app.config import settings
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=settings.reload,
         log_level="info"
-    ) 
\ No newline at end of file
+    ) 
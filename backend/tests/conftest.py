@@ -0,0 +1,137 @@
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers.prompt_controller import get_prompt_service, router
+from app.models.prompt import Prompt
+from app.services.embedding_service import EmbeddingService
+from app.services.prompt_service import PromptService
+from app.services.vector_index import IndexConfig
+
+
+class FakeEncoder:
+    """
+    Deterministic stand-in for TextEncoder that needs no model
+
+    A text is embedded as the sum of one pseudo-random vector per word, so
+    texts sharing words get similar embeddings. Words are the tokens of
+    split_windows.
+    """
+
+    backend = "torch"
+    is_uncased = True
+
+    def __init__(self, dimension: int = 32):
+        self.dimension = dimension
+        self.encoded: List[str] = []
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha1(word.encode('utf-8')).digest()[:4], 'little')
+        return np.random.default_rng(seed).standard_normal(self.dimension)
+
+    def encode(self, texts, max_length=512, batch_size=None, show_progress=False):
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row] += self._word_vector(word)
+        return vectors
+
+    def split_windows(self, text, window, overlap, max_windows):
+        spans = [match.span() for match in re.finditer(r"\S+", text)]
+        if len(spans) <= window:
+            return [text]
+        stride = max(1, window - overlap)
+        windows = []
+        for start in range(0, len(spans), stride):
+            end = min(start + window, len(spans))
+            windows.append(text[spans[start][0]:spans[end - 1][1]])
+            if end == len(spans) or len(windows) == max_windows:
+                break
+        return windows
+
+
+def make_prompt(prompt_id: str, text: str = "", tags=(), title: str = None) -> Prompt:
+    """Build a prompt with a title and text derived from its id unless given"""
+    return Prompt(
+        id=prompt_id,
+        title=title or f"Prompt {prompt_id}",
+        prompt=text or f"Text of {prompt_id}",
+        tags=list(tags)
+    )
+
+
+def write_prompt(directory, prompt_id: str, title: str = None, text: str = None, tags=()):
+    """Write a YAML prompt file with a title and text derived from its id unless given"""
+    path = directory / f"{prompt_id}.yml"
+    path.write_text(
+        f"id: {prompt_id}\ntitle: {title or 'Title ' + prompt_id}\nprompt: {text or 'Text of ' + prompt_id}\n"
+        f"tags: [{', '.join(tags)}]\n",
+        encoding='utf-8'
+    )
+    return path
+
+
+def make_service(tmp_path, encoder, index_type: str = "flat", **options) -> EmbeddingService:
+    """Embedding service over tmp_path/index that writes every snapshot at once"""
+    return EmbeddingService(
+        index_dir=str(tmp_path / "index"),
+        encoder=encoder,
+        index_config=IndexConfig(index_type),
+        snapshot_delay=0,
+        **options
+    )
+
+
+def start_prompt_service(tmp_path, encoder=None) -> PromptService:
+    """
+    Prompt service over tmp_path/prompts
+
+    With an encoder, the models are replaced by an embedding service using
+    it and the service is ready for semantic search (without reranking);
+    without one it stays in the models-loading state.
+    """
+    service = PromptService(
+        prompts_dir=str(tmp_path / "prompts"),
+        index_dir=str(tmp_path / "index"),
+        catalog_refresh_interval=0,
+        load_models=False
+    )
+    if encoder is not None:
+        service.embedding_service = make_service(tmp_path, encoder)
+        service.models_ready = True
+    return service
+
+
+def make_client(service: PromptService, overrides=None) -> TestClient:
+    """Test client for the prompt routes, served by the given service"""
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_prompt_service] = lambda: service
+    app.dependency_overrides.update(overrides or {})
+    return TestClient(app)
+
+
+@pytest.fixture
+def encoder():
+    return FakeEncoder()
+
+
+@pytest.fixture
+def prompt_ids():
+    """Ids of the prompts written by prompts_dir, deliberately not in sorted order"""
+    return ["delta", "alpha", "charlie", "bravo", "echo"]
+
+
+@pytest.fixture
+def prompts_dir(tmp_path, prompt_ids):
+    directory = tmp_path / "prompts"
+    directory.mkdir()
+    for prompt_id in prompt_ids:
+        write_prompt(directory, prompt_id)
+    return directory
@@ -0,0 +1,103 @@
+import pytest
+
+from app.controllers.prompt_controller import get_inference_executor, get_search_batcher
+from app.services.inference_executor import InferenceExecutor
+from conftest import FakeEncoder, make_client, start_prompt_service, write_prompt
+
+
+TOPICS = {
+    "python": ["code", "python"],
+    "rust": ["code", "rust"],
+    "email": ["writing"],
+    "essay": ["writing"],
+    "recipe": ["cooking"],
+    "soup": ["cooking"],
+    "review": ["code", "writing"],
+    "poem": []
+}
+
+QUERIES = [
+    "python function", "rust borrow checker", "formal email", "essay outline",
+    "vegetable soup recipe", "code review", "short poem", "python essay", "email about soup"
+]
+
+SCORES = ('similarity_score', 'lexical_score', 'fused_score')
+
+
+@pytest.fixture
+def prompt_ids():
+    return []
+
+
+@pytest.fixture
+def service(tmp_path, prompts_dir):
+    for topic, tags in TOPICS.items():
+        for variant in range(3):
+            write_prompt(prompts_dir, f"{topic}-{variant}", text=f"{topic} prompt variant {variant} about {topic} things", tags=tags)
+    service = start_prompt_service(tmp_path, FakeEncoder())
+    service.embedding_service.embed_prompts(service.catalog.get_all(), show_progress=False)
+    return service
+
+
+def ids(results):
+    """Ids and scores of results, with scores rounded so float noise does not matter"""
+    return [
+        (result['id'], *(round(result[score], 5) for score in SCORES if score in result))
+        for result in results
+    ]
+
+
+@pytest.mark.parametrize("search_mode", ["semantic", "lexical", "hybrid"])
+@pytest.mark.parametrize("tags", [None, ["code"], ["code", "writing"]])
+def test_batch_matches_single_searches_in_input_order(service, search_mode, tags):
+    options = {'top_k': 4, 'use_reranking': False, 'search_mode': search_mode, 'tags': tags}
+
+    # Chunks smaller than the batch, so results are stitched together across passes
+    batch = service.search_prompts_batch(QUERIES, chunk_size=2, **options)
+
+    assert len(batch) == len(QUERIES)
+    assert [ids(results) for results in batch] == [ids(service.search_prompts(query, **options)) for query in QUERIES]
+
+
+def test_mixed_requests_keep_their_order_across_tag_groups(service):
+    requests = []
+    for i, query in enumerate(QUERIES * 2):
+        requests.append({
+            'query': query,
+            'top_k': 1 + i % 4,
+            'use_reranking': False,
+            'relevance_threshold': 0.3,
+            'initial_candidates': 20,
+            'search_mode': ["semantic", "hybrid", "lexical"][i % 3],
+            'fusion': "rrf",
+            # Interleave filters, so requests of one tag group are not adjacent
+            'tags': [None, ["writing"], ["code", "rust"], ["cooking"]][i % 4],
+            'tag_match': "all" if i % 5 == 0 else "any"
+        })
+
+    results = service.search_prompts_many(requests, use_cache=False)
+
+    expected = [ids(service.search_prompts(**request)) for request in requests]
+    assert [ids(result) for result in results] == expected
+    for request, result in zip(requests, results):
+        assert len(result) <= request['top_k']
+
+
+def test_batch_endpoint_matches_the_search_endpoint(service):
+    executor = InferenceExecutor(max_workers=2, max_queue=8)
+    client = make_client(service, {
+        get_inference_executor: lambda: executor,
+        get_search_batcher: lambda: None
+    })
+    try:
+        params = {'top_k': 3, 'use_reranking': False, 'search_mode': "hybrid", 'tags': ["writing"]}
+        response = client.post("/api/prompts/search/batch", json={'queries': QUERIES, **params})
+        assert response.status_code == 200
+        data = response.json()
+        assert data['total_queries'] == len(QUERIES)
+
+        for query, results in zip(QUERIES, data['results']):
+            single = client.get("/api/prompts/search/", params={'query': query, **params})
+            assert ids(results) == ids(single.json())
+    finally:
+        executor.shutdown()
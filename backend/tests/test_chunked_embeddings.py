@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from app.services.index_generation import IndexGeneration
+from app.services.vector_index import IndexConfig
+from conftest import make_prompt, make_service
+
+
+FILLER = " ".join(f"filler{i}" for i in range(120))
+
+
+def chunking(**overrides):
+    """Chunking options with small windows, so a few hundred words make several chunks"""
+    return {'chunk_tokens': 40, 'chunk_overlap': 8, 'max_chunks': 8, **overrides}
+
+
+def search(service, query, top_k=3):
+    return service.search_by_vectors(service.encode_queries([query], use_cache=False), top_k)[0]
+
+
+def test_vector_ids_pack_label_and_chunk():
+    generation = IndexGeneration(IndexConfig(), chunk_bits=3)
+    ids = generation._vector_ids(np.array([0, 5, 2], dtype='int64'), np.array([1, 3, 2], dtype='int64'))
+
+    assert ids.tolist() == [0, (5 << 3), (5 << 3) + 1, (5 << 3) + 2, (2 << 3), (2 << 3) + 1]
+    assert [int(i) >> 3 for i in ids] == [0, 5, 5, 5, 2, 2]
+
+
+@pytest.mark.parametrize("max_chunks, chunk_bits", [(1, 0), (2, 1), (8, 3), (9, 4), (16, 4)])
+def test_chunk_bits_fit_max_chunks(tmp_path, encoder, max_chunks, chunk_bits):
+    service = make_service(tmp_path, encoder, **chunking(max_chunks=max_chunks))
+    assert service.chunk_bits == chunk_bits
+
+
+def test_chunking_off_keeps_plain_labels(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, **chunking(chunk_tokens=0))
+    service.upsert_prompts([make_prompt("long", FILLER)], show_progress=False)
+
+    assert service.chunk_bits == 0
+    assert service.index.ntotal == 1
+    assert 'matched_chunk' not in search(service, "filler")[0]
+
+
+def test_long_prompts_get_one_vector_per_window(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, **chunking())
+    service.upsert_prompts([
+        make_prompt("short", "a short prompt"),
+        make_prompt("long", FILLER + " the hidden zebra clause"),
+    ], show_progress=False)
+
+    metadata = service.prompt_metadata
+    long_entry = metadata.get(metadata.label_of("long"))
+    assert 'chunks' not in metadata.get(metadata.label_of("short"))
+    assert 2 < long_entry['chunks'] <= service.max_chunks
+    assert metadata.vector_count == 1 + long_entry['chunks']
+    assert service.index.ntotal == metadata.vector_count
+
+
+def test_text_past_the_summary_is_found_through_its_chunk(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, **chunking())
+    service.upsert_prompts([
+        make_prompt("long", FILLER + " the hidden zebra clause"),
+        make_prompt("other", "unrelated prompt about gardening"),
+    ], show_progress=False)
+
+    best = search(service, "hidden zebra clause")[0]
+    assert best['id'] == "long"
+    assert best['matched_chunk'] > 0
+    assert 'chunks' not in best and 'fingerprint' not in best
+
+
+def test_each_prompt_is_returned_once(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, **chunking())
+    service.upsert_prompts([make_prompt(f"p{i}", FILLER + f" topic{i}") for i in range(3)], show_progress=False)
+
+    ids = [result['id'] for result in search(service, "filler1 filler2", top_k=3)]
+    assert sorted(ids) == ["p0", "p1", "p2"]
+
+
+def test_replacing_a_chunked_prompt_drops_its_old_vectors(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, **chunking())
+    service.upsert_prompts([make_prompt("long", FILLER + " zebra")], show_progress=False)
+    service.upsert_prompts([make_prompt("long", "now it is short")], show_progress=False)
+
+    assert service.prompt_metadata.vector_count == 1
+    assert service.index.ntotal == 1
+    assert search(service, "zebra")[0]['matched_chunk'] == 0
+
+
+def test_hnsw_skips_stale_chunks_of_replaced_prompts(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, index_type="hnsw", **chunking())
+    others = [make_prompt(f"p{i}", f"fruit number {i}") for i in range(10)]
+    service.upsert_prompts([make_prompt("long", FILLER + " zebra")] + others, show_progress=False)
+    chunks = service.prompt_metadata.vector_count - len(others)
+    service.upsert_prompts([make_prompt("long", "now it is short")], show_progress=False)
+
+    assert service.get_index_counts()['stale_vectors'] == chunks
+    ids = [result['id'] for result in search(service, "zebra filler3", top_k=11)]
+    assert sorted(ids) == sorted(["long"] + [prompt.id for prompt in others])
+
+
+def test_hnsw_is_compacted_once_most_vectors_are_stale(tmp_path, encoder):
+    service = make_service(tmp_path, encoder, index_type="hnsw", **chunking())
+    service.upsert_prompts([make_prompt("long", FILLER + " zebra"), make_prompt("b", "bananas")], show_progress=False)
+    service.upsert_prompts([make_prompt("long", "now it is short")], show_progress=False)
+
+    assert service.get_index_counts() == {'prompts': 2, 'vectors': 2, 'stale_vectors': 0}
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import EmbeddingCache
+from conftest import FakeEncoder
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Clock advancing one second per reading, so recency never ties"""
+    ticks = iter(range(1000, 100000))
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def make_cache(tmp_path, model_name="model-a", max_entries=100):
+    return EmbeddingCache(tmp_path / "cache.sqlite3", model_name=model_name, max_entries=max_entries)
+
+
+def test_only_misses_are_encoded(tmp_path):
+    cache = make_cache(tmp_path)
+    encoder = FakeEncoder()
+    first = cache.get_or_encode(["apple", "pear"], encoder.encode)
+
+    second = cache.get_or_encode(["pear", "plum", "apple"], encoder.encode)
+
+    assert encoder.encoded == ["apple", "pear", "plum"]
+    np.testing.assert_array_equal(second[[2, 0]], first)
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    encoder = FakeEncoder()
+    cache.get_or_encode(["apple"], encoder.encode)
+    cache.get_or_encode(["pear"], encoder.encode)
+    # Reading "apple" makes "pear" the least recently used
+    cache.get_or_encode(["apple"], encoder.encode)
+    cache.get_or_encode(["plum"], encoder.encode)
+
+    assert cache.get_stats()['entries'] == 2
+    assert sorted(cache.get_many(["apple", "pear", "plum"])) == [0, 2]
+
+
+def test_cache_survives_a_restart(tmp_path):
+    make_cache(tmp_path).put_many(["apple"], FakeEncoder().encode(["apple"]))
+
+    assert list(make_cache(tmp_path).get_many(["apple"])) == [0]
+
+
+def test_changing_the_model_misses_the_cache(tmp_path):
+    make_cache(tmp_path, model_name="model-a").put_many(["apple"], FakeEncoder().encode(["apple"]))
+
+    other = make_cache(tmp_path, model_name="model-b")
+    assert other.get_many(["apple"]) == {}
+    assert other.misses == 1
+
+    # The other model's entries are still there for it
+    assert list(make_cache(tmp_path, model_name="model-a").get_many(["apple"])) == [0]
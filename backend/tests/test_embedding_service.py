@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from conftest import make_prompt, make_service
+
+
+def search_ids(service, query, top_k=5, **filters):
+    results = service.search_by_vectors(service.encode_queries([query], use_cache=False), top_k, **filters)[0]
+    return [result['id'] for result in results]
+
+
+def test_rebuild_swaps_in_a_new_generation(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.upsert_prompts([make_prompt("old", "apples and pears")], show_progress=False)
+    old_generation = service._generation
+    version = service.index_version
+
+    service.rebuild_index(lambda: [make_prompt("new", "bananas and cherries")])
+
+    assert service._generation is not old_generation
+    assert service.index_version > version
+    assert service.get_indexed_ids() == ["new"]
+    # The old generation stays usable for searches that already hold it
+    assert old_generation.metadata.ids() == ["old"]
+
+
+def test_changes_made_during_a_rebuild_are_replayed(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.upsert_prompts([make_prompt("a"), make_prompt("b")], show_progress=False)
+
+    def load_prompts():
+        # Applied to the current generation while the new one is being built
+        service.upsert_prompts([make_prompt("c", "cherries")], show_progress=False)
+        service.upsert_prompts([make_prompt("a", "apples, edited")], show_progress=False)
+        service.delete_prompts(["b"])
+        return [make_prompt("a"), make_prompt("b")]
+
+    phases = []
+    service.rebuild_index(load_prompts, progress=lambda phase, done, total: phases.append(phase))
+
+    assert sorted(service.get_indexed_ids()) == ["a", "c"]
+    assert service._generation.metadata.get(service._generation.metadata.label_of("a"))['fingerprint'] == \
+        service.prompt_fingerprint(make_prompt("a", "apples, edited"))
+    assert phases[0] == "encoding" and phases[-1] == "swapping"
+    assert service._rebuild_log is None
+
+
+def test_only_one_rebuild_runs_at_a_time(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    inside = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        inside.set()
+        release.wait(5)
+        return [make_prompt("a")]
+
+    thread = threading.Thread(target=service.rebuild_index, args=(slow_load,))
+    thread.start()
+    try:
+        assert inside.wait(5)
+        with pytest.raises(RuntimeError):
+            service.rebuild_index(lambda: [])
+    finally:
+        release.set()
+        thread.join()
+    assert service.get_indexed_ids() == ["a"]
+
+
+def test_failed_rebuild_keeps_the_current_generation(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.upsert_prompts([make_prompt("a")], show_progress=False)
+    generation = service._generation
+
+    def broken_load():
+        raise OSError("prompts directory is gone")
+
+    with pytest.raises(OSError):
+        service.rebuild_index(broken_load)
+    assert service._generation is generation
+    assert service._rebuild_log is None
+
+
+def test_rebuilt_generation_is_loaded_after_restart(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.upsert_prompts([make_prompt("old")], show_progress=False)
+    service.rebuild_index(lambda: [make_prompt("x", "kiwi"), make_prompt("y", "mango")])
+
+    restarted = make_service(tmp_path, encoder)
+    assert sorted(restarted.get_indexed_ids()) == ["x", "y"]
+    assert search_ids(restarted, "kiwi", top_k=1) == ["x"]
+
+
+def test_incremental_changes_share_one_delayed_snapshot(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.snapshot_delay = 60
+    service.upsert_prompts([make_prompt("a")], show_progress=False)
+    service.upsert_prompts([make_prompt("b")], show_progress=False)
+    service.delete_prompts(["a"])
+
+    assert service.snapshots.read_manifest() is None
+    assert service.get_index_stats()['unsaved_changes']
+
+    service.flush()
+    manifest = service.snapshots.read_manifest()
+    assert manifest['version'] == 1
+    assert manifest['count'] == 1
+    assert not service.get_index_stats()['unsaved_changes']
+
+    # Nothing left to write
+    service.flush()
+    assert service.snapshots.read_manifest()['version'] == 1
+
+
+def test_delayed_snapshot_is_written_by_the_timer(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.snapshot_delay = 0.05
+    service.upsert_prompts([make_prompt("a")], show_progress=False)
+
+    timer = service._save_timer
+    timer.join(5)
+    assert service.snapshots.read_manifest()['count'] == 1
+    assert service._save_timer is None
+
+
+def test_full_embed_writes_its_snapshot_at_once(tmp_path, encoder):
+    service = make_service(tmp_path, encoder)
+    service.snapshot_delay = 60
+    service.upsert_prompts([make_prompt("a")], show_progress=False)
+    service.embed_prompts([make_prompt("b"), make_prompt("c")], show_progress=False)
+
+    # Includes the change that was waiting for the delayed save
+    assert service.snapshots.read_manifest()['count'] == 3
+    assert service._save_timer is None
+    assert not service.get_index_stats()['unsaved_changes']
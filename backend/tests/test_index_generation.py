@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from app.services.index_generation import IndexGeneration
+from app.services.vector_index import IndexConfig, normalize_vectors, reconstruct_vectors
+
+
+DIMENSION = 16
+
+
+def random_vectors(count, seed=0):
+    return normalize_vectors(np.random.default_rng(seed).standard_normal((count, DIMENSION)))
+
+
+def entries(start, count, chunks=1):
+    metadata = []
+    for i in range(start, start + count):
+        entry = {'id': f"p{i}", 'title': "t", 'description': None, 'tags': []}
+        if chunks > 1:
+            entry['chunks'] = chunks
+        metadata.append(entry)
+    return metadata
+
+
+def top_ids(generation, queries, top_k=1):
+    return [[result['id'] for result in results] for results in generation.search(queries, top_k)]
+
+
+def test_ivf_falls_back_to_flat_until_it_can_be_trained():
+    config = IndexConfig("ivf_flat", nlist=4)
+    generation = IndexGeneration(config)
+    vectors = random_vectors(200)
+
+    generation.upsert(vectors[:10], entries(0, 10))
+    assert generation.index_type == "flat"
+
+    # 4 cells need 4 * 39 training vectors
+    generation.upsert(vectors[10:], entries(10, 190))
+    assert config.min_training_size(200) == 156
+    assert generation.index_type == "ivf_flat"
+    assert generation.index.ntotal == 200
+
+    # Every prompt, indexed before or after the upgrade, is still found
+    generation.config.nprobe = 4
+    generation.index.nprobe = 4
+    assert top_ids(generation, vectors[[0, 9, 10, 199]]) == [["p0"], ["p9"], ["p10"], ["p199"]]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_scores_are_cosine_similarities(index_type):
+    generation = IndexGeneration(IndexConfig(index_type, nlist=4, nprobe=4))
+    vectors = random_vectors(200)
+    generation.upsert(vectors, entries(0, 200))
+
+    results = generation.search(vectors[:5], top_k=3)
+    for query, query_results in zip(vectors[:5], results):
+        assert query_results[0]['similarity_score'] == pytest.approx(1.0, abs=1e-5)
+        for result in query_results:
+            label = int(result['id'][1:])
+            assert result['similarity_score'] == pytest.approx(float(vectors[label] @ query), abs=1e-5)
+            assert -1.0 - 1e-5 <= result['similarity_score'] <= 1.0 + 1e-5
+
+
+@pytest.mark.parametrize("chunk_bits", [0, 2])
+def test_ivf_index_can_be_rebuilt_from_its_vectors(chunk_bits):
+    generation = IndexGeneration(IndexConfig("ivf_flat", nlist=4, nprobe=4), chunk_bits=chunk_bits)
+    chunks = 2 if chunk_bits else 1
+    vectors = random_vectors(200 * chunks)
+    generation.upsert(vectors, entries(0, 200, chunks))
+    generation.delete(["p3"])
+
+    before = top_ids(generation, vectors[::chunks][:20], top_k=3)
+    generation._rebuild()
+
+    assert generation.index_type == "ivf_flat"
+    assert generation.index.ntotal == 199 * chunks
+    assert top_ids(generation, vectors[::chunks][:20], top_k=3) == before
+
+
+def test_ivf_pq_index_can_be_rebuilt_from_its_decoded_vectors():
+    generation = IndexGeneration(IndexConfig("ivf_pq", nlist=4, nprobe=4, pq_nbits=4))
+    generation.upsert(random_vectors(700), entries(0, 700))
+    generation.delete(["p3"])
+    generation._rebuild()
+
+    assert generation.index_type == "ivf_pq"
+    assert generation.index.ntotal == 699
+    assert sorted(generation.metadata.labels()) == [label for label in range(700) if label != 3]
+
+
+def test_reconstruct_adds_a_direct_map_to_ivf_indexes():
+    generation = IndexGeneration(IndexConfig("ivf_flat", nlist=4))
+    vectors = random_vectors(200)
+    generation.upsert(vectors, entries(0, 200))
+
+    ids = np.array([199, 0, 57], dtype='int64')
+    np.testing.assert_allclose(reconstruct_vectors(generation.index, ids), vectors[ids], atol=1e-6)
+
+    # Removal keeps working with the direct map in place
+    generation.delete(["p57"])
+    assert generation.index.ntotal == 199
@@ -0,0 +1,205 @@
+import gc
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services import index_snapshot
+from app.services.index_snapshot import MetadataTable, SnapshotStore
+from app.services.vector_index import is_memory_mapped
+
+
+def make_entry(prompt_id, tags=(), **extra):
+    return {'id': prompt_id, 'title': f"Title {prompt_id}", 'description': None, 'tags': list(tags), **extra}
+
+
+def make_index(count, dimension=8):
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    if count:
+        vectors = np.random.default_rng(0).standard_normal((count, dimension)).astype('float32')
+        index.add_with_ids(vectors, np.arange(count, dtype='int64'))
+    return index
+
+
+def make_table(ids):
+    table = MetadataTable()
+    for label, prompt_id in enumerate(ids):
+        table.put(label, make_entry(prompt_id, tags=[f"tag{label % 2}"]))
+    return table
+
+
+def test_metadata_round_trips_through_a_snapshot(tmp_path):
+    table = MetadataTable()
+    table.put(0, make_entry("alpha", tags=["x", "y"]))
+    table.put(1, make_entry("beta", chunks=3, fingerprint="abc"))
+    table.put(2, {'id': "gamma", 'title': "Ünïcode", 'description': "desc", 'tags': []})
+    table.write(tmp_path)
+
+    loaded = MetadataTable(tmp_path)
+    assert len(loaded) == 3
+    assert loaded.vector_count == 5
+    assert loaded.get(0) == make_entry("alpha", tags=["x", "y"])
+    assert loaded.get(1) == make_entry("beta", chunks=3, fingerprint="abc")
+    assert loaded.get(2) == {'id': "gamma", 'title': "Ünïcode", 'description': "desc", 'tags': []}
+    assert loaded.get(3) is None
+
+
+def test_label_of_binary_search(tmp_path):
+    ids = ["m", "b", "zeta", "a", "é", "b2", "k"]
+    make_table(ids).write(tmp_path)
+    table = MetadataTable(tmp_path)
+
+    for label, prompt_id in enumerate(ids):
+        assert table.label_of(prompt_id) == label
+    for missing in ["", "0", "aa", "c", "zz", "ê"]:
+        assert table.label_of(missing) is None
+
+
+def test_overlay_changes_over_base_rows(tmp_path):
+    make_table(["a", "b", "c"]).write(tmp_path)
+    table = MetadataTable(tmp_path)
+
+    assert table.remove(1)['id'] == "b"
+    assert table.label_of("b") is None
+    assert 1 not in table
+
+    table.put(0, make_entry("a", tags=["new"], chunks=2))
+    table.put(7, make_entry("d"))
+    assert table.get(0)['tags'] == ["new"]
+    assert table.label_of("d") == 7
+    assert len(table) == 3
+    assert table.vector_count == 4
+    assert sorted(table.ids()) == ["a", "c", "d"]
+
+
+def test_save_and_load_current_snapshot(tmp_path):
+    store = SnapshotStore(tmp_path)
+    assert store.load() is None
+
+    store.save(make_index(2), make_table(["a", "b"]), {'next_label': 2})
+    manifest = store.save(make_index(3), make_table(["a", "b", "c"]), {'next_label': 3})
+
+    loaded_manifest, index, metadata = store.load()
+    assert manifest['version'] == 2
+    assert loaded_manifest == manifest
+    assert index.ntotal == 3
+    assert metadata.label_of("c") == 2
+
+
+def test_snapshot_is_flushed_to_disk_before_it_is_published(tmp_path, monkeypatch):
+    events = []
+    fsync_file, fsync_directory, replace = index_snapshot._fsync_file, index_snapshot._fsync_directory, index_snapshot.os.replace
+
+    def record(kind, function):
+        def wrapper(*paths):
+            events.append((kind, *(str(path) for path in paths)))
+            return function(*paths)
+        return wrapper
+
+    monkeypatch.setattr(index_snapshot, "_fsync_file", record("file", fsync_file))
+    monkeypatch.setattr(index_snapshot, "_fsync_directory", record("directory", fsync_directory))
+    monkeypatch.setattr(index_snapshot.os, "replace", record("replace", replace))
+
+    store = SnapshotStore(tmp_path)
+    store.save(make_index(2), make_table(["a", "b"]), {'next_label': 2})
+
+    kinds = [event[0] for event in events]
+    publish = kinds.index("replace")
+    staging = events[publish][1]
+    staged_files = {event[1] for event in events[:publish] if event[0] == "file"}
+    assert staged_files == {staging + "/" + path.name for path in (store.snapshots_dir / "00000001").iterdir()}
+    assert ("directory", staging) in events[:publish]
+    assert events[publish + 1] == ("directory", str(store.snapshots_dir))
+    assert events[-2] == ("replace", str(store.manifest_path.with_suffix(".json.tmp")), str(store.manifest_path))
+    assert events[-1] == ("directory", str(tmp_path))
+
+
+def test_load_rejects_snapshot_not_matching_manifest(tmp_path):
+    store = SnapshotStore(tmp_path)
+    manifest = store.save(make_index(2), make_table(["a", "b"]), {})
+    store.manifest_path.write_text(json.dumps({**manifest, 'count': 3}), encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        store.load()
+
+
+def test_load_rejects_unknown_format(tmp_path):
+    store = SnapshotStore(tmp_path)
+    manifest = store.save(make_index(1), make_table(["a"]), {})
+    store.manifest_path.write_text(json.dumps({**manifest, 'format_version': 0}), encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        store.load()
+
+
+def test_old_snapshots_are_removed(tmp_path):
+    store = SnapshotStore(tmp_path)
+    for _ in range(5):
+        manifest = store.save(make_index(1), make_table(["a"]), {})
+
+    kept = sorted(path.name for path in store.snapshots_dir.iterdir())
+    assert len(kept) == index_snapshot.SNAPSHOTS_TO_KEEP
+    assert kept[-1] == manifest['snapshot']
+
+
+def test_leased_snapshot_is_kept_until_released(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = store.save(make_index(1), make_table(["a"]), {})
+    in_use = store.open_metadata(first)
+
+    for _ in range(3):
+        store.save(make_index(1), make_table(["a"]), {})
+    assert (store.snapshots_dir / first['snapshot']).exists()
+    assert in_use.label_of("a") == 0
+
+    del in_use
+    gc.collect()
+    store.save(make_index(1), make_table(["a"]), {})
+    assert not (store.snapshots_dir / first['snapshot']).exists()
+
+
+def test_staging_directories_of_other_writers_are_left_alone(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.snapshots_dir.mkdir(parents=True)
+    other = store.snapshots_dir / ".staging-other-writer"
+    other.mkdir()
+
+    for _ in range(3):
+        store.save(make_index(1), make_table(["a"]), {})
+    assert other.exists()
+
+
+def test_failed_save_removes_its_staging_directory(tmp_path):
+    class BrokenTable(MetadataTable):
+        def write(self, directory):
+            raise OSError("disk full")
+
+    store = SnapshotStore(tmp_path)
+    with pytest.raises(OSError):
+        store.save(make_index(0), BrokenTable(), {})
+
+    assert list(store.snapshots_dir.iterdir()) == []
+    assert store.read_manifest() is None
+
+
+def test_versions_continue_after_existing_snapshot_directories(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.snapshots_dir.mkdir(parents=True)
+    (store.snapshots_dir / "00000007").mkdir()
+
+    assert store.save(make_index(1), make_table(["a"]), {})['version'] == 8
+
+
+def test_memory_mapped_reports_what_was_loaded(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.save(make_index(1), make_table(["a"]), {})
+    assert not is_memory_mapped(store.load(mmap=True)[1])
+
+    vectors = np.random.default_rng(0).standard_normal((200, 8)).astype('float32')
+    ivf = faiss.IndexIVFFlat(faiss.IndexFlatIP(8), 8, 2, faiss.METRIC_INNER_PRODUCT)
+    ivf.train(vectors)
+    ivf.add_with_ids(vectors[:1], np.zeros(1, dtype='int64'))
+    store.save(ivf, make_table(["a"]), {})
+    assert is_memory_mapped(store.load(mmap=True)[1])
+    assert not is_memory_mapped(store.load(mmap=False)[1])
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.config import settings
+from app.controllers.prompt_controller import get_inference_executor, get_search_batcher
+from app.services.inference_executor import ExecutorSaturatedError, InferenceExecutor
+from conftest import make_client, start_prompt_service
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_tasks_beyond_workers_and_queue_are_rejected(executor):
+    release = threading.Event()
+
+    async def scenario():
+        # One task runs, one waits for the worker
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        waiting = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        assert executor.in_flight == 2
+        assert executor.queue_depth == 1
+
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(lambda: "rejected")
+        assert executor.rejected == 1
+
+        release.set()
+        assert await running is True
+        assert await waiting == "queued"
+
+        # Slots are freed once the work is done
+        assert await executor.run(lambda: "accepted") == "accepted"
+        assert executor.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_failing_task_frees_its_slot(executor):
+    def fail():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await executor.run(fail)
+        assert executor.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def saturated(executor):
+    """Executor with every worker and queue slot taken"""
+    for _ in range(executor.max_workers + executor.max_queue):
+        executor._acquire()
+    return executor
+
+
+@pytest.fixture
+def client(tmp_path, prompts_dir, saturated):
+    service = start_prompt_service(tmp_path)
+    return make_client(service, {
+        get_inference_executor: lambda: saturated,
+        get_search_batcher: lambda: None
+    })
+
+
+def test_saturated_executor_answers_503_with_retry_after(client):
+    response = client.put("/api/prompts/alpha/index")
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "1"
+
+
+def test_saturated_batch_search_answers_503(client):
+    response = client.post("/api/prompts/search/batch", json={'queries': ["alpha"]})
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "1"
+
+
+def test_saturated_search_falls_back_to_lexical(client, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_fallback", True)
+    response = client.get("/api/prompts/search/", params={'query': "text of alpha", 'search_mode': "semantic"})
+
+    assert response.status_code == 200
+    assert response.headers['x-search-fallback'] == "lexical"
+    assert response.json()[0]['id'] == "alpha"
+
+
+def test_saturated_search_is_rejected_without_fallback(client, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_fallback", False)
+    response = client.get("/api/prompts/search/", params={'query': "alpha"})
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "1"
+    assert 'x-search-fallback' not in response.headers
@@ -0,0 +1,84 @@
+import pytest
+
+from app.services.lexical_index import BM25Index, fuse_results, tokenize
+from conftest import make_prompt
+
+
+def test_tokenize_keeps_compounds_and_their_parts():
+    assert tokenize("Code-Review of snake_case v1.2") == [
+        "code-review", "code", "review", "of", "snake_case", "snake", "case", "v1.2", "v1", "2"
+    ]
+
+
+def test_search_ranks_by_bm25():
+    index = BM25Index()
+    index.upsert([
+        make_prompt("sql", "optimize a slow sql query with an index", title="SQL tuning"),
+        make_prompt("email", "write a polite email to a customer", title="Email"),
+        make_prompt("mixed", "email a summary of the sql migration", title="Status"),
+    ])
+
+    results = index.search("sql query")
+    assert [prompt_id for prompt_id, _ in results] == ["sql", "mixed"]
+    assert results[0][1] > results[1][1] > 0
+    # Prompts sharing no term with the query are left out
+    assert index.search("kubernetes") == []
+
+
+def test_rare_terms_weigh_more():
+    index = BM25Index()
+    index.upsert([make_prompt(f"common{i}", "write code") for i in range(5)])
+    index.upsert([make_prompt("rare", "write rust code")])
+
+    assert index.search("write rust", top_k=1)[0][0] == "rare"
+
+
+def test_upsert_replaces_and_remove_forgets():
+    index = BM25Index()
+    index.upsert([make_prompt("a", "apples"), make_prompt("b", "bananas")])
+    index.upsert([make_prompt("a", "cherries")])
+
+    assert index.search("apples") == []
+    assert [prompt_id for prompt_id, _ in index.search("cherries")] == ["a"]
+
+    index.remove(["a", "missing"])
+    assert len(index) == 1
+    assert index.search("cherries") == []
+    assert index.get_stats()['documents'] == 1
+
+
+def test_accept_filters_before_the_top_k_cut():
+    index = BM25Index()
+    index.upsert([make_prompt(f"p{i}", "shared words " * (i + 1)) for i in range(5)])
+
+    results = index.search("shared", top_k=2, accept=lambda prompt_id: prompt_id in ("p0", "p1"))
+    assert sorted(prompt_id for prompt_id, _ in results) == ["p0", "p1"]
+
+
+def test_rrf_fusion_rewards_agreement():
+    semantic = [{'id': "a", 'similarity_score': 0.9}, {'id': "b", 'similarity_score': 0.8}]
+    lexical = [{'id': "b", 'lexical_score': 7.0}, {'id': "c", 'lexical_score': 3.0}]
+
+    fused = fuse_results(semantic, lexical, method="rrf", rrf_k=60)
+
+    assert [result['id'] for result in fused] == ["b", "a", "c"]
+    assert fused[0]['fused_score'] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1]['fused_score'] == pytest.approx(1 / 61)
+    # Fields of both lists are merged into one result
+    assert fused[0]['similarity_score'] == 0.8 and fused[0]['lexical_score'] == 7.0
+
+
+def test_weighted_fusion_scales_bm25_by_the_best_score():
+    semantic = [{'id': "a", 'similarity_score': 0.5}, {'id': "b", 'similarity_score': -0.2}]
+    lexical = [{'id': "b", 'lexical_score': 4.0}, {'id': "c", 'lexical_score': 2.0}]
+
+    fused = {result['id']: result['fused_score'] for result in fuse_results(semantic, lexical, method="weighted", semantic_weight=0.75)}
+
+    assert fused["a"] == pytest.approx(0.75 * 0.5)
+    assert fused["b"] == pytest.approx(0.25 * 1.0)
+    assert fused["c"] == pytest.approx(0.25 * 0.5)
+
+
+def test_unknown_fusion_method_is_rejected():
+    with pytest.raises(ValueError):
+        fuse_results([], [], method="max")
@@ -0,0 +1,146 @@
+import json
+import os
+
+import pytest
+
+from app.controllers.prompt_controller import _etag_matches
+from app.services.prompt_catalog import PromptCatalog
+from conftest import make_client, start_prompt_service, write_prompt
+
+
+@pytest.fixture
+def service(prompts_dir, tmp_path):
+    return start_prompt_service(tmp_path)
+
+
+@pytest.fixture
+def client(service):
+    return make_client(service)
+
+
+def page(service, cursor=None, limit=None, fields=None):
+    return json.loads(service.get_prompts_page_json(cursor, limit, fields)[1])
+
+
+@pytest.mark.parametrize("prompt_id", ["a", "ab", "abc", "code-review_v1.2", "prompt/with?chars", "üñíçødé"])
+def test_cursor_round_trip(prompt_id):
+    cursor = PromptCatalog.encode_cursor(prompt_id)
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert PromptCatalog.decode_cursor(cursor) == prompt_id
+
+
+@pytest.mark.parametrize("cursor", ["", "!!!", "a", "_w"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        PromptCatalog.decode_cursor(cursor)
+
+
+def test_pages_cover_every_prompt_in_id_order(service):
+    ids, cursor = [], None
+    while True:
+        data = page(service, cursor, limit=2)
+        assert data['total'] == 5
+        ids += [prompt['id'] for prompt in data['prompts']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert ids == ["alpha", "bravo", "charlie", "delta", "echo"]
+
+
+def test_pages_stay_consistent_when_prompts_change(service, prompts_dir):
+    first = page(service, limit=2)
+    write_prompt(prompts_dir, "aardvark")
+    os.remove(prompts_dir / "charlie.yml")
+
+    second = page(service, first['next_cursor'], limit=2)
+    assert [prompt['id'] for prompt in second['prompts']] == ["delta", "echo"]
+    assert second['next_cursor'] is None
+
+
+def test_field_projection_always_includes_the_id(service):
+    data = page(service, limit=1, fields=["title", "title", "id"])
+    assert data['prompts'] == [{'id': "alpha", 'title': "Title alpha"}]
+
+    with pytest.raises(ValueError):
+        page(service, fields=["title", "secret"])
+
+
+class FakeRequest:
+    def __init__(self, header=None):
+        self.headers = {"if-none-match": header} if header is not None else {}
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc-3"', True),
+    ('W/"abc-3"', True),
+    ('"abc-2", "abc-3"', True),
+    ('*', True),
+    ('"abc-2"', False),
+    ('abc-3', False),
+])
+def test_etag_matches(header, matches):
+    assert _etag_matches(FakeRequest(header), '"abc-3"') is matches
+
+
+def test_listing_revalidates_with_etag(client, prompts_dir):
+    params = {'limit': 2, 'fields': "id,title"}
+    response = client.get("/api/prompts/", params=params)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.json()['prompts'] == [{'id': "alpha", 'title': "Title alpha"}, {'id': "bravo", 'title': "Title bravo"}]
+
+    cached = client.get("/api/prompts/", params=params, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['etag'] == etag
+
+    # Any change to the catalog changes the entity tag
+    write_prompt(prompts_dir, "foxtrot")
+    changed = client.get("/api/prompts/", params=params, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json()['total'] == 6
+
+
+def test_listing_etag_depends_on_the_page_and_fields(client):
+    first = client.get("/api/prompts/", params={'limit': 2})
+    etag = first.headers['etag']
+    cursor = first.json()['next_cursor']
+
+    # Same catalog version, but a different representation
+    for params in ({'cursor': cursor, 'limit': 2}, {'limit': 2, 'fields': "title"}, {'limit': 3}, {}):
+        response = client.get("/api/prompts/", params=params, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+
+    # Field order and repetition do not matter
+    etag = client.get("/api/prompts/", params={'fields': "title,id"}).headers['etag']
+    assert client.get("/api/prompts/", params={'fields': "id, title,title"}, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_full_listing_is_served_without_pagination(client):
+    data = client.get("/api/prompts/").json()
+    assert data['total'] == 5
+    assert data['next_cursor'] is None
+    assert {prompt['id'] for prompt in data['prompts']} == {"alpha", "bravo", "charlie", "delta", "echo"}
+
+
+def test_single_prompt_etag_changes_only_with_its_file(client, prompts_dir):
+    etag = client.get("/api/prompts/alpha").headers['etag']
+
+    write_prompt(prompts_dir, "foxtrot")
+    assert client.get("/api/prompts/alpha", headers={'If-None-Match': etag}).status_code == 304
+
+    path = write_prompt(prompts_dir, "alpha", title="Renamed")
+    os.utime(path, (1, 1))
+    response = client.get("/api/prompts/alpha", headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['title'] == "Renamed"
+
+
+def test_bad_cursor_and_fields_are_client_errors(client):
+    assert client.get("/api/prompts/", params={'cursor': "!!!"}).status_code == 400
+    assert client.get("/api/prompts/", params={'fields': "nope"}).status_code == 400
+    assert client.get("/api/prompts/", params={'limit': 0}).status_code == 422
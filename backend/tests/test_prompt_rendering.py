@@ -0,0 +1,168 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.models.prompt import Prompt, Variable
+from app.services.prompt_catalog import CatalogEntry
+from app.services.prompt_template import CompiledTemplate
+from conftest import make_client, start_prompt_service
+
+
+GREETING = """id: greeting
+title: Greeting
+prompt: "Hello {{name}}, welcome to {{place}}. {{unknown}}"
+variables:
+  - name: name
+  - name: place
+"""
+
+
+@pytest.fixture
+def service(tmp_path):
+    directory = tmp_path / "prompts"
+    directory.mkdir()
+    (directory / "greeting.yml").write_text(GREETING, encoding='utf-8')
+    return start_prompt_service(tmp_path)
+
+
+def render(service, values):
+    return service.render_prompt_with_variables("greeting", values).rendered_text
+
+
+def entry_for(text, variables):
+    prompt = Prompt(id="p", title="P", prompt=text, variables=variables)
+    return CatalogEntry(Path("p.yml"), 0.0, 0, prompt)
+
+
+def legacy_render(prompt, values):
+    """The renderer templates replaced: one str.replace per declared variable"""
+    text = prompt.prompt
+    for variable in prompt.variables:
+        value = values.get(variable.name)
+        if value is None:
+            if variable.default_value:
+                value = variable.default_value
+            elif variable.required:
+                raise ValueError(f"Required variable '{variable.name}' not provided")
+            else:
+                value = ""
+        text = text.replace(f"{{{{{variable.name}}}}}", str(value))
+    return text
+
+
+VARIABLES = [
+    Variable(name="name", type="text_input"),
+    Variable(name="place", type="default_value", default_value="the team"),
+    Variable(name="signature", type="text_input", required=False)
+]
+
+
+def test_template_splits_literals_and_placeholders():
+    template = CompiledTemplate("a {{x}} b {{y}}{{x}}", declared=["x"])
+
+    assert template.literals == ["a ", " b ", "", ""]
+    assert template.names == ["x", "y", "x"]
+    assert template.undeclared == ["y"]
+
+
+def test_placeholders_without_a_value_stay_verbatim():
+    template = CompiledTemplate("{{x}} and {{ y }} and {{z}}")
+
+    assert template.render({'x': "1"}) == "1 and {{ y }} and {{z}}"
+
+
+def test_substitution_is_a_single_pass():
+    template = CompiledTemplate("{{a}} {{b}}")
+
+    # A value that looks like a placeholder is not expanded again
+    assert template.render({'a': "{{b}}", 'b': "{{a}}"}) == "{{b}} {{a}}"
+
+
+def test_text_without_placeholders_renders_unchanged():
+    assert CompiledTemplate("no {placeholders} here").render({'x': "1"}) == "no {placeholders} here"
+
+
+def test_file_variables_default_to_na(service):
+    assert render(service, {'name': "Ada"}) == "Hello Ada, welcome to NA. {{unknown}}"
+    assert render(service, {'name': "Ada", 'place': "the lab"}) == "Hello Ada, welcome to the lab. {{unknown}}"
+
+
+def test_undeclared_placeholder_is_filled_only_when_given(service):
+    assert render(service, {'name': "Ada", 'unknown': 42}) == "Hello Ada, welcome to NA. 42"
+
+
+@pytest.mark.parametrize("values", [
+    {'name': "Ada"},
+    {'name': "Ada", 'place': "the lab", 'signature': "Bye"},
+    {'name': 7, 'signature': None},
+    {'name': "Ada", 'other': "ignored"}
+])
+def test_declared_variables_render_as_before(service, values):
+    entry = entry_for("Hi {{name}}, {{place}}!{{signature}} {{name}} {{undeclared}}", VARIABLES)
+
+    assert service._render_entry(entry, values) == legacy_render(entry.prompt, values)
+
+
+def test_value_containing_a_placeholder_is_not_expanded(service):
+    entry = entry_for("{{name}} at {{place}}", VARIABLES)
+
+    assert service._render_entry(entry, {'name': "{{place}}"}) == "{{place}} at the team"
+
+
+def test_missing_required_variable_raises_as_before(service):
+    entry = entry_for("Hi {{name}}", VARIABLES)
+
+    with pytest.raises(ValueError) as new_error:
+        service._render_entry(entry, {'place': "the lab"})
+    with pytest.raises(ValueError) as old_error:
+        legacy_render(entry.prompt, {'place': "the lab"})
+    assert str(new_error.value) == str(old_error.value) == "Required variable 'name' not provided"
+
+
+def test_unknown_prompt_renders_nothing(service):
+    assert service.render_prompt_with_variables("missing", {}) is None
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    # Prompt files cannot declare required variables, so serve one from memory
+    strict = entry_for("Dear {{name}}", VARIABLES)
+    get_entry, get = service.catalog.get_entry, service.catalog.get
+    monkeypatch.setattr(service.catalog, "get_entry", lambda prompt_id: strict if prompt_id == "strict" else get_entry(prompt_id))
+    monkeypatch.setattr(service.catalog, "get", lambda prompt_id: strict.prompt if prompt_id == "strict" else get(prompt_id))
+    return make_client(service)
+
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_render_reports_errors_inline(client):
+    response = client.post("/api/prompts/render/batch", json=[
+        {'prompt_id': "greeting", 'variable_values': {'name': "Ada"}},
+        {'prompt_id': "missing", 'variable_values': {}},
+        {'prompt_id': "strict", 'variable_values': {}},
+        {'prompt_id': "strict", 'variable_values': {'name': "Bob"}}
+    ])
+
+    assert ndjson(response) == [
+        {'index': 0, 'prompt_id': "greeting", 'rendered_text': "Hello Ada, welcome to NA. {{unknown}}"},
+        {'index': 1, 'prompt_id': "missing", 'status': 404, 'error': "Prompt with ID 'missing' not found"},
+        {'index': 2, 'prompt_id': "strict", 'status': 400, 'error': "Required variable 'name' not provided"},
+        {'index': 3, 'prompt_id': "strict", 'rendered_text': "Dear Bob"}
+    ]
+
+
+def test_batch_render_of_one_prompt_reports_invalid_sets_inline(client):
+    response = client.post("/api/prompts/strict/render/batch", json=[{'name': "Ada"}, {}, {'name': "Bob"}])
+
+    results = ndjson(response)
+    assert [result.get('rendered_text') for result in results] == ["Dear Ada", None, "Dear Bob"]
+    assert results[1]['status'] == 400
+
+
+def test_batch_render_of_an_unknown_prompt_is_404(client):
+    assert client.post("/api/prompts/missing/render/batch", json=[{}]).status_code == 404
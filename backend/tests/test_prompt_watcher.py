@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from app.services.prompt_service import ModelsLoadingError
+from app.services.prompt_watcher import PromptWatcher
+from conftest import FakeEncoder, start_prompt_service, write_prompt
+
+
+@pytest.fixture
+def prompt_ids():
+    return ["a", "b", "c"]
+
+
+def test_initial_sync_indexes_a_new_library(tmp_path, prompts_dir):
+    service = start_prompt_service(tmp_path, FakeEncoder())
+    PromptWatcher(service)._initial_sync()
+
+    assert sorted(service.embedding_service.get_indexed_ids()) == ["a", "b", "c"]
+
+
+def test_initial_sync_only_reembeds_what_changed(tmp_path, prompts_dir):
+    PromptWatcher(start_prompt_service(tmp_path, FakeEncoder()))._initial_sync()
+
+    path = write_prompt(prompts_dir, "b", text="edited while the server was down")
+    os.utime(path, (1, 1))
+    write_prompt(prompts_dir, "d")
+    os.remove(prompts_dir / "c.yml")
+
+    encoder = FakeEncoder()
+    service = start_prompt_service(tmp_path, encoder)
+    PromptWatcher(service)._initial_sync()
+
+    assert sorted(service.embedding_service.get_indexed_ids()) == ["a", "b", "d"]
+    assert len(encoder.encoded) == 2
+    assert not any("Title a" in text for text in encoder.encoded)
+
+
+def test_initial_sync_of_an_unchanged_library_embeds_nothing(tmp_path, prompts_dir):
+    PromptWatcher(start_prompt_service(tmp_path, FakeEncoder()))._initial_sync()
+
+    encoder = FakeEncoder()
+    service = start_prompt_service(tmp_path, encoder)
+    version = service.embedding_service.snapshots.read_manifest()['version']
+    PromptWatcher(service)._initial_sync()
+
+    assert encoder.encoded == []
+    assert service.embedding_service.snapshots.read_manifest()['version'] == version
+
+
+def test_failed_changes_stay_pending(tmp_path, prompts_dir):
+    service = start_prompt_service(tmp_path, FakeEncoder())
+    watcher = PromptWatcher(service)
+    watcher._initial_sync()
+    service.models_ready = False
+
+    write_prompt(prompts_dir, "d")
+    os.remove(prompts_dir / "c.yml")
+    with pytest.raises(ModelsLoadingError):
+        watcher.poll(force=True)
+    assert watcher._pending == {"c", "d"}
+
+    service.models_ready = True
+    watcher.poll(force=True)
+    assert watcher._pending == set()
+    assert sorted(service.embedding_service.get_indexed_ids()) == ["a", "b", "d"]
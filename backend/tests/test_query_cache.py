@@ -0,0 +1,102 @@
+import pytest
+
+from app.services import query_cache
+from app.services.query_cache import TTLCache
+from conftest import FakeEncoder, start_prompt_service, write_prompt
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.put("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+
+    clock.now += 0.2
+    assert cache.get("a") is None
+    assert cache.get_stats()['size'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_storing_again_renews_the_ttl(clock):
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.put("a", 1)
+    clock.now += 8
+    cache.put("a", 2)
+    clock.now += 8
+
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.get_stats()['size'] == 2
+
+
+def test_zero_size_disables_the_cache():
+    cache = TTLCache(max_size=0)
+    cache.put("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def service(tmp_path, prompts_dir):
+    return start_prompt_service(tmp_path, FakeEncoder())
+
+
+def search(service, query, **options):
+    return [result['id'] for result in service.search_prompts(query, use_reranking=False, **options)]
+
+
+def test_repeated_search_is_answered_from_the_result_cache(service):
+    first = search(service, "text of alpha")
+    misses = service.result_cache.misses
+
+    assert search(service, "  Text of ALPHA ") == first
+    assert service.result_cache.hits == 1
+    assert service.result_cache.misses == misses
+
+
+def test_index_change_invalidates_cached_results(service):
+    service.embedding_service.embed_prompts(service.catalog.get_all(), show_progress=False)
+    assert "alpha" in search(service, "text of alpha")
+
+    service.embedding_service.delete_prompts(["alpha"])
+
+    assert "alpha" not in search(service, "text of alpha")
+    assert service.result_cache.hits == 0
+
+
+def test_catalog_change_invalidates_cached_results(service, prompts_dir):
+    assert "foxtrot" not in search(service, "foxtrot", search_mode="lexical")
+
+    write_prompt(prompts_dir, "foxtrot")
+
+    assert search(service, "foxtrot", search_mode="lexical")[0] == "foxtrot"
+    assert service.result_cache.hits == 0
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.prompt_service import PromptService
+from app.services.service_registry import registry
+from conftest import FakeEncoder, make_service
+
+
+@pytest.fixture
+def loading(tmp_path, prompts_dir, monkeypatch):
+    """
+    Start the registry over tmp_path with models that load once the returned event is set
+
+    The real models are replaced by an embedding service using FakeEncoder.
+    """
+    release = threading.Event()
+
+    def load_models(service, build_index=True, index_config=None):
+        if not release.wait(10):
+            raise RuntimeError("models were never released")
+        service.embedding_service = make_service(tmp_path, FakeEncoder())
+        if build_index:
+            service.ensure_index()
+        service.models_ready = True
+
+    monkeypatch.setattr(PromptService, "load_models", load_models)
+    monkeypatch.setattr(settings, "prompts_dir", str(prompts_dir))
+    monkeypatch.setattr(settings, "index_dir", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "background_loading", True)
+    monkeypatch.setattr(settings, "index_on_startup", True)
+    monkeypatch.setattr(settings, "watch_prompts", False)
+    monkeypatch.setattr(settings, "embedding_cache_size", 0)
+    monkeypatch.setattr(settings, "lexical_fallback", True)
+    registry.startup()
+    yield release
+    release.set()
+    if registry._loader is not None:
+        registry._loader.join(10)
+    registry.shutdown()
+
+
+def finish_loading(release):
+    release.set()
+    registry._loader.join(10)
+    assert registry.model_state == "ready"
+
+
+@pytest.fixture
+def client(loading):
+    return TestClient(app)
+
+
+def test_catalog_readiness_does_not_wait_for_models(client, loading):
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()['models']['state'] == "loading"
+
+
+def test_model_readiness_waits_for_models(client, loading):
+    response = client.get("/health/ready", params={'models': True})
+    assert response.status_code == 503
+    assert response.json()['status'] == "not_ready"
+
+    finish_loading(loading)
+
+    response = client.get("/health/ready", params={'models': True})
+    assert response.status_code == 200
+    assert response.json()['models']['state'] == "ready"
+
+
+def test_search_falls_back_to_lexical_while_models_load(client, loading):
+    response = client.get("/api/prompts/search/", params={'query': "text of alpha", 'use_reranking': False})
+
+    assert response.status_code == 200
+    assert response.headers['x-search-fallback'] == "lexical"
+    assert response.json()[0]['id'] == "alpha"
+
+    finish_loading(loading)
+
+    response = client.get("/api/prompts/search/", params={'query': "text of alpha", 'use_reranking': False})
+    assert response.status_code == 200
+    assert 'x-search-fallback' not in response.headers
+    assert response.json()[0]['id'] == "alpha"
+
+
+def test_search_is_rejected_while_models_load_without_fallback(client, loading, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_fallback", False)
+    response = client.get("/api/prompts/search/", params={'query': "alpha"})
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "5"
+
+
+def test_endpoints_needing_models_answer_503_while_they_load(client, loading):
+    response = client.put("/api/prompts/alpha/index")
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "5"
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.inference_executor import InferenceExecutor
+from app.services.search_batcher import SearchBatcher
+
+
+class RecordingService:
+    """Stand-in for PromptService that answers each search with its own query"""
+
+    def __init__(self, error: Exception = None):
+        self.batches = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def search_prompts_many(self, requests):
+        with self._lock:
+            self.batches.append([request['query'] for request in requests])
+        if self.error is not None:
+            raise self.error
+        return [[{'id': request['query']}] for request in requests]
+
+
+def run_searches(batcher, queries):
+    """Issue concurrent searches through the batcher and gather their results"""
+    async def main():
+        return await asyncio.gather(*(batcher.search(query=query) for query in queries))
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_workers=2, max_queue=8)
+    yield executor
+    executor.shutdown()
+
+
+def test_concurrent_searches_share_one_batch(executor):
+    service = RecordingService()
+    batcher = SearchBatcher(service, executor, max_batch_size=16, max_wait=0.05)
+
+    results = run_searches(batcher, ["a", "b", "c"])
+
+    assert service.batches == [["a", "b", "c"]]
+    assert results == [[{'id': "a"}], [{'id': "b"}], [{'id': "c"}]]
+    assert batcher.get_stats()['avg_batch_size'] == 3
+
+
+def test_full_batch_is_sent_without_waiting(executor):
+    service = RecordingService()
+    batcher = SearchBatcher(service, executor, max_batch_size=2, max_wait=10.0)
+
+    results = run_searches(batcher, ["a", "b", "c", "d"])
+
+    assert service.batches == [["a", "b"], ["c", "d"]]
+    assert [result[0]['id'] for result in results] == ["a", "b", "c", "d"]
+
+
+def test_batch_error_reaches_every_caller(executor):
+    service = RecordingService(error=RuntimeError("encoder failed"))
+    batcher = SearchBatcher(service, executor, max_batch_size=16, max_wait=0.01)
+
+    async def main():
+        return await asyncio.gather(batcher.search(query="a"), batcher.search(query="b"), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert service.batches == [["a", "b"]]
+
+
+def test_batches_in_flight_are_tracked_until_they_finish(executor):
+    service = RecordingService()
+    batcher = SearchBatcher(service, executor, max_batch_size=2, max_wait=10.0)
+
+    async def main():
+        searches = [asyncio.ensure_future(batcher.search(query=query)) for query in ["a", "b"]]
+        await asyncio.sleep(0)
+        assert len(batcher._tasks) == 1
+        await asyncio.gather(*searches)
+        await asyncio.sleep(0)
+        assert batcher._tasks == set()
+
+    asyncio.run(main())
+
+
+def test_close_runs_queued_searches_and_waits_for_them(executor):
+    service = RecordingService()
+    batcher = SearchBatcher(service, executor, max_batch_size=16, max_wait=10.0)
+
+    async def main():
+        searches = [asyncio.ensure_future(batcher.search(query=query)) for query in ["a", "b"]]
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert all(search.done() for search in searches)
+        return [search.result() for search in searches]
+
+    assert asyncio.run(main()) == [[{'id': "a"}], [{'id': "b"}]]
+    assert service.batches == [["a", "b"]]
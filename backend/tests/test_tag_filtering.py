@@ -0,0 +1,152 @@
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services import vector_index
+from app.services.index_generation import IndexGeneration, ReadWriteLock
+from app.services.tag_index import TagIndex, bitmap_contains, bitmap_labels, count_bits
+from app.services.vector_index import IndexConfig, StoragePositions, normalize_vectors
+
+
+def labels_of(bitmap):
+    return bitmap_labels(bitmap).tolist()
+
+
+def test_tag_index_match_any_and_all():
+    tags = TagIndex()
+    tags.add(0, ["Python", "web"])
+    tags.add(3, ["python"])
+    tags.add(12, ["web", "rust"])
+
+    assert labels_of(tags.match(["python"])) == [0, 3]
+    assert labels_of(tags.match(["python", "rust"], "any")) == [0, 3, 12]
+    assert labels_of(tags.match(["python", "web"], "all")) == [0]
+    assert labels_of(tags.match(["go", "web"], "all")) == []
+    assert count_bits(tags.match(["web"])) == 2
+
+    tags.discard(0, ["python", "web"])
+    assert labels_of(tags.match(["python", "web"])) == [3, 12]
+    with pytest.raises(ValueError):
+        tags.match(["web"], "most")
+
+
+def test_bitmap_helpers():
+    bitmap = np.packbits(np.isin(np.arange(24), [1, 8, 23]), bitorder='little')
+
+    assert labels_of(bitmap) == [1, 8, 23]
+    assert bitmap_contains(bitmap, np.array([1, 2, 23, 24, -1])).tolist() == [True, False, True, False, False]
+
+
+def test_storage_positions_of_chunked_labels():
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(4))
+    # Labels 5, 2 and 9 with 2, 1 and 3 chunks, stored out of order
+    ids = np.array([(9 << 2) + 2, (5 << 2), (2 << 2), (9 << 2), (5 << 2) + 1, (9 << 2) + 1], dtype='int64')
+    index.add_with_ids(np.ones((len(ids), 4), dtype='float32'), ids)
+    positions = StoragePositions(index)
+
+    assert sorted(positions.of_labels(np.array([9]), chunk_bits=2).tolist()) == [0, 3, 5]
+    assert sorted(positions.of_labels(np.array([2, 5]), chunk_bits=2).tolist()) == [1, 2, 4]
+    assert positions.of_labels(np.array([7]), chunk_bits=2).tolist() == []
+
+
+def build_generation(index_type, chunk_bits, count=1200, seed=0):
+    """Generation where every 50th prompt is tagged 'rare' and the rest 'common'"""
+    rng = np.random.default_rng(seed)
+    generation = IndexGeneration(IndexConfig(index_type, nlist=8), chunk_bits=chunk_bits)
+    metadata, vectors = [], []
+    for i in range(count):
+        chunks = 1 + i % 3 if chunk_bits else 1
+        entry = {'id': f"p{i}", 'title': "t", 'description': None, 'tags': ["rare" if i % 50 == 0 else "common"]}
+        if chunks > 1:
+            entry['chunks'] = chunks
+        metadata.append(entry)
+        vectors.append(rng.standard_normal((chunks, 16)))
+    generation.upsert(normalize_vectors(np.vstack(vectors)), metadata)
+    return generation
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+@pytest.mark.parametrize("chunk_bits", [0, 2])
+@pytest.mark.parametrize("tag", ["rare", "common"])
+def test_filtered_search_fills_top_k_with_matching_prompts(index_type, chunk_bits, tag):
+    generation = build_generation(index_type, chunk_bits)
+    queries = normalize_vectors(np.random.default_rng(1).standard_normal((3, 16)))
+
+    for results in generation.search(queries, 10, tags=[tag]):
+        assert len(results) == 10
+        assert all(result['tags'] == [tag] for result in results)
+        assert len({result['id'] for result in results}) == 10
+        if chunk_bits:
+            assert all(0 <= result['matched_chunk'] < 3 for result in results)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+@pytest.mark.parametrize("chunk_bits", [0, 2])
+def test_batch_and_bitmap_selectors_agree(monkeypatch, index_type, chunk_bits):
+    generation = build_generation(index_type, chunk_bits)
+    queries = normalize_vectors(np.random.default_rng(2).standard_normal((4, 16)))
+
+    def ranked_ids(share):
+        monkeypatch.setattr(vector_index, "MAX_BATCH_SELECTOR_SHARE", share)
+        return [[result['id'] for result in results] for results in generation.search(queries, 5, tags=["rare"])]
+
+    assert ranked_ids(1.0) == ranked_ids(0.0)
+
+
+def test_filtered_search_matches_brute_force():
+    generation = build_generation("flat", 0, count=300)
+    query = normalize_vectors(np.random.default_rng(3).standard_normal((1, 16)))
+
+    labels = [label for label in generation.metadata.labels() if generation.metadata.get(label)['tags'] == ["rare"]]
+    vectors = generation.index.reconstruct_batch(np.array(labels, dtype='int64'))
+    expected = [generation.metadata.get(labels[i])['id'] for i in np.argsort(-(vectors @ query[0]))[:3]]
+
+    assert [result['id'] for result in generation.search(query, 3, tags=["rare"])[0]] == expected
+
+
+def test_filters_follow_upserts_and_deletes():
+    generation = build_generation("flat", 2, count=200)
+    query = normalize_vectors(np.random.default_rng(4).standard_normal((1, 16)))
+    rare = {result['id'] for result in generation.search(query, 100, tags=["rare"])[0]}
+    assert rare == {"p0", "p50", "p100", "p150"}
+
+    generation.delete(["p50"])
+    vector = normalize_vectors(np.random.default_rng(5).standard_normal((2, 16)))
+    generation.upsert(vector, [{'id': "p1", 'title': "t", 'description': None, 'tags': ["rare"], 'chunks': 2}])
+
+    rare = {result['id'] for result in generation.search(query, 100, tags=["rare"])[0]}
+    assert rare == {"p0", "p1", "p100", "p150"}
+
+
+def test_read_write_lock_shares_reads_and_excludes_writes():
+    lock = ReadWriteLock()
+    both_reading = threading.Barrier(2, timeout=5)
+    events = []
+
+    def reader():
+        with lock.read():
+            # Both readers must be inside at the same time to pass the barrier
+            both_reading.wait()
+            events.append("read")
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join()
+    assert events == ["read", "read"]
+
+    with lock.write():
+        # The writer may read and write again while it holds the lock
+        with lock.read(), lock.write():
+            pass
+        blocked = threading.Thread(target=reader)
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+        # Let the waiting reader through on its own once the writer is done
+        both_reading = threading.Barrier(1)
+    blocked.join(5)
+    assert not blocked.is_alive()